@@ -2,3 +2,4 @@ from batchglm.data import design_matrix
 from batchglm.data import constraint_matrix_from_dict, constraint_matrix_from_string, string_constraints_from_dict, \
     constraint_system_from_star
 from batchglm.data import view_coef_names, preview_coef_names
+from batchglm.models.base import ChunkedData
@@ -0,0 +1,2 @@
+from batchglm.models.glm_beta import InputDataGLM, Model, Simulator
+from batchglm.train.numpy.glm_beta import Estimator
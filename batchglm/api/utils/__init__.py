@@ -1 +1,3 @@
 from . import linalg
+from . import planner
+from . import checkpoint
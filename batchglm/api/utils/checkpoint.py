@@ -0,0 +1 @@
+from batchglm.utils.checkpoint import save_checkpoint, load_checkpoint
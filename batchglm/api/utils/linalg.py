@@ -1 +1 @@
-from batchglm.utils.linalg import stacked_lstsq, groupwise_solve_lm
+from batchglm.utils.linalg import stacked_lstsq, stacked_solve, stacked_inv, stacked_block_inv, stacked_xtwx, stacked_xtwz, design_groups, groupwise_sum, groupwise_solve_lm
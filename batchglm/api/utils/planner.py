@@ -0,0 +1 @@
+from batchglm.utils.planner import plan_training, available_memory
@@ -1,3 +1,4 @@
+from .chunked import ChunkedData
 from .input import InputDataBase, InputDataBase
 from .estimator import _EstimatorBase, EstimatorBaseTyping
 from .model import _ModelBase
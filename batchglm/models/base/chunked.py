@@ -0,0 +1,420 @@
+import concurrent.futures
+import logging
+import numpy as np
+import scipy.sparse
+
+try:
+    import anndata
+except ImportError:
+    anndata = None
+
+try:
+    from anndata.abc import CSRDataset, CSCDataset
+    _SPARSE_DATASETS = (CSRDataset, CSCDataset)
+except ImportError:
+    _SPARSE_DATASETS = ()
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+try:
+    import zarr
+except ImportError:
+    zarr = None
+
+from batchglm import pkg_constants
+
+logger = logging.getLogger(__name__)
+
+
+def is_chunked_source(data) -> bool:
+    """
+    Whether data are an on-disk array that is read in blocks of observations: np.memmap, h5py.Dataset,
+    zarr.Array or a sparse dataset of a backed AnnData object.
+    """
+    if isinstance(data, (ChunkedData, np.memmap)):
+        return True
+    if h5py is not None and isinstance(data, h5py.Dataset):
+        return True
+    if zarr is not None and isinstance(data, zarr.Array):
+        return True
+    return isinstance(data, _SPARSE_DATASETS)
+
+
+def anndata_x(data):
+    """
+    Data matrix of an AnnData object or of its raw attribute without reading backed objects into memory.
+
+    Views of backed objects are read from the file of the object they are a view of, restricted to the observations
+    and features of the view.
+
+    :param data: anndata.AnnData or anndata.Raw
+    :return: data.X or ChunkedData for backed objects
+    """
+    if isinstance(data, anndata.AnnData) and data.isbacked and data.is_view:
+        # .X of a view of a backed object reads the view into memory:
+        ref = data._adata_ref
+        return ChunkedData(
+            ref.X,
+            obs_idx=np.arange(ref.n_obs)[data._oidx],
+            var_idx=np.arange(ref.n_vars)[data._vidx]
+        )
+    x = data.X
+    if is_chunked_source(x):
+        return x if isinstance(x, ChunkedData) else ChunkedData(x)
+    return x
+
+
+class ChunkedData:
+    """
+    (observations x features) data on disk that are read in blocks of observations.
+
+    Wraps np.memmap, h5py.Dataset (also dense matrices of backed AnnData objects), zarr.Array and the sparse
+    datasets of backed AnnData objects, of which blocks are read as scipy.sparse.csr_matrix. Only one block is held
+    in memory at a time while the next block is read on a background thread. Reductions over observations such as
+    `np.sum(x, axis=0)` and `np.mean(x, axis=0)` are evaluated in a streaming pass over all blocks, other
+    numpy operations read all data into memory.
+    """
+
+    def __init__(
+            self,
+            source,
+            block_size: int = None,
+            dtype=None,
+            row_scale: np.ndarray = None,
+            power: int = 1,
+            obs_idx: np.ndarray = None,
+            var_idx: np.ndarray = None
+    ):
+        """
+        :param source: np.memmap, h5py.Dataset, zarr.Array, sparse dataset of a backed AnnData object or
+            ChunkedData of shape (observations x features).
+        :param block_size: Number of observations per block, chosen from
+            `pkg_constants.STREAMING_BLOCK_MEMORY_BUDGET` and the chunks of the source if None.
+        :param dtype: Data type that blocks are cast to, the data type of the source if None.
+        :param row_scale: (observations,) factors that the observations are multiplied with after reading.
+        :param power: Power that the data are raised to after scaling.
+        :param obs_idx: Indices of the observations of the source that are used, all if None.
+        :param var_idx: Indices of the features of the source that are used, all if None.
+        """
+        if isinstance(source, ChunkedData):
+            block_size = source._block_size if block_size is None else block_size
+            dtype = source.dtype if dtype is None else dtype
+            if source.obs_idx is not None:
+                obs_idx = source.obs_idx if obs_idx is None else source.obs_idx[obs_idx]
+            if source.var_idx is not None:
+                var_idx = source.var_idx if var_idx is None else source.var_idx[var_idx]
+            source = source.source
+        if len(source.shape) != 2:
+            raise ValueError("chunked data have to be two-dimensional (observations x features), found shape %s" %
+                             str(source.shape))
+        self.source = source
+        self.dtype = np.dtype(source.dtype if dtype is None else dtype)
+        self._block_size = block_size
+        self.row_scale = None if row_scale is None else np.asarray(row_scale)
+        self.exponent = power
+        self.obs_idx = None if obs_idx is None else np.asarray(obs_idx)
+        self.var_idx = None if var_idx is None else np.asarray(var_idx)
+
+    def _derive(self, **kwargs):
+        """
+        Copy with changed arguments of `__init__()`.
+        """
+        args = {
+            "block_size": self._block_size,
+            "dtype": self.dtype,
+            "row_scale": self.row_scale,
+            "power": self.exponent,
+            "obs_idx": self.obs_idx,
+            "var_idx": self.var_idx
+        }
+        args.update(kwargs)
+        return ChunkedData(self.source, **args)
+
+    @property
+    def shape(self):
+        return (
+            self.source.shape[0] if self.obs_idx is None else self.obs_idx.shape[0],
+            self.source.shape[1] if self.var_idx is None else self.var_idx.shape[0]
+        )
+
+    @property
+    def ndim(self):
+        return 2
+
+    @property
+    def sparse(self) -> bool:
+        """
+        Whether blocks are read as scipy.sparse.csr_matrix.
+        """
+        return isinstance(self.source, _SPARSE_DATASETS)
+
+    @property
+    def chunk_rows(self) -> int:
+        """
+        Number of observations per chunk of the on-disk layout, 1 if the source is not chunked or if only
+        a selection of its observations is used.
+        """
+        chunks = getattr(self.source, "chunks", None)
+        if chunks is None or isinstance(self.source, np.ndarray) or self.obs_idx is not None:
+            return 1
+        return int(chunks[0])
+
+    @property
+    def block_size(self) -> int:
+        """
+        Number of observations per block.
+
+        Chosen such that `pkg_constants.STREAMING_BLOCK_OVERHEAD` observation-wise float64 quantities of all
+        features of a block fit into `pkg_constants.STREAMING_BLOCK_MEMORY_BUDGET` and rounded down to whole
+        chunks of the on-disk layout, so that every chunk is only read once per pass.
+        """
+        if self._block_size is not None:
+            return self._block_size
+        bytes_per_row = pkg_constants.STREAMING_BLOCK_OVERHEAD * np.dtype(np.float64).itemsize * \
+            max(self.shape[1], 1)
+        block_size = max(pkg_constants.STREAMING_BLOCK_MEMORY_BUDGET // bytes_per_row, 1)
+        chunk_rows = self.chunk_rows
+        return int(max(block_size // chunk_rows, 1) * chunk_rows)
+
+    def astype(self, dtype):
+        return self._derive(dtype=dtype)
+
+    def row_scaled(self, scale):
+        """
+        Data with observations multiplied by `scale`, evaluated on reading.
+
+        :param scale: (observations,) or (observations x 1) factors.
+        """
+        if self.exponent != 1:
+            raise ValueError("cannot scale the rows of chunked data raised to a power")
+        scale = np.reshape(np.asarray(scale, dtype=np.float64), [-1])
+        if self.row_scale is not None:
+            scale = scale * self.row_scale
+        # Scaled data are floating point as the result of dividing in-memory data by size factors:
+        return self._derive(dtype=np.promote_types(self.dtype, scale.dtype), row_scale=scale)
+
+    def multiply(self, other):
+        """
+        Elementwise product with an (observations x 1) array as `scipy.sparse.spmatrix.multiply()`.
+        """
+        return self.row_scaled(other)
+
+    def power(self, n):
+        return self._derive(power=self.exponent * n)
+
+    def _read_source(self, rows):
+        """
+        Read rows of the source, given as a slice or as increasing indices.
+        """
+        if zarr is not None and isinstance(self.source, zarr.Array) and not isinstance(rows, slice):
+            block = self.source.oindex[rows, :]
+        else:
+            block = self.source[rows]
+        if self.sparse:
+            block = scipy.sparse.csr_matrix(block)
+        if self.var_idx is not None:
+            block = block[:, self.var_idx]
+        return block
+
+    def _read_rows(self, start, stop):
+        """
+        Read the observations start:stop of the selection of observations of the source.
+
+        Selected observations are read as the contiguous range of the source that they span if this range has
+        at most `pkg_constants.STREAMING_READ_SPAN_RATIO` times as many observations, by index otherwise.
+        """
+        if self.obs_idx is None:
+            return self._read_source(slice(start, stop))
+        rows, inverse = np.unique(self.obs_idx[start:stop], return_inverse=True)
+        if rows.shape[0] == 0:
+            return self._read_source(slice(0, 0))
+        span = rows[-1] - rows[0] + 1
+        if span <= pkg_constants.STREAMING_READ_SPAN_RATIO * rows.shape[0]:
+            block = self._read_source(slice(rows[0], rows[-1] + 1))[rows - rows[0]]
+        else:
+            block = self._read_source(rows)
+        return block[np.reshape(inverse, [-1])]
+
+    def _read(self, start, stop):
+        block = self._read_rows(start, stop)
+        if scipy.sparse.issparse(block):
+            block = block.astype(self.dtype)
+            if self.row_scale is not None:
+                block = scipy.sparse.csr_matrix(block.multiply(np.expand_dims(self.row_scale[start:stop], axis=1)))
+                block = block.astype(self.dtype)
+            if self.exponent != 1:
+                block = block.power(self.exponent)
+            return block
+        # Memory maps are only read on access, copy so that reading happens on the calling thread:
+        block = np.array(block, dtype=self.dtype, copy=isinstance(block, np.memmap))
+        if self.row_scale is not None:
+            block = (block * np.expand_dims(self.row_scale[start:stop], axis=1)).astype(self.dtype, copy=False)
+        if self.exponent != 1:
+            block = np.power(block, self.exponent)
+        return block
+
+    def block_bounds(self):
+        """
+        (start, stop) of all blocks of observations.
+        """
+        n = self.shape[0]
+        block_size = self.block_size
+        return [(start, min(start + block_size, n)) for start in range(0, n, block_size)]
+
+    def blocks(self, bounds=None):
+        """
+        Iterate over blocks of observations, the next block is read on a background thread.
+
+        :param bounds: (start, stop) of the blocks to read, all blocks if None.
+        :return: generator of (start, stop, (observations in block x features) np.ndarray or
+            scipy.sparse.csr_matrix)
+        """
+        if bounds is None:
+            bounds = self.block_bounds()
+        if len(bounds) == 0:
+            return
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(self._read, *bounds[0])
+            for i, (start, stop) in enumerate(bounds):
+                block = future.result()
+                if i + 1 < len(bounds):
+                    future = executor.submit(self._read, *bounds[i + 1])
+                yield start, stop, block
+
+    def to_memory(self):
+        """
+        Read all data into memory.
+
+        :return: np.ndarray or scipy.sparse.csr_matrix
+        """
+        blocks = [block for _, _, block in self.blocks()]
+        if self.sparse:
+            if len(blocks) == 0:
+                return scipy.sparse.csr_matrix(self.shape, dtype=self.dtype)
+            return scipy.sparse.vstack(blocks, format="csr")
+        if len(blocks) == 0:
+            return np.zeros(self.shape, dtype=self.dtype)
+        return np.concatenate(blocks, axis=0)
+
+    def __array__(self, dtype=None, copy=None):
+        x = self.to_memory()
+        x = x.toarray() if scipy.sparse.issparse(x) else x
+        return x if dtype is None else x.astype(dtype)
+
+    def __getitem__(self, key):
+        """
+        Read a selection of observations and features, only blocks that contain selected observations are read.
+        """
+        if not isinstance(key, tuple):
+            key = (key,)
+        if len(key) > 2:
+            raise IndexError("too many indices for chunked data")
+        rows, cols = key[0], key[1] if len(key) == 2 else slice(None)
+        idx = np.arange(self.shape[0])[rows]
+        scalar_row = np.ndim(idx) == 0
+        idx = np.atleast_1d(idx)
+        order = np.argsort(idx, kind="stable")
+        idx_sorted = idx[order]
+        bounds = [
+            (start, stop) for start, stop in self.block_bounds()
+            if np.any(np.logical_and(idx_sorted >= start, idx_sorted < stop))
+        ]
+        parts = []
+        for start, stop, block in self.blocks(bounds=bounds):
+            sel = idx_sorted[np.logical_and(idx_sorted >= start, idx_sorted < stop)] - start
+            parts.append(block[sel][:, cols])
+        if self.sparse:
+            x = scipy.sparse.vstack(parts, format="csr") if len(parts) > 0 else \
+                scipy.sparse.csr_matrix((0, self.shape[1]), dtype=self.dtype)[:, cols]
+        elif len(parts) > 0:
+            x = np.concatenate(parts, axis=0)
+        else:
+            x = np.zeros([0, self.shape[1]], dtype=self.dtype)[:, cols]
+        x = x[np.argsort(order, kind="stable")]
+        return x[0] if scalar_row else x
+
+    def sum(self, axis=None, dtype=None, out=None, keepdims=False):
+        """
+        Streaming sum over observations (axis 0), features (axis 1) or all entries.
+        """
+        def block_sum(block, block_axis):
+            if scipy.sparse.issparse(block):
+                return np.asarray(block.sum(axis=block_axis, dtype=dtype)).reshape([-1])
+            return np.sum(block, axis=block_axis, dtype=dtype)
+
+        if axis is None:
+            s = np.sum(self.sum(axis=0, dtype=dtype), dtype=dtype)
+            s = np.reshape(s, [1, 1]) if keepdims else s
+        elif axis in [0, -2]:
+            s = None
+            for _, _, block in self.blocks():
+                s_block = block_sum(block, 0)
+                s = s_block if s is None else s + s_block
+            if s is None:
+                s = np.zeros([self.shape[1]], dtype=dtype if dtype is not None else self.dtype)
+            s = np.expand_dims(s, axis=0) if keepdims else s
+        elif axis in [1, -1]:
+            s = np.concatenate([block_sum(block, 1) for _, _, block in self.blocks()], axis=0)
+            s = np.expand_dims(s, axis=1) if keepdims else s
+        else:
+            raise ValueError("axis %s not supported for chunked data" % str(axis))
+        if out is not None:
+            out[...] = s
+            return out
+        return s
+
+    def mean(self, axis=None, dtype=None, out=None, keepdims=False):
+        n = self.shape[0] * self.shape[1] if axis is None else self.shape[axis]
+        m = self.sum(axis=axis, dtype=dtype, keepdims=keepdims) / n
+        if out is not None:
+            out[...] = m
+            return out
+        return m
+
+    def count_nonzero(self) -> int:
+        return int(sum([
+            block.count_nonzero() if scipy.sparse.issparse(block) else np.count_nonzero(block)
+            for _, _, block in self.blocks()
+        ]))
+
+    def groupwise_mean(self, grouping) -> np.ndarray:
+        """
+        Mean of the observations of each group in one streaming pass.
+
+        :param grouping: (observations,) group label of each observation.
+        :return: (groups x features) in the order of `np.unique(grouping)`
+        """
+        groups, inverse = np.unique(grouping, return_inverse=True)
+        inverse = np.reshape(inverse, [-1])
+        sums = np.zeros([groups.shape[0], self.shape[1]])
+        for start, stop, block in self.blocks():
+            indicator = scipy.sparse.csr_matrix(
+                (np.ones([stop - start]), (inverse[start:stop], np.arange(stop - start))),
+                shape=[groups.shape[0], stop - start]
+            )
+            s = indicator.dot(block)
+            sums += s.toarray() if scipy.sparse.issparse(s) else s
+        return sums / np.expand_dims(np.bincount(inverse, minlength=groups.shape[0]), axis=1)
+
+    def tdot(self, a) -> np.ndarray:
+        """
+        a^T * x in one streaming pass.
+
+        :param a: (observations x k)
+        :return: (k x features)
+        """
+        a = np.asarray(a)
+        s = np.zeros([a.shape[1], self.shape[1]])
+        for start, stop, block in self.blocks():
+            if scipy.sparse.issparse(block):
+                s += block.T.dot(a[start:stop]).T
+            else:
+                s += np.matmul(a[start:stop].T, block)
+        return s
+
+    def __repr__(self):
+        return "ChunkedData(%s, shape=%s, dtype=%s, block_size=%i)" % \
+            (type(self.source).__name__, str(self.shape), str(self.dtype), self.block_size)
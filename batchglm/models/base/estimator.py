@@ -38,6 +38,7 @@ class _EstimatorBase(metaclass=abc.ABCMeta):
         self._jacobian = None
         self._hessian = None
         self._fisher_inv = None
+        self._solver_paths = {}
         self._error_codes = None
         self._niter = None
 
@@ -69,6 +70,15 @@ class _EstimatorBase(metaclass=abc.ABCMeta):
     def fisher_inv(self):
         return self._fisher_inv
 
+    @property
+    def solver_paths(self) -> dict:
+        """
+        Strategy of the stacked solver layer (see `batchglm.utils.linalg.stacked_solve`) that each feature
+        was last solved with, by system, e.g. "irls" for the location model update and "fisher_inv" for the
+        inverse of the Fisher information.
+        """
+        return self._solver_paths
+
     @property
     def x(self) -> np.ndarray:
         return self.input_data.x
@@ -3,6 +3,9 @@ import numpy as np
 import scipy.sparse
 from typing import List
 
+from .chunked import ChunkedData, is_chunked_source, anndata_x
+from batchglm import pkg_constants
+
 try:
     import anndata
 except ImportError:
@@ -32,8 +35,11 @@ class InputDataBase:
 
         Can be either:
             - np.ndarray: NumPy array containing the raw data
+            - np.memmap, h5py.Dataset, zarr.Array or ChunkedData: dense data on disk that are read in blocks of
+                observations, see `ChunkedData`
             - anndata.AnnData: AnnData object containing the count data and optional the design models
-                stored as data.obsm[design_loc] and data.obsm[design_scale]
+                stored as data.obsm[design_loc] and data.obsm[design_scale]. Backed objects and views of these,
+                e.g. `anndata.read_h5ad(path, backed="r")[mask]`, are read from the file in blocks of observations.
         :param observation_names: (optional) names of the observations.
         :param feature_names: (optional) names of the features.
         :param cast_dtype: data type of all data; should be either float32 or float64
@@ -41,10 +47,12 @@ class InputDataBase:
         """
         self.observations = observation_names
         self.features = feature_names
-        if isinstance(data, np.ndarray) or isinstance(data, scipy.sparse.csr_matrix):
+        if is_chunked_source(data):
+            self.x = data if isinstance(data, ChunkedData) else ChunkedData(data)
+        elif isinstance(data, np.ndarray) or isinstance(data, scipy.sparse.csr_matrix):
             self.x = data
         elif isinstance(data, anndata.AnnData) or isinstance(data, anndata.Raw):
-            self.x = data.X
+            self.x = anndata_x(data)
         elif isinstance(data, InputDataBase):
             self.x = data.x
         else:
@@ -52,8 +60,52 @@ class InputDataBase:
 
         if cast_dtype is not None:
             self.x = self.x.astype(cast_dtype)
+        if isinstance(self.x, scipy.sparse.csr_matrix) and not self.x.has_canonical_format:
+            # Computations over the stored entries require these to be unique.
+            self.x = self.x.copy()
+            self.x.sum_duplicates()
+
+    @property
+    def x(self):
+        return self._x
 
-        self._feature_allzero = np.sum(self.x, axis=0) == 0
+    @x.setter
+    def x(self, x):
+        self._x = x
+        self._invalidate_x()
+
+    def _invalidate_x(self):
+        """
+        Drop quantities that were derived from the data, called whenever the data are replaced.
+        """
+        self._x_csc = None
+        self._feature_allzero = None
+        self._feature_summary = None
+
+    @property
+    def is_chunked(self) -> bool:
+        """
+        Whether the data are on disk and read in blocks of observations.
+        """
+        return isinstance(self.x, ChunkedData)
+
+    @property
+    def x_feature_major(self):
+        """
+        Data in the layout that suits access to subsets of features.
+
+        Column slices of CSR data scan all stored entries. A feature-major (CSC) companion of CSR data is therefore
+        built on first access and kept alongside the CSR data that batches of observations are fetched from, see
+        `fetch_x_sparse()`. Dense and on-disk data are returned as they are.
+
+        :return: (observations x features) scipy.sparse.csc_matrix for CSR data, data otherwise
+        """
+        if not isinstance(self.x, scipy.sparse.csr_matrix) or not pkg_constants.SPARSE_FEATURE_MAJOR:
+            return self.x
+        # The companion is rebuilt if the data were replaced:
+        if self._x_csc is None or self._x_csc[0] is not self.x:
+            self._x_csc = (self.x, self.x.tocsc())
+        return self._x_csc[1]
 
     @property
     def num_observations(self):
@@ -65,12 +117,70 @@ class InputDataBase:
 
     @property
     def feature_isnonzero(self):
-        return ~self._feature_allzero
+        return ~self.feature_isallzero
 
     @property
     def feature_isallzero(self):
+        if self._feature_allzero is None:
+            self._feature_allzero = np.sum(self.x, axis=0) == 0
         return self._feature_allzero
 
+    @property
+    def feature_nnz(self) -> np.ndarray:
+        """
+        Number of observations with non-zero data by feature.
+
+        :return: (features,)
+        """
+        return self._summarize_features()[0]
+
+    @property
+    def feature_isconstant(self) -> np.ndarray:
+        """
+        Whether all observations of a feature have the same value, this includes features without non-zero data.
+
+        :return: (features,)
+        """
+        _, x_min, x_max = self._summarize_features()
+        return x_min == x_max
+
+    def _summarize_features(self):
+        """
+        Number of non-zero observations, minimum and maximum by feature, computed once in one pass over the data
+        and recomputed after the data are replaced.
+
+        :return: tuple of (features,) arrays (nnz, minimum, maximum)
+        """
+        if self._feature_summary is None:
+            nnz = np.zeros([self.num_features], dtype=np.int64)
+            x_min = np.full([self.num_features], np.inf)
+            x_max = np.full([self.num_features], -np.inf)
+            blocks = (block for _, _, block in self.x.blocks()) if self.is_chunked else [self.x]
+            for x in blocks:
+                if scipy.sparse.issparse(x):
+                    x = x.tocsr()
+                    # Explicitly stored zeros are not counted:
+                    nnz += np.bincount(x.indices[x.data != 0], minlength=self.num_features)
+                    x_min = np.minimum(x_min, x.min(axis=0).toarray()[0])
+                    x_max = np.maximum(x_max, x.max(axis=0).toarray()[0])
+                elif x.shape[0] > 0:
+                    nnz += np.count_nonzero(x, axis=0)
+                    x_min = np.minimum(x_min, np.min(x, axis=0))
+                    x_max = np.maximum(x_max, np.max(x, axis=0))
+            self._feature_summary = (nnz, x_min, x_max)
+        return self._feature_summary
+
+    def fetch_x_features(self, idx):
+        """
+        Data of a subset of features, sliced from `x_feature_major`.
+
+        Only touches the stored entries of the selected features of sparse data.
+
+        :param idx: Feature indices.
+        :return: (observations x features) np.ndarray or scipy.sparse.csc_matrix
+        """
+        return self.x_feature_major[:, idx]
+
     def fetch_x_dense(self, idx):
         assert isinstance(self.x, np.ndarray), "tried to fetch dense from non ndarray"
 
@@ -1,7 +1,8 @@
 from batchglm.models.base import _EstimatorBase
-from batchglm.models.base import InputDataBase
+from batchglm.models.base import InputDataBase, ChunkedData
 from batchglm.models.base import _ModelBase
 from batchglm.models.base import _SimulatorBase
 
 import batchglm.data as data_utils
-from batchglm.utils.linalg import groupwise_solve_lm
\ No newline at end of file
+from batchglm.utils.linalg import groupwise_solve_lm, design_groups
+from batchglm import pkg_constants
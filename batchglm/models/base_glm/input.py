@@ -3,14 +3,16 @@ try:
 except ImportError:
     anndata = None
 
+import copy
 import numpy as np
 import pandas as pd
 import patsy
 import scipy.sparse
+import scipy.special
 from typing import Union
 
-from .utils import parse_constraints, parse_design
-from .external import InputDataBase
+from .utils import parse_constraints, parse_design, count_histogram
+from .external import InputDataBase, pkg_constants, design_groups
 
 
 class InputDataGLM(InputDataBase):
@@ -42,6 +44,9 @@ class InputDataGLM(InputDataBase):
         :param data: Some data object.
             Can be either:
                 - np.ndarray: NumPy array containing the raw data
+                - np.memmap, h5py.Dataset, zarr.Array or ChunkedData: dense data on disk, all quantities of the
+                    numpy backend that are summed over observations are then evaluated in streaming passes over
+                    blocks of observations, see `observation_blocks()`
                 - anndata.AnnData: AnnData object containing the count data and optional the design models
                     stored as data.obsm[design_loc] and data.obsm[design_scale]
         :param design_loc: Some matrix format (observations x mean model parameters)
@@ -119,6 +124,57 @@ class InputDataGLM(InputDataBase):
         self._scale_names = scale_names
 
         self.size_factors = size_factors
+        self._lgamma_x_plus_one_byfeature = None
+        self._design_cache = {}
+        self._design_groups = None
+        self._observation_groups = None
+        self._invalidate_count_histogram()
+        self._observation_block_cache = {}
+
+    @property
+    def design_loc(self):
+        return self._design_loc
+
+    @design_loc.setter
+    def design_loc(self, design_loc):
+        self._design_loc = design_loc
+        self._invalidate_design()
+
+    @property
+    def design_scale(self):
+        return self._design_scale
+
+    @design_scale.setter
+    def design_scale(self, design_scale):
+        self._design_scale = design_scale
+        self._invalidate_design()
+
+    @property
+    def constraints_loc(self):
+        return self._constraints_loc
+
+    @constraints_loc.setter
+    def constraints_loc(self, constraints_loc):
+        self._constraints_loc = constraints_loc
+        self._invalidate_design()
+
+    @property
+    def constraints_scale(self):
+        return self._constraints_scale
+
+    @constraints_scale.setter
+    def constraints_scale(self, constraints_scale):
+        self._constraints_scale = constraints_scale
+        self._invalidate_design()
+
+    @property
+    def size_factors(self):
+        return self._size_factors
+
+    @size_factors.setter
+    def size_factors(self, size_factors):
+        self._size_factors = size_factors
+        self._invalidate_observation_groups()
 
     @property
     def design_loc_names(self):
@@ -152,6 +208,259 @@ class InputDataGLM(InputDataBase):
     def num_scale_params(self):
         return self.constraints_scale.shape[1]
 
+    def _invalidate_x(self):
+        InputDataBase._invalidate_x(self)
+        self._lgamma_x_plus_one_byfeature = None
+        self._invalidate_count_histogram()
+
+    def _invalidate_design(self):
+        """
+        Drop quantities that were derived from the designs and constraints, called whenever one of these is replaced.
+        """
+        self._design_cache = {}
+        self._design_groups = None
+        self._invalidate_observation_groups()
+
+    def _invalidate_observation_groups(self):
+        """
+        Drop the observation groups and the count histogram over these, called whenever designs, constraints or
+        size factors are replaced.
+        """
+        self._observation_groups = None
+        self._invalidate_count_histogram()
+
+    def _invalidate_count_histogram(self):
+        # Count histograms of on-disk data would have to be held in memory:
+        self._count_histogram = False if self.is_chunked else None
+
+    def _cached_design(self, key, fn):
+        """
+        Evaluate a quantity that only depends on designs and constraints once, see `_invalidate_design()`.
+
+        :param key: Name of the cached quantity.
+        :param fn: Callable that computes the quantity.
+        """
+        if key not in self._design_cache:
+            self._design_cache[key] = fn()
+        return self._design_cache[key]
+
+    @property
+    def constraints_loc_identity(self) -> bool:
+        """
+        Whether the location model is unconstrained, i.e. whether `constraints_loc` is the identity.
+        """
+        return self._cached_design("constraints_loc_identity", lambda: _is_identity(self.constraints_loc))
+
+    @property
+    def constraints_scale_identity(self) -> bool:
+        """
+        Whether the scale model is unconstrained, i.e. whether `constraints_scale` is the identity.
+        """
+        return self._cached_design("constraints_scale_identity", lambda: _is_identity(self.constraints_scale))
+
+    @property
+    def design_loc_constrained(self) -> np.ndarray:
+        """
+        Location design in terms of the inferred parameters: design_loc * constraints_loc.
+
+        :return: observations x location model parameters
+        """
+        return self._cached_design(
+            "design_loc_constrained",
+            lambda: _constrain(design=self.design_loc, constraints=self.constraints_loc,
+                               identity=self.constraints_loc_identity)
+        )
+
+    @property
+    def design_scale_constrained(self) -> np.ndarray:
+        """
+        Scale design in terms of the inferred parameters: design_scale * constraints_scale.
+
+        :return: observations x scale model parameters
+        """
+        return self._cached_design(
+            "design_scale_constrained",
+            lambda: _constrain(design=self.design_scale, constraints=self.constraints_scale,
+                               identity=self.constraints_scale_identity)
+        )
+
+    @property
+    def design_loc_constant_row(self) -> Union[np.ndarray, None]:
+        """
+        Row of the constrained location design if all observations share it, e.g. for intercept-only models.
+
+        :return: (1 x location model parameters) or None if observations differ in their location design.
+        """
+        return self._cached_design(
+            "design_loc_constant_row",
+            lambda: _constant_row(self.design_loc_constrained)
+        )
+
+    @property
+    def design_scale_constant_row(self) -> Union[np.ndarray, None]:
+        """
+        Row of the constrained scale design if all observations share it, e.g. for intercept-only models.
+
+        :return: (1 x scale model parameters) or None if observations differ in their scale design.
+        """
+        return self._cached_design(
+            "design_scale_constant_row",
+            lambda: _constant_row(self.design_scale_constrained)
+        )
+
+    @property
+    def lgamma_x_plus_one_byfeature(self) -> np.ndarray:
+        """
+        Sum of lgamma(x + 1) = log(x!) over observations by feature.
+
+        This term of count likelihoods only depends on the data, it is computed once on first access
+        and recomputed after the data are replaced.
+        Only stored entries are evaluated for sparse data as lgamma(1) = 0.
+        """
+        if self._lgamma_x_plus_one_byfeature is None:
+            if self.is_chunked:
+                self._lgamma_x_plus_one_byfeature = np.zeros([self.num_features])
+                for _, _, x_block in self.x.blocks():
+                    self._lgamma_x_plus_one_byfeature += self._lgamma_x_plus_one_sum(x_block)
+            else:
+                self._lgamma_x_plus_one_byfeature = self._lgamma_x_plus_one_sum(self.x)
+        return self._lgamma_x_plus_one_byfeature
+
+    def _lgamma_x_plus_one_sum(self, x) -> np.ndarray:
+        if isinstance(x, scipy.sparse.csr_matrix):
+            return np.bincount(
+                x.indices,
+                weights=scipy.special.gammaln(x.data + 1),
+                minlength=self.num_features
+            )
+        else:
+            return np.sum(scipy.special.gammaln(x + 1), axis=0)
+
+    @property
+    def design_groups(self):
+        """
+        Observations grouped by unique rows of the location and scale design.
+
+        Computed once on first access and recomputed after designs or constraints are replaced. Weights of
+        X^T*W*X and X^T*W*z can be summed by group so that the outer products of the design rows only need to be
+        evaluated once per group.
+
+        :return: tuple of ((groups x location model parameters) unique rows of the constrained location design,
+            (groups x scale model parameters) unique rows of the constrained scale design,
+            group index of each observation) or None if there are more than
+            `pkg_constants.DESIGN_GROUPS_MAX_FRACTION` unique rows among the observations.
+        """
+        if self._design_groups is None:
+            (unique_loc, unique_scale), groups = design_groups([self.design_loc, self.design_scale])
+            if unique_loc.shape[0] <= pkg_constants.DESIGN_GROUPS_MAX_FRACTION * self.num_observations:
+                self._design_groups = (
+                    _constrain(unique_loc, self.constraints_loc, identity=self.constraints_loc_identity),
+                    _constrain(unique_scale, self.constraints_scale, identity=self.constraints_scale_identity),
+                    groups
+                )
+            else:
+                self._design_groups = False
+        return self._design_groups if self._design_groups is not False else None
+
+    @property
+    def observation_groups(self):
+        """
+        Observations grouped by unique rows of the location design, the scale design and the size factors.
+
+        All observations of one group share the location and scale model of a feature.
+        Computed once on first access and recomputed after designs, constraints or size factors are replaced.
+
+        :return: tuple of ((groups x location model parameters) unique rows of the constrained location design,
+            (groups x scale model parameters) unique rows of the constrained scale design,
+            size factors of groups or None, group index of each observation)
+        """
+        if self._observation_groups is None:
+            designs = [self.design_loc, self.design_scale]
+            if self.size_factors is not None:
+                designs.append(np.reshape(self.size_factors, [-1, 1]))
+            unique_rows, groups = design_groups(designs)
+            self._observation_groups = (
+                _constrain(unique_rows[0], self.constraints_loc, identity=self.constraints_loc_identity),
+                _constrain(unique_rows[1], self.constraints_scale, identity=self.constraints_scale_identity),
+                np.reshape(unique_rows[2], [-1]) if self.size_factors is not None else None,
+                groups
+            )
+        return self._observation_groups
+
+    @property
+    def count_histogram(self):
+        """
+        Data of each feature compressed to the multiplicity of each value within each observation group.
+
+        See `observation_groups` for the grouping. Computed once on first access and recomputed after the data or
+        the observation groups are replaced.
+
+        :return: tuple of (indptr, group, value, multiplicity) where the entries of feature i are at
+            indptr[i]:indptr[i+1] or None if the histogram has more than
+            `pkg_constants.COUNT_HISTOGRAM_MAX_FRACTION` entries of the data.
+        """
+        if self._count_histogram is None:
+            max_entries = int(pkg_constants.COUNT_HISTOGRAM_MAX_FRACTION * self.num_observations * self.num_features)
+            unique_loc, _, _, groups = self.observation_groups
+            # Each feature has at least one entry per group:
+            if unique_loc.shape[0] * self.num_features > max_entries:
+                histogram = None
+            else:
+                histogram = count_histogram(
+                    x=self.x_feature_major,
+                    groups=groups,
+                    n_groups=unique_loc.shape[0],
+                    max_entries=max_entries
+                )
+            self._count_histogram = histogram if histogram is not None else False
+        return self._count_histogram if self._count_histogram is not False else None
+
+    def observation_blocks(self):
+        """
+        Iterate over blocks of observations of on-disk data.
+
+        Each block is input data of the observations of the block whose data are held in memory until the next
+        block is requested, the next block is read on a background thread meanwhile. Quantities that only depend
+        on designs, such as the design groups of a block, are cached across passes. Sums over observations of
+        in-memory data are sums of these sums over the blocks.
+
+        :return: generator of InputDataGLM
+        """
+        if not self.is_chunked:
+            yield self
+            return
+        for start, stop, x_block in self.x.blocks():
+            block = self._observation_block(start=start, stop=stop)
+            # Every pass reads the same observations into a block, quantities derived from its data stay valid:
+            block._x = x_block
+            try:
+                yield block
+            finally:
+                block._x = None
+                block._x_csc = None
+
+    def _observation_block(self, start, stop):
+        """
+        Input data of the observations start:stop without data.
+        """
+        if (start, stop) not in self._observation_block_cache:
+            block = copy.copy(self)
+            block.x = None
+            block._x_csc = None
+            block.observations = self.observations[start:stop] if self.observations is not None else None
+            block.design_loc = self.design_loc[start:stop]
+            block.design_scale = self.design_scale[start:stop]
+            block.size_factors = self.size_factors[start:stop] if self.size_factors is not None else None
+            block._lgamma_x_plus_one_byfeature = None
+            block._design_cache = {}
+            block._design_groups = None
+            block._observation_groups = None
+            # Histograms would be recomputed on every pass:
+            block._count_histogram = False
+            block._observation_block_cache = {}
+            self._observation_block_cache[(start, stop)] = block
+        return self._observation_block_cache[(start, stop)]
+
     def fetch_design_loc(self, idx):
         return self.design_loc[idx, :]
 
@@ -160,3 +469,22 @@ class InputDataGLM(InputDataBase):
 
     def fetch_size_factors(self, idx):
         return self.size_factors[idx]
+
+
+def _is_identity(constraints) -> bool:
+    constraints = np.asarray(constraints)
+    return constraints.ndim == 2 and constraints.shape[0] == constraints.shape[1] and \
+        np.array_equal(constraints, np.eye(constraints.shape[0]))
+
+
+def _constrain(design, constraints, identity=False) -> np.ndarray:
+    if identity:
+        return np.asarray(design)
+    return np.matmul(design, constraints)
+
+
+def _constant_row(design) -> Union[np.ndarray, None]:
+    design = np.asarray(design)
+    if design.shape[0] > 0 and np.all(design == design[[0], :]):
+        return design[[0], :]
+    return None
@@ -96,9 +96,42 @@ class _ModelGLM(_ModelBase, metaclass=abc.ABCMeta):
     def eta_loc(self) -> np.ndarray:
         pass
 
+    @property
+    def design_loc_constrained(self) -> np.ndarray:
+        if self.input_data is None:
+            return np.matmul(self.design_loc, self.constraints_loc)
+        else:
+            return self.input_data.design_loc_constrained
+
+    @property
+    def design_scale_constrained(self) -> np.ndarray:
+        if self.input_data is None:
+            return np.matmul(self.design_scale, self.constraints_scale)
+        else:
+            return self.input_data.design_scale_constrained
+
+    def _scale_shared(self, j=None) -> Union[np.ndarray, None]:
+        """
+        Scale model in linker space of all observations if these share one scale design row.
+
+        :param j: Feature indices, all features if None.
+        :return: (1 x features) or None if observations differ in their scale design.
+        """
+        if self.input_data is None:
+            return None
+        constant_row = self.input_data.design_scale_constant_row
+        if constant_row is None:
+            return None
+        b_var = self.b_var if j is None else self.b_var[:, j]
+        return np.matmul(constant_row, b_var)
+
     @property
     def eta_scale(self) -> np.ndarray:
-        return np.matmul(self.design_scale, self.b)
+        eta_shared = self._scale_shared()
+        if eta_shared is not None:
+            # Intercept-only or otherwise constant scale designs reduce to a (read-only) broadcast:
+            return np.broadcast_to(eta_shared, [self.input_data.num_observations, eta_shared.shape[1]])
+        return np.matmul(self.design_scale_constrained, self.b_var)
 
     @property
     def location(self):
@@ -106,6 +139,10 @@ class _ModelGLM(_ModelBase, metaclass=abc.ABCMeta):
 
     @property
     def scale(self):
+        eta_shared = self._scale_shared()
+        if eta_shared is not None:
+            scale_shared = self.inverse_link_scale(eta_shared)
+            return np.broadcast_to(scale_shared, [self.input_data.num_observations, scale_shared.shape[1]])
         return self.inverse_link_scale(self.eta_scale)
 
     @abc.abstractmethod
@@ -116,12 +153,22 @@ class _ModelGLM(_ModelBase, metaclass=abc.ABCMeta):
         # Make sure that dimensionality of sliced array is kept:
         if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
             j = [j]
-        return np.matmul(self.design_scale, self.b[:, j])
+        eta_shared = self._scale_shared(j=j)
+        if eta_shared is not None:
+            return np.broadcast_to(eta_shared, [self.input_data.num_observations, eta_shared.shape[1]])
+        return np.matmul(self.design_scale_constrained, self.b_var[:, j])
 
     def location_j(self, j):
         return self.inverse_link_loc(self.eta_loc_j(j=j))
 
     def scale_j(self, j):
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        eta_shared = self._scale_shared(j=j)
+        if eta_shared is not None:
+            scale_shared = self.inverse_link_scale(eta_shared)
+            return np.broadcast_to(scale_shared, [self.input_data.num_observations, scale_shared.shape[1]])
         return self.inverse_link_scale(self.eta_scale_j(j=j))
 
     @property
@@ -10,7 +10,7 @@ import pandas as pd
 import patsy
 import scipy.sparse
 
-from .external import groupwise_solve_lm
+from .external import groupwise_solve_lm, ChunkedData
 
 
 def parse_design(
@@ -76,6 +76,36 @@ def parse_constraints(
     return constraints, constraint_params
 
 
+def _divide_size_factors(x, size_factors):
+    """
+    Divide data by size factors, sparse data stay in CSR format and on-disk data are divided on reading.
+    """
+    if isinstance(x, ChunkedData):
+        # Size factors are shared by all features:
+        size_factors = np.asarray(size_factors)
+        return x.row_scaled(1. / (size_factors[:, 0] if size_factors.ndim == 2 else size_factors))
+    if isinstance(x, scipy.sparse.spmatrix):
+        return scipy.sparse.csr_matrix(x.multiply(1. / np.asarray(size_factors)))
+    else:
+        return np.divide(x, size_factors)
+
+
+def _groupwise_mean(x, grouping):
+    """
+    Mean of the observations of each group in the order of `np.unique(grouping)`.
+
+    On-disk data are reduced in one streaming pass over all groups.
+
+    :return: (groups x features)
+    """
+    if isinstance(x, ChunkedData):
+        return x.groupwise_mean(grouping)
+    return np.asarray(np.vstack([
+        np.mean(x[np.where(grouping == g)[0], :], axis=0)
+        for g in np.unique(grouping)
+    ]))
+
+
 def closedform_glm_mean(
         x: Union[np.ndarray, scipy.sparse.csr_matrix],
         dmat: np.ndarray,
@@ -97,13 +127,10 @@ def closedform_glm_mean(
     :return: tuple: (groupwise_means, mu, rmsd)
     """
     if size_factors is not None:
-        x = np.divide(x, size_factors)
+        x = _divide_size_factors(x=x, size_factors=size_factors)
 
     def apply_fun(grouping):
-        groupwise_means = np.asarray(np.vstack([
-            np.mean(x[np.where(grouping == g)[0], :], axis=0)
-            for g in np.unique(grouping)
-        ]))
+        groupwise_means = _groupwise_mean(x, grouping)
         if link_fn is None:
             return groupwise_means
         else:
@@ -140,7 +167,7 @@ def closedform_glm_scale(
     :return: tuple (groupwise_scales, logphi, rmsd)
     """
     if size_factors is not None:
-        x = x / size_factors
+        x = _divide_size_factors(x=x, size_factors=size_factors)
 
     # to circumvent nonlocal error
     provided_groupwise_means = groupwise_means
@@ -148,15 +175,14 @@ def closedform_glm_scale(
     def apply_fun(grouping):
         # Calculate group-wise means if not supplied. These are required for variance and MME computation.
         if provided_groupwise_means is None:
-            gw_means = np.asarray(np.vstack([
-                np.mean(x[np.where(grouping == g)[0], :], axis=0)
-                for g in np.unique(grouping)
-            ]))
+            gw_means = _groupwise_mean(x, grouping)
         else:
             gw_means = provided_groupwise_means
 
         # calculated variance via E(x)^2 or directly depending on whether `mu` was specified
-        if isinstance(x, scipy.sparse.csr_matrix):
+        if isinstance(x, ChunkedData):
+            expect_xsq = _groupwise_mean(x.power(2), grouping)
+        elif isinstance(x, scipy.sparse.csr_matrix):
             expect_xsq = np.asarray(np.vstack([
                 np.asarray(np.mean(x[np.where(grouping == g)[0], :].power(2), axis=0))
                 for g in np.unique(grouping)]
@@ -186,3 +212,74 @@ def closedform_glm_scale(
         return inv_link_fn(linker_groupwise_scales), scaleparam, rmsd
     else:
         return linker_groupwise_scales, scaleparam, rmsd
+
+
+def count_histogram(
+        x: Union[np.ndarray, scipy.sparse.csr_matrix],
+        groups: np.ndarray,
+        n_groups: int,
+        max_entries: Union[int, None] = None,
+        block_entries: int = 2 ** 23
+):
+    r"""
+    Compresses data to the multiplicity of each distinct value within each group of observations by feature.
+
+    Zeros of sparse data are counted from the group sizes and the stored entries, they are not densified.
+
+    :param x: (observations x features) data.
+    :param groups: Group index of each observation.
+    :param n_groups: Number of groups.
+    :param max_entries: Abort once the histogram has more entries than this, no limit if None.
+    :param block_entries: Number of observation-feature pairs that are sorted at once.
+    :return: tuple: (indptr, group, value, multiplicity) where the entries of feature i are at
+        indptr[i]:indptr[i+1] or None if the histogram has more than `max_entries` entries.
+    """
+    n_obs, n_features = x.shape
+    groups = np.asarray(groups)
+    group_size = np.bincount(groups, minlength=n_groups)
+    block = int(max(block_entries // max(n_obs, 1), 1))
+
+    def compress(feature, group, value, multiplicity):
+        order = np.lexsort((value, group, feature))
+        feature, group, value, multiplicity = feature[order], group[order], value[order], multiplicity[order]
+        new = np.ones(feature.shape[0], dtype=bool)
+        new[1:] = np.logical_or(
+            np.logical_or(feature[1:] != feature[:-1], group[1:] != group[:-1]),
+            value[1:] != value[:-1]
+        )
+        starts = np.where(new)[0]
+        return feature[starts], group[starts], value[starts], np.add.reduceat(multiplicity, starts)
+
+    entries = []
+    n_entries = 0
+    for start in range(0, n_features, block):
+        x_block = x[:, start:(start + block)]
+        n_block = x_block.shape[1]
+        if isinstance(x_block, np.ndarray):
+            # Row-major flattening: entry o * n_block + f.
+            feature = np.tile(np.arange(n_block), n_obs)
+            group = np.repeat(groups, n_block)
+            value = np.reshape(x_block, [-1])
+            multiplicity = np.ones(value.shape[0], dtype=np.int64)
+        else:
+            x_block = x_block.tocoo()
+            # Zeros are the group size minus the stored entries of each feature and group:
+            n_stored = np.bincount(
+                x_block.col * n_groups + groups[x_block.row],
+                minlength=n_block * n_groups
+            )
+            n_zero = np.tile(group_size, n_block) - n_stored
+            has_zero = np.where(n_zero > 0)[0]
+            feature = np.concatenate([x_block.col, has_zero // n_groups])
+            group = np.concatenate([groups[x_block.row], has_zero % n_groups])
+            value = np.concatenate([x_block.data, np.zeros(has_zero.shape[0], dtype=x_block.data.dtype)])
+            multiplicity = np.concatenate([np.ones(x_block.data.shape[0], dtype=np.int64), n_zero[has_zero]])
+        feature, group, value, multiplicity = compress(feature, group, value, multiplicity)
+        entries.append((feature + start, group, value, multiplicity))
+        n_entries += feature.shape[0]
+        if max_entries is not None and n_entries > max_entries:
+            return None
+
+    feature, group, value, multiplicity = [np.concatenate(e) for e in zip(*entries)]
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(feature, minlength=n_features))])
+    return indptr, group, value, multiplicity
@@ -27,7 +27,16 @@ class Model(_ModelGLM, metaclass=abc.ABCMeta):
 
     @property
     def eta_loc(self) -> np.ndarray:
-        eta = np.matmul(self.design_loc, self.a)
+        eta = np.matmul(self.design_loc_constrained, self.a_var)
+        if self.size_factors is not None:
+            assert False, "size factors not allowed"
+        return eta
+
+    def eta_loc_j(self, j) -> np.ndarray:
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        eta = np.matmul(self.design_loc_constrained, self.a_var[:, j])
         if self.size_factors is not None:
             assert False, "size factors not allowed"
         return eta
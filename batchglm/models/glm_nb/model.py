@@ -27,7 +27,7 @@ class Model(_ModelGLM, metaclass=abc.ABCMeta):
 
     @property
     def eta_loc(self) -> np.ndarray:
-        eta = np.matmul(self.design_loc, self.a)
+        eta = np.matmul(self.design_loc_constrained, self.a_var)
         if self.size_factors is not None:
             eta += np.expand_dims(self.size_factors, axis=1)
         return eta
@@ -36,7 +36,7 @@ class Model(_ModelGLM, metaclass=abc.ABCMeta):
         # Make sure that dimensionality of sliced array is kept:
         if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
             j = [j]
-        eta = np.matmul(self.design_loc, self.a[:, j])
+        eta = np.matmul(self.design_loc_constrained, self.a_var[:, j])
         if self.size_factors is not None:
             eta += np.expand_dims(self.size_factors, axis=1)
         return eta
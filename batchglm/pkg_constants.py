@@ -10,10 +10,45 @@ ACCURACY_MARGIN_RELATIVE_TO_LIMIT = float(os.environ.get('BATCHGLM_ACCURACY_MARG
 FIM_MODE = str(os.environ.get('FIM_MODE', "analytic"))
 HESSIAN_MODE = str(os.environ.get('HESSIAN_MODE', "analytic"))
 JACOBIAN_MODE = str(os.environ.get('JACOBIAN_MODE', "analytic"))
-CHOLESKY_LSTSQS = False
-CHOLESKY_LSTSQS_BATCHED = False
+# Solve positive semi-definite IRLS systems of the tf1 backend with the Cholesky strategy of the solver layer
+# (see LINALG_SOLVER), on the full data and on batches:
+CHOLESKY_LSTSQS = True
+CHOLESKY_LSTSQS_BATCHED = True
 EVAL_ON_BATCHED = False
 
+# Scratch memory budget (bytes) for assembling X^T*W*X and X^T*W*z in the numpy backend:
+NUMPY_ASSEMBLY_MEMORY_BUDGET = int(os.environ.get('BATCHGLM_NUMPY_ASSEMBLY_MEMORY_BUDGET', 2 ** 30))
+# Reduce the observation axis to unique design rows before assembling X^T*W*X if there are at most
+# this fraction of unique rows among the observations, set to 0 to disable:
+DESIGN_GROUPS_MAX_FRACTION = float(os.environ.get('BATCHGLM_DESIGN_GROUPS_MAX_FRACTION', 0.25))
+# Evaluate the scale model of count noise models on (observation group, value, multiplicity) histograms
+# of the data if these have at most this fraction of entries of the data, set to 0 to disable:
+COUNT_HISTOGRAM_MAX_FRACTION = float(os.environ.get('BATCHGLM_COUNT_HISTOGRAM_MAX_FRACTION', 0.1))
+
+# Default strategy of the stacked solver layer (batchglm.utils.linalg.stacked_solve) for per-feature
+# normal equations and Fisher information inverses: "cholesky", "eigh" or "lstsq":
+LINALG_SOLVER = str(os.environ.get('BATCHGLM_LINALG_SOLVER', "cholesky"))
+
+# Memory budget (bytes) of the AUTO training strategy (batchglm.utils.planner), 0 to use a fraction of the
+# available memory:
+PLANNER_MEMORY_BUDGET = int(os.environ.get('BATCHGLM_PLANNER_MEMORY_BUDGET', 0))
+PLANNER_MEMORY_FRACTION = float(os.environ.get('BATCHGLM_PLANNER_MEMORY_FRACTION', 0.5))
+
+# Memory budget (bytes) of one block of observations of out-of-core data (batchglm.models.base.ChunkedData),
+# assuming that STREAMING_BLOCK_OVERHEAD observation-wise float64 quantities of all features are held per block:
+STREAMING_BLOCK_MEMORY_BUDGET = int(os.environ.get('BATCHGLM_STREAMING_BLOCK_MEMORY_BUDGET', 2 ** 28))
+STREAMING_BLOCK_OVERHEAD = 16
+# Selections of observations of on-disk data, e.g. views of backed AnnData objects, are read block by block as the
+# contiguous range that the observations of a block span if it has at most this many times as many observations:
+STREAMING_READ_SPAN_RATIO = float(os.environ.get('BATCHGLM_STREAMING_READ_SPAN_RATIO', 4.))
+
+# Keep a feature-major (CSC) copy of CSR data for per-feature access (batchglm.models.base.InputDataBase), which
+# doubles the memory of sparse data, set to 0 to slice features from the CSR data:
+SPARSE_FEATURE_MAJOR = bool(int(os.environ.get('BATCHGLM_SPARSE_FEATURE_MAJOR', 1)))
+
+# Minimum time (seconds) between two periodic checkpoints of a training loop (batchglm.utils.checkpoint):
+CHECKPOINT_INTERVAL = float(os.environ.get('BATCHGLM_CHECKPOINT_INTERVAL', 600))
+
 XARRAY_NETCDF_ENGINE = "h5netcdf"
 
 TF_CONFIG_PROTO = tf.compat.v1.ConfigProto()
@@ -45,3 +80,12 @@ XTOL_BY_FEATURE_LOC = 1e-8
 XTOL_BY_FEATURE_SCALE = 1e-6
 GTOL_BY_FEATURE_LOC = 1e-8
 GTOL_BY_FEATURE_SCALE = 1e-8
+# Line search of numpy IRLS: full IWLS steps that increase the log-likelihood by more than this multiple of
+# the increase predicted by the quadratic model are doubled:
+IRLS_EXPANSION_RATIO = 1.5
+# Adaptive scale model updates of the numpy backend: the scale model of a feature is due for an update
+# once the norm of the IWLS step of its location model is below this tolerance:
+XTOL_B_UPDATE_LOC = 1e-4
+# Feature triage of the numpy backend: features with non-zero data in fewer than this many observations keep their
+# initialisation and are not trained, all-zero and constant features are never trained:
+TRIAGE_MIN_NNZ = int(os.environ.get('BATCHGLM_TRIAGE_MIN_NNZ', 0))
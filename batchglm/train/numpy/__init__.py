@@ -1 +1,3 @@
 from . import glm_nb as nb
+from . import glm_norm as norm
+from . import glm_beta as beta
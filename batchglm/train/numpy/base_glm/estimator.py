@@ -5,7 +5,9 @@ import pprint
 import scipy
 import scipy.optimize
 
-from .external import _EstimatorGLM, pkg_constants
+from .external import _EstimatorGLM, pkg_constants, stacked_solve, stacked_block_inv, plan_training
+from .external import save_checkpoint, load_checkpoint, CheckpointTimer
+from .parallel import fit_sharded
 from .training_strategies import TrainingStrategies
 
 logger = logging.getLogger("batchglm")
@@ -15,21 +17,27 @@ class EstimatorGlm(_EstimatorGLM, metaclass=abc.ABCMeta):
     """
     Estimator for Generalized Linear Models (GLMs).
     """
+    # Bound of the scale model coefficients of constant features, i.e. of the noise model without variance,
+    # see `triage()`:
+    _constant_scale_bound = "max"
 
     def __init__(
             self,
             model,
             input_data,
+            noise_model: str,
             dtype,
     ):
-        if input_data.design_scale.shape[1] != 1:
-            raise ValueError("cannot model more than one scale parameter with numpy backend right now.")
         _EstimatorGLM.__init__(
             self=self,
             model=model,
             input_data=input_data
         )
+        self.noise_model = noise_model
         self.dtype = dtype
+        self._hessian_bb_last = None
+        self._feature_triage = None
+        self.steps_by_feature = None
         self.values = []
         self.lls = []
 
@@ -38,15 +46,216 @@ class EstimatorGlm(_EstimatorGLM, metaclass=abc.ABCMeta):
     def initialize(self):
         pass
 
+    @property
+    def feature_triage(self) -> np.ndarray:
+        """
+        Triage class of each feature, see `triage()`: "" for trained features, "allzero", "constant" or "sparse".
+
+        :return: (features,) or None if the features were not triaged yet
+        """
+        return self._feature_triage
+
+    def triage(self, min_nnz: int = None):
+        """
+        Exclude features from training and from the Hessians of `finalize()` whose fit is determined by the data.
+
+        - "allzero": features without non-zero data get the coefficients that put the linear predictors of the
+          location and scale model at their lower bounds, as the output of the tf1 backend.
+        - "constant": features with the same non-zero value in all observations keep the location model of the
+          initialisation, which is exact for closed-form and standard initialisations of designs with an
+          intercept. The linear predictor of the scale model is put at the bound that corresponds to zero
+          variance, at which the log-likelihood is not defined numerically and therefore NaN.
+        - "sparse": features with non-zero data in fewer than `min_nnz` observations keep their initialisation.
+          Those without finite closed-form initialisation, e.g. with an all-zero group of observations, get the
+          coefficients of all-zero features.
+
+        Triaged features are declared converged. Their Hessian and inverse Fisher information are NaN.
+
+        :param min_nnz: Minimum number of observations with non-zero data of trained features,
+            `pkg_constants.TRIAGE_MIN_NNZ` if None.
+        :return: (features,) triage class of each feature, see `feature_triage`
+        """
+        if min_nnz is None:
+            min_nnz = pkg_constants.TRIAGE_MIN_NNZ
+        nnz = self.input_data.feature_nnz
+        triage = np.full([self.input_data.num_features], "", dtype="<U8")
+        triage[nnz < min_nnz] = "sparse"
+        triage[self.input_data.feature_isconstant] = "constant"
+        triage[nnz == 0] = "allzero"
+
+        bounds_min, bounds_max = self.model.param_bounds(np.float64)
+        idx_allzero = np.where(triage == "allzero")[0]
+        idx_constant = np.where(triage == "constant")[0]
+        idx_sparse = np.where(triage == "sparse")[0]
+        idx_undefined = idx_sparse[np.logical_not(np.all(np.isfinite(self.model.model_vars.params[:, idx_sparse]),
+                                                         axis=0))]
+        idx_lower = np.concatenate([idx_allzero, idx_undefined])
+        design_loc = self.input_data.design_loc_constrained
+        design_scale = self.input_data.design_scale_constrained
+        if idx_lower.size > 0:
+            self.model.model_vars.a_var_j_setter(
+                value=self._coef_at(design=design_loc, eta=bounds_min["eta_loc"])[:, np.newaxis],
+                j=idx_lower
+            )
+            self.model.model_vars.b_var_j_setter(
+                value=self._coef_at(design=design_scale, eta=bounds_min["eta_scale"])[:, np.newaxis],
+                j=idx_lower
+            )
+        if idx_constant.size > 0:
+            bound = bounds_max if self._constant_scale_bound == "max" else bounds_min
+            self.model.model_vars.b_var_j_setter(
+                value=self._coef_at(design=design_scale, eta=bound["eta_scale"])[:, np.newaxis],
+                j=idx_constant
+            )
+        converged = np.array(self.model.converged)
+        converged[triage != ""] = True
+        self.model.converged = converged
+        if np.any(triage != ""):
+            logger.debug("triaged features: %i all-zero, %i constant, %i sparse", idx_allzero.size,
+                         idx_constant.size, idx_sparse.size)
+        self._feature_triage = triage
+        return triage
+
+    @staticmethod
+    def _coef_at(design, eta) -> np.ndarray:
+        """
+        Coefficients whose linear predictor is `eta` in all observations, in the least-squares sense if the design
+        does not span a constant.
+
+        :param design: (observations x inferred param) constrained design.
+        :param eta: Value of the linear predictor.
+        :return: (inferred param,)
+        """
+        unique_design = np.unique(design, axis=0)
+        return np.linalg.lstsq(unique_design, np.full([unique_design.shape[0]], eta), rcond=None)[0]
+
+    def _init_par_from_model(self, input_data, init_model, init_a, init_b):
+        """
+        Initialise parameters from a previously fit estimator or model, e.g. to refit after observations,
+        features or covariates were added or removed.
+
+        Features are matched as in `_match_features()` and coefficients by the parameter names of the location
+        and scale model. Coefficients that `init_model` does not have are initialised with zero, features that
+        `init_model` does not have are initialised as without `init_model`.
+
+        :param input_data: InputDataGLM
+        :param init_model: Estimator or model with `a_var`, `b_var` and `input_data`.
+        :param init_a: "auto" or "init_model" to initialise the location model from `init_model`,
+            passed on to `init_par()` otherwise.
+        :param init_b: "auto" or "init_model" to initialise the scale model from `init_model`,
+            passed on to `init_par()` otherwise.
+        :return: tuple of (init_a, init_b)
+        """
+        from_model_a = isinstance(init_a, str) and init_a.lower() in ["auto", "init_model"]
+        from_model_b = isinstance(init_b, str) and init_b.lower() in ["auto", "init_model"]
+        init_a, init_b = self.init_par(
+            input_data=input_data,
+            init_a="AUTO" if from_model_a else init_a,
+            init_b="AUTO" if from_model_b else init_b,
+            init_model=None
+        )
+        idx_model = self._match_features(input_data=input_data, init_model=init_model)
+        matched = np.where(idx_model >= 0)[0]
+        if from_model_a:
+            init_a = np.array(init_a, dtype=np.float64)
+            init_a[:, matched] = self._match_params(
+                names=input_data.loc_names,
+                names_model=init_model.input_data.loc_names,
+                coef_model=np.asarray(init_model.a_var)[:, idx_model[matched]]
+            )
+            self._train_loc = True
+        if from_model_b:
+            init_b = np.array(init_b, dtype=np.float64)
+            init_b[:, matched] = self._match_params(
+                names=input_data.scale_names,
+                names_model=init_model.input_data.scale_names,
+                coef_model=np.asarray(init_model.b_var)[:, idx_model[matched]]
+            )
+            self._train_scale = True
+        logger.debug("Using initialization based on input model for %i of %i features",
+                     matched.size, input_data.num_features)
+        return init_a, init_b
+
+    def _converged_from_model(self, input_data, init_model) -> np.ndarray:
+        """
+        Convergence state of features of `init_model` whose location and scale model parameters are unchanged.
+
+        :return: (features,) boolean, False for features without convergence state in `init_model`.
+        """
+        converged = np.tile(False, input_data.num_features)
+        converged_model = getattr(getattr(init_model, "model", None), "converged", None)
+        if converged_model is None:
+            return converged
+        if list(input_data.loc_names) != list(init_model.input_data.loc_names) or \
+                list(input_data.scale_names) != list(init_model.input_data.scale_names):
+            return converged
+        idx_model = self._match_features(input_data=input_data, init_model=init_model)
+        matched = np.where(idx_model >= 0)[0]
+        converged[matched] = np.asarray(converged_model)[idx_model[matched]]
+        return converged
+
+    @staticmethod
+    def _match_features(input_data, init_model) -> np.ndarray:
+        """
+        Index of each feature in `init_model`.
+
+        Features are matched by feature names if both input data have them and by position otherwise.
+
+        :return: (features,) index of the feature in `init_model`, -1 for features that `init_model` does not have.
+        """
+        features = input_data.features
+        features_model = init_model.input_data.features
+        if features is not None and features_model is not None:
+            idx_model = dict([(f, i) for i, f in enumerate(features_model)])
+            return np.array([idx_model.get(f, -1) for f in features], dtype=int)
+        if input_data.num_features != init_model.input_data.num_features:
+            raise ValueError(
+                "features of init_model can only be matched by position if the number of features is unchanged, "
+                "supply feature_names to match features by name"
+            )
+        return np.arange(input_data.num_features)
+
+    @staticmethod
+    def _match_params(names, names_model, coef_model) -> np.ndarray:
+        """
+        Coefficients of parameters by name, zero for parameters that are not in `names_model`.
+
+        :param names: Parameter names.
+        :param names_model: Parameter names of `coef_model`.
+        :param coef_model: (parameters of names_model x features)
+        :return: (parameters of names x features)
+        """
+        names_model = list(names_model)
+        coef = np.zeros([len(names), coef_model.shape[1]])
+        for i, name in enumerate(names):
+            if name in names_model:
+                coef[i] = coef_model[names_model.index(name)]
+        return coef
+
     def train_sequence(
             self,
             training_strategy: str = "DEFAULT"
     ):
+        """
+        Train with the arguments of a training strategy.
+
+        :param training_strategy: Name of a strategy in `TrainingStrategies` or dictionary of arguments of `train()`.
+            "AUTO" chooses the scale model update frequency and the feature chunk size from the data and from
+            available memory, see `batchglm.utils.planner.plan_training`.
+        """
         if isinstance(training_strategy, str):
-            training_strategy = self.TrainingStrategies[training_strategy].value[0]
+            if training_strategy.upper() == "AUTO":
+                training_strategy = self.TrainingStrategies.AUTO.value
+            else:
+                training_strategy = self.TrainingStrategies[training_strategy].value[0]
 
         if training_strategy is None:
-            training_strategy = self.TrainingStrategies.DEFAULT.value
+            training_strategy = plan_training(
+                input_data=self.input_data,
+                noise_model=self.noise_model,
+                backend="numpy",
+                dtype=self.dtype
+            )["training_strategy"][0]
 
         logging.getLogger("batchglm").info("training strategy:\n%s", pprint.pformat(training_strategy))
         self.train(**training_strategy)
@@ -54,79 +263,817 @@ class EstimatorGlm(_EstimatorGLM, metaclass=abc.ABCMeta):
     def train(
             self,
             max_steps: int,
-            update_b_freq: int = 5
+            update_b_freq: int = 5,
+            n_jobs: int = 1,
+            chunk_size: int = None,
+            adaptive_b: bool = True,
+            max_line_search: int = 10,
+            lltol: float = None,
+            xtol_loc: float = None,
+            xtol_scale: float = None,
+            gtol_loc: float = None,
+            gtol_scale: float = None,
+            max_steps_by_feature=None,
+            min_nnz: int = None,
+            checkpoint_path: str = None,
+            checkpoint_interval: float = None,
+            resume_from: str = None
     ):
+        """
+        Train the model with iteratively re-weighted least squares and scale model updates.
+
+        A feature is converged if one of the following criteria holds in an iteration after a scale model update,
+        as in the tf1 backend:
+
+            - the relative change of the log-likelihood is below `lltol`,
+            - the norms of the steps of the location and of the scale model are below `xtol_loc` and `xtol_scale`,
+            - the mean absolute scores of the location and of the scale model are below `gtol_loc` and `gtol_scale`.
+
+        In iterations without a scale model update, the same criteria on the location model alone decide whether
+        the location model of a feature is converged. A tolerance of 0 disables the step or score criterion.
+        The log-likelihood criterion cannot be disabled: `lltol` is bounded below by the machine epsilon of the
+        compute dtype, as smaller relative changes are not resolved. Features whose log-likelihood no longer
+        changes within this precision are therefore always converged.
+
+        :param max_steps: Maximum number of IRLS iterations.
+        :param update_b_freq: The scale model is updated every `update_b_freq` iterations. With `adaptive_b`,
+            this is the maximum number of iterations between two updates of the scale model of a feature.
+        :param n_jobs: Number of worker processes that fit shards of the features in parallel.
+            The data are shared with the workers via shared memory, which is not supported for on-disk data.
+            Each worker additionally holds a csr copy of its shard of sparse data, see
+            `batchglm.utils.planner.plan_training` for the memory footprint.
+        :param chunk_size: Number of features whose observation-wise quantities are evaluated at once,
+            all active features if None. Features are independent so that this only bounds memory.
+            For on-disk data, quantities are evaluated on blocks of observations instead, see
+            `_sum_over_observations()`.
+        :param adaptive_b: Whether to schedule scale model updates by feature. The scale model of a feature is
+            due once its location model converged or its last IWLS step was below
+            `pkg_constants.XTOL_B_UPDATE_LOC`, or after `update_b_freq` iterations. Due features for which a Newton
+            step on the scale model is predicted to change the log-likelihood by less than the convergence
+            tolerance are not updated.
+        :param max_line_search: Maximum number of halvings and of doublings of the IWLS step of a feature,
+            see `iwls_update()`.
+        :param lltol: Tolerance on the relative change of the log-likelihood,
+            `pkg_constants.LLTOL_BY_FEATURE` if None. Raised to the machine epsilon of the compute dtype.
+        :param xtol_loc: Tolerance on the norm of the location model step, `pkg_constants.XTOL_BY_FEATURE_LOC`
+            if None.
+        :param xtol_scale: Tolerance on the norm of the scale model step, `pkg_constants.XTOL_BY_FEATURE_SCALE`
+            if None.
+        :param gtol_loc: Tolerance on the mean absolute score of the location model,
+            `pkg_constants.GTOL_BY_FEATURE_LOC` if None.
+        :param gtol_scale: Tolerance on the mean absolute score of the scale model,
+            `pkg_constants.GTOL_BY_FEATURE_SCALE` if None.
+        :param max_steps_by_feature: Maximum number of iterations in which the parameters of a feature are updated
+            in this call, scalar or (features,). Features that reach their cap are declared converged.
+            The number of iterations of each feature is kept in `.steps_by_feature`.
+        :param min_nnz: Features with non-zero data in fewer observations are not trained, nor are all-zero and
+            constant features, see `triage()`. `pkg_constants.TRIAGE_MIN_NNZ` if None.
+        :param checkpoint_path: File to which the state of training is written periodically and after the last
+            iteration, see `batchglm.utils.checkpoint`. With `n_jobs > 1`, each shard is written to its own file.
+        :param checkpoint_interval: Minimum time between two checkpoints in seconds,
+            `pkg_constants.CHECKPOINT_INTERVAL` if None.
+        :param resume_from: Checkpoint file from which training is continued. The iteration counter is restored,
+            so that `max_steps` includes the iterations before the checkpoint, and so is the log-likelihood trace
+            `.lls`. The other arguments, also `n_jobs`,
+            have to be the same as in the interrupted call.
+        """
+        if lltol is None:
+            lltol = pkg_constants.LLTOL_BY_FEATURE
+        if xtol_loc is None:
+            xtol_loc = pkg_constants.XTOL_BY_FEATURE_LOC
+        if xtol_scale is None:
+            xtol_scale = pkg_constants.XTOL_BY_FEATURE_SCALE
+        if gtol_loc is None:
+            gtol_loc = pkg_constants.GTOL_BY_FEATURE_LOC
+        if gtol_scale is None:
+            gtol_scale = pkg_constants.GTOL_BY_FEATURE_SCALE
+        n_features = self.model.model_vars.n_features
+        if max_steps_by_feature is not None:
+            max_steps_by_feature = np.broadcast_to(np.asarray(max_steps_by_feature), [n_features])
+        if n_jobs > 1 and self.input_data.is_chunked:
+            raise ValueError("n_jobs > 1 is not supported for on-disk data, which is streamed by observations")
+        self.triage(min_nnz=min_nnz)
+        if n_jobs > 1:
+            self._train_sharded(
+                max_steps=max_steps,
+                update_b_freq=update_b_freq,
+                n_jobs=n_jobs,
+                chunk_size=chunk_size,
+                adaptive_b=adaptive_b,
+                max_line_search=max_line_search,
+                lltol=lltol,
+                xtol_loc=xtol_loc,
+                xtol_scale=xtol_scale,
+                gtol_loc=gtol_loc,
+                gtol_scale=gtol_scale,
+                max_steps_by_feature=max_steps_by_feature,
+                min_nnz=min_nnz,
+                checkpoint_path=checkpoint_path,
+                checkpoint_interval=checkpoint_interval,
+                resume_from=resume_from
+            )
+            return
+
+        # Relative changes of the log-likelihood below the resolution of observation-wise computations
+        # are not meaningful, also not for lltol=0. Line searches cannot resolve smaller gains either, so that
+        # the step and score criteria alone do not necessarily terminate:
+        lltol = max(lltol, float(np.finfo(self.model.compute_dtype).eps))
+
         # Iterate until conditions are fulfilled.
         train_step = 0
-        delayed_converged = np.tile(False, self.model.model_vars.n_features)
+        # Triaged features are never updated:
+        delayed_converged = self._feature_triage != ""
+        steps_since_b = np.zeros([n_features], dtype=int)
+        loc_step = np.full([n_features], np.inf)
+        self.steps_by_feature = np.zeros([n_features], dtype=int)
+
+        if resume_from is not None:
+            state = load_checkpoint(path=resume_from, backend="numpy", noise_model=self.noise_model,
+                                    n_features=n_features)
+            self.model.a_var = state["a_var"]
+            self.model.b_var = state["b_var"]
+            self.model.converged = state["converged"]
+            self._hessian_bb_last = state["hessian_bb_last"] if state["hessian_bb_last"].size > 0 else None
+            train_step = int(state["train_step"])
+            delayed_converged = state["delayed_converged"]
+            steps_since_b = state["steps_since_b"]
+            loc_step = state["loc_step"]
+            self.steps_by_feature = state["steps_by_feature"]
+            self.lls = list(state["lls"])
+            ll_current = state["loss"]
+        elif chunk_size is None:
+            ll_current = - self._sum_over_observations(lambda model: model.ll_byfeature)
+        else:
+            ll_current = - self._ll_byfeature_j(idx=np.arange(n_features), chunk_size=chunk_size)
+        logging.getLogger("batchglm").debug("iter %i: ll=%f" % (train_step, np.sum(ll_current)))
+
+        def checkpoint():
+            save_checkpoint(
+                path=checkpoint_path,
+                backend="numpy",
+                noise_model=self.noise_model,
+                a_var=self.model.a_var,
+                b_var=self.model.b_var,
+                converged=self.model.converged,
+                hessian_bb_last=self._hessian_bb_last if self._hessian_bb_last is not None else np.zeros([0]),
+                train_step=train_step,
+                delayed_converged=delayed_converged,
+                steps_since_b=steps_since_b,
+                loc_step=loc_step,
+                steps_by_feature=self.steps_by_feature,
+                loss=ll_current,
+                lls=np.stack(self.lls, axis=0) if len(self.lls) > 0 else np.zeros([0, n_features])
+            )
 
-        ll_current = - self.model.ll_byfeature
-        logging.getLogger("batchglm").debug("iter %i: ll=%f" % (0, np.sum(ll_current)))
+        checkpoint_timer = CheckpointTimer(path=checkpoint_path, interval=checkpoint_interval)
         while np.any(np.logical_not(delayed_converged)) and \
                 train_step < max_steps:
+            # Features whose scale model is refreshed in this iteration:
+            if train_step == 0:
+                idx_refresh = np.array([], dtype=int)
+            elif adaptive_b:
+                due = np.logical_or(
+                    np.logical_or(self.model.converged, loc_step < pkg_constants.XTOL_B_UPDATE_LOC),
+                    steps_since_b >= update_b_freq
+                )
+                idx_refresh = np.where(np.logical_and(due, np.logical_not(delayed_converged)))[0]
+            elif train_step % update_b_freq == 0:
+                idx_refresh = np.where(np.logical_not(delayed_converged))[0]
+            else:
+                idx_refresh = np.array([], dtype=int)
+            # Only the parameters of the active set of features can change in this iteration,
+            # all quantities are only evaluated on this set:
+            idx_active = np.union1d(self.model.idx_not_converged, idx_refresh)
+            # The log-likelihood of features outside of the active set is unchanged.
+            ll_previous = ll_current
+            ll_current = ll_previous.copy()
             # Update parameters:
+            scale_step = np.zeros([n_features])
             # Line search step for scale model:
-            if train_step % update_b_freq == 0 and train_step > 0:
+            if idx_refresh.size > 0:
+                if adaptive_b:
+                    # Scale models that are already at their optimum given the location model are kept:
+                    idx_b = idx_refresh[self._b_step_required(
+                        idx=idx_refresh,
+                        ll=ll_current[idx_refresh],
+                        lltol=lltol,
+                        chunk_size=chunk_size
+                    )]
+                else:
+                    idx_b = idx_refresh
                 b_var_cache = self.model.b_var.copy()
-                self.model.b_var = self.b_step(idx=np.where(np.logical_not(delayed_converged))[0])
+                for j in self._feature_chunks(idx=idx_b, chunk_size=chunk_size):
+                    self.model.b_var = self.b_step(idx=j)
                 # Reverse update by feature if update leads to worse loss:
-                ll_proposal = - self.model.ll_byfeature
+                ll_proposal = - self._ll_byfeature_j(idx=idx_b, chunk_size=chunk_size)
+                worse = ll_proposal > ll_current[idx_b]
+                idx_worse = idx_b[worse]
                 b_var_new = self.model.b_var.copy()
-                b_var_new[:, ll_proposal > ll_current] = b_var_cache[:, ll_proposal > ll_current]
+                b_var_new[:, idx_worse] = b_var_cache[:, idx_worse]
                 self.model.b_var = b_var_new
-                delayed_b_converged = self.model.converged.copy()
+                scale_step[idx_b] = np.sqrt(np.sum(np.square(b_var_new[:, idx_b] - b_var_cache[:, idx_b]), axis=0))
+                ll_current[idx_b] = np.where(worse, ll_current[idx_b], ll_proposal)
             # IWLS step for location model:
-            self.model.a_var = self.model.a_var + self.iwls_step()
+            loc_step[self.model.converged] = 0.
+            for j in self._feature_chunks(idx=self.model.idx_not_converged, chunk_size=chunk_size):
+                ll_j, loc_step[j] = self.iwls_update(
+                    idx=j,
+                    ll=- ll_current[j],
+                    lltol=lltol,
+                    max_line_search=max_line_search
+                )
+                ll_current[j] = - ll_j
 
             # Evaluate convergence
-            ll_previous = ll_current
-            ll_current = - self.model.ll_byfeature
-            converged_f = (ll_previous - ll_current) / ll_previous < pkg_constants.LLTOL_BY_FEATURE
+            converged_f = np.tile(True, n_features)
+            # The log-likelihood of continuous noise models can be positive, the relative change is
+            # therefore taken with respect to its magnitude:
+            converged_f[idx_active] = (ll_previous[idx_active] - ll_current[idx_active]) / \
+                np.abs(ll_previous[idx_active]) < lltol
+            # Step length, the scale model only changes in iterations with a scale model update:
+            converged_x = np.tile(False, n_features)
+            converged_x[idx_active] = np.logical_and(
+                loc_step[idx_active] < xtol_loc,
+                scale_step[idx_active] < xtol_scale
+            )
+            # Gradient norm, only evaluated on features that did not converge by the other criteria:
+            converged_g = np.tile(False, n_features)
+            idx_g = idx_active[np.logical_not(np.logical_or(converged_f[idx_active], converged_x[idx_active]))]
+            if gtol_loc > 0 and idx_g.size > 0:
+                idx_g = idx_g[self._grad_norm_j(idx=idx_g, chunk_size=chunk_size, model="loc") < gtol_loc]
+                idx_g_scale = np.intersect1d(idx_g, idx_refresh)
+                if gtol_scale > 0 and idx_g_scale.size > 0:
+                    converged_g[idx_g_scale] = self._grad_norm_j(
+                        idx=idx_g_scale,
+                        chunk_size=chunk_size,
+                        model="scale"
+                    ) < gtol_scale
+                converged_g[np.setdiff1d(idx_g, idx_refresh)] = True
+            converged_f = np.logical_or(converged_f, np.logical_or(converged_x, converged_g))
             # Location model convergence status has to be updated if b model was updated
-            if train_step % update_b_freq == 0 and train_step > 0:
-                self.model.converged = converged_f
-                delayed_converged = converged_f
-            else:
-                self.model.converged = np.logical_or(self.model.converged, converged_f)
+            converged = np.logical_or(self.model.converged, converged_f)
+            converged[idx_refresh] = converged_f[idx_refresh]
+            delayed_converged[idx_refresh] = converged_f[idx_refresh]
+            # Features that reached their iteration cap are not updated anymore:
+            self.steps_by_feature[idx_active] += 1
+            if max_steps_by_feature is not None:
+                capped = np.logical_and(
+                    self.steps_by_feature >= max_steps_by_feature,
+                    np.logical_not(delayed_converged)
+                )
+                if np.any(capped):
+                    logger.info("%i features reached their iteration cap without converging", np.sum(capped))
+                converged[capped] = True
+                delayed_converged[capped] = True
+            self.model.converged = converged
+            steps_since_b += 1
+            steps_since_b[idx_refresh] = 0
             train_step += 1
             logging.getLogger("batchglm").debug(
-                "iter %i: ll=%f, converged: %i" %
-                (train_step, np.sum(ll_current), np.sum(self.model.converged))
+                "iter %i: ll=%f, converged: %i, scale model updates: %i, {x: %i, g: %i}" %
+                (train_step, np.sum(ll_current), np.sum(self.model.converged), idx_refresh.size,
+                 np.sum(converged_x), np.sum(converged_g))
             )
             self.lls.append(ll_current)
+            if checkpoint_timer.due():
+                checkpoint()
+        if checkpoint_path is not None:
+            checkpoint()
+
+    def _grad_norm_j(self, idx, chunk_size, model="loc"):
+        """
+        Mean absolute score of the location or scale model of a subset of features as in the tf1 backend.
+
+        :param idx: Indices of features.
+        :param chunk_size: Number of features that are evaluated at once.
+        :param model: "loc" or "scale"
+        :return: (features,)
+        """
+        def jac_fn(m, j):
+            return m.jac_a_j(j=j) if model == "loc" else m.jac_b_j(j=j)
+
+        return np.concatenate([
+            np.sum(np.abs(self._sum_over_observations(lambda m: jac_fn(m, j))), axis=1)
+            for j in self._feature_chunks(idx=idx, chunk_size=chunk_size)
+        ], axis=0) / self.input_data.num_observations
+
+    def _b_step_required(self, idx, ll, lltol, chunk_size):
+        """
+        Whether the scale model of features is not at its optimum given the location model.
+
+        A Newton step on the scale model is predicted to increase the log-likelihood by 0.5 * J_b^T * -H_bb^-1 * J_b.
+        An update is not required if this gain is below the relative tolerance of the convergence criterion.
+        The hessian changes slowly between scale model updates, the hessian of the last update of each feature
+        is used so that only the score has to be evaluated. Features without such a hessian or whose hessian
+        is not negative definite always require an update.
+
+        :param idx: Indices of features.
+        :param ll: (features,) current log-likelihood of these features.
+        :param lltol: Relative tolerance on the log-likelihood.
+        :param chunk_size: Number of features that are evaluated at once.
+        :return: (features,) boolean
+        """
+        idx = np.asarray(idx)
+        if self._hessian_bb_last is None:
+            return np.ones([idx.size], dtype=bool)
+        known = np.where(np.all(np.isfinite(self._hessian_bb_last[idx]), axis=(1, 2)))[0]
+        gain = np.full([idx.size], np.inf)
+        if known.size > 0:
+            g = np.concatenate([
+                self._sum_over_observations(lambda model: model.jac_b_j(j=j))  # (features x inferred param)
+                for j in self._feature_chunks(idx=idx[known], chunk_size=chunk_size)
+            ], axis=0)
+            delta, paths = stacked_solve(a=-self._hessian_bb_last[idx[known]], b=g, method="cholesky",
+                                         return_paths=True)
+            gain_known = 0.5 * np.sum(g * delta, axis=1)
+            gain_known[paths != "cholesky"] = np.inf
+            gain[known] = gain_known
+        return gain >= lltol * np.abs(ll)
+
+    def _record_hessian_bb(self, idx, hessian):
+        """
+        Keep the hessian of the scale model of features from their last update, see `_b_step_required()`.
+
+        :param idx: Indices of features.
+        :param hessian: (features x inferred param x inferred param)
+        """
+        if self._hessian_bb_last is None:
+            n_scale = self.model.b_var.shape[0]
+            self._hessian_bb_last = np.full([self.model.model_vars.n_features, n_scale, n_scale], np.nan)
+        self._hessian_bb_last[idx] = hessian
+
+    @staticmethod
+    def _feature_chunks(idx, chunk_size):
+        """
+        Split feature indices into consecutive chunks of at most `chunk_size` features.
+
+        :param idx: Feature indices.
+        :param chunk_size: Maximum number of features per chunk, one chunk if None.
+        """
+        idx = np.asarray(idx)
+        if chunk_size is None or idx.size <= chunk_size:
+            return [idx]
+        return [idx[start:(start + chunk_size)] for start in range(0, idx.size, chunk_size)]
+
+    def _ll_byfeature_j(self, idx, chunk_size):
+        """
+        Log-likelihood of a subset of features evaluated in chunks of features.
+        """
+        return np.concatenate([
+            self._sum_over_observations(lambda model: model.ll_byfeature_j(j=j))
+            for j in self._feature_chunks(idx=idx, chunk_size=chunk_size)
+        ], axis=0)
+
+    def _sum_over_observations(self, fn):
+        """
+        Evaluate a quantity that is summed over observations, such as a log-likelihood, score or X^T*W*X.
+
+        For on-disk input data, the quantity is evaluated on the model of each block of observations and summed
+        over blocks, so that observation-wise quantities are only held for one block at a time. Quantities that
+        are needed together should be evaluated in one call to read the data only once.
+
+        :param fn: Callable that evaluates the quantity on a model, may return a tuple of arrays.
+        :return: fn(self.model) or the sum of fn over the models of all blocks
+        """
+        if not self.input_data.is_chunked:
+            return fn(self.model)
+        total = None
+        for model in self.model.observation_blocks():
+            value = fn(model)
+            if total is None:
+                total = value
+            elif isinstance(value, tuple):
+                total = tuple([t + v for t, v in zip(total, value)])
+            else:
+                total = total + value
+        return total
+
+    def _train_sharded(
+            self,
+            max_steps: int,
+            update_b_freq: int,
+            n_jobs: int,
+            chunk_size: int = None,
+            adaptive_b: bool = True,
+            max_line_search: int = 10,
+            lltol: float = None,
+            xtol_loc: float = None,
+            xtol_scale: float = None,
+            gtol_loc: float = None,
+            gtol_scale: float = None,
+            max_steps_by_feature=None,
+            min_nnz: int = None,
+            checkpoint_path: str = None,
+            checkpoint_interval: float = None,
+            resume_from: str = None
+    ):
+        """
+        Train shards of the features in worker processes and gather the results.
+
+        Features are independent so that each shard is trained as in `train()`. The log-likelihood
+        trace of shards that finished earlier is continued with their final value.
+        """
+        results = fit_sharded(
+            estimator=self,
+            n_jobs=n_jobs,
+            train_args={
+                "max_steps": max_steps,
+                "update_b_freq": update_b_freq,
+                "chunk_size": chunk_size,
+                "adaptive_b": adaptive_b,
+                "max_line_search": max_line_search,
+                "lltol": lltol,
+                "xtol_loc": xtol_loc,
+                "xtol_scale": xtol_scale,
+                "gtol_loc": gtol_loc,
+                "gtol_scale": gtol_scale,
+                "max_steps_by_feature": max_steps_by_feature,
+                "min_nnz": min_nnz,
+                "checkpoint_path": checkpoint_path,
+                "checkpoint_interval": checkpoint_interval,
+                "resume_from": resume_from
+            }
+        )
+        self.steps_by_feature = np.concatenate([r["steps_by_feature"] for r in results], axis=0)
+        self.model.a_var = np.concatenate([r["a_var"] for r in results], axis=1)
+        self.model.b_var = np.concatenate([r["b_var"] for r in results], axis=1)
+        self.model.converged = np.concatenate([r["converged"] for r in results], axis=0)
+        self._gather_solver_paths(results=results)
+        n_steps = max([len(r["lls"]) for r in results])
+        for i in range(n_steps):
+            self.lls.append(np.concatenate([r["lls"][min(i, len(r["lls"]) - 1)] for r in results], axis=0))
+
+    def _gather_solver_paths(self, results):
+        """
+        Concatenate the solver strategies of the features of all shards.
+        """
+        keys = set([key for r in results for key in r["solver_paths"].keys()])
+        for key in keys:
+            self._solver_paths[key] = np.concatenate([
+                r["solver_paths"][key] if key in r["solver_paths"].keys()
+                else np.full([r["a_var"].shape[1]], "", dtype="<U8")
+                for r in results
+            ], axis=0)
+
+    def iwls_update(
+            self,
+            idx: np.ndarray,
+            ll: np.ndarray,
+            lltol: float,
+            max_line_search: int = 10
+    ):
+        """
+        Update the location model of features with a line search along their IWLS steps.
+
+        Steps that decrease the log-likelihood are halved feature by feature until they do not, decreases
+        by less than the relative tolerance `lltol` are accepted. Features without such a step keep their current
+        location model. Full steps whose increase of the log-likelihood exceeds the increase predicted by the
+        quadratic model by `pkg_constants.IRLS_EXPANSION_RATIO` are doubled as long as the log-likelihood
+        increases by more than the tolerance: far from the optimum, e.g. for count models with a strongly
+        overestimated mean, IWLS steps are too short by orders of magnitude.
+
+        In reduced precision, the log-likelihood is only resolved up to rounding of the linker-space predictions
+        and the tolerance is raised as in `_xtol()`.
+
+        :param idx: Indices of features to update.
+        :param ll: (features,) log-likelihood of these features at the current parameters.
+        :param lltol: Relative tolerance on the log-likelihood.
+        :param max_line_search: Maximum number of step halvings and of step doublings.
+        :return: tuple of ((features,) log-likelihood at the updated parameters,
+            (features,) norm of the change of the location model)
+        """
+        idx = np.asarray(idx)
+        ll = ll.copy()
+        if idx.size == 0:
+            return ll, np.zeros([0])
+        lltol = self._xtol(lltol)
+        delta, gain = self._iwls_step(idx=idx)
+        delta = delta[:, idx]  # (inferred param x features)
+        a_var_old = self.model.a_var[:, idx]
+        step = np.ones([idx.size])
+        ll_old = ll.copy()
+        # Halving, todo indexes features of idx without accepted step:
+        todo = np.arange(idx.size)
+        for i in range(max_line_search + 1):
+            if i > 0:
+                step[todo] = 0.5 * step[todo]
+            self.model.a_var_j_setter(value=a_var_old[:, todo] + step[todo] * delta[:, todo], j=idx[todo])
+            ll_proposal = self._sum_over_observations(lambda model: model.ll_byfeature_j(j=idx[todo]))
+            accepted = ll_proposal >= ll[todo] - lltol * np.abs(ll[todo])
+            ll[todo[accepted]] = ll_proposal[accepted]
+            todo = todo[np.logical_not(accepted)]
+            if todo.size == 0:
+                break
+        if todo.size > 0:
+            self.model.a_var_j_setter(value=a_var_old[:, todo], j=idx[todo])
+            step[todo] = 0.
+        # Doubling, todo indexes features of idx whose last doubling was accepted. Gains below the tolerance
+        # are not resolved by the log-likelihood and do not trigger or accept doublings:
+        lltol_abs = lltol * np.abs(ll_old)
+        todo = np.where(np.logical_and(
+            np.logical_and(step == 1., gain > lltol_abs),
+            ll - ll_old > pkg_constants.IRLS_EXPANSION_RATIO * gain
+        ))[0]
+        n_expanded = todo.size
+        for _ in range(max_line_search):
+            if todo.size == 0:
+                break
+            self.model.a_var_j_setter(value=a_var_old[:, todo] + 2. * step[todo] * delta[:, todo], j=idx[todo])
+            ll_proposal = self._sum_over_observations(lambda model: model.ll_byfeature_j(j=idx[todo]))
+            accepted = ll_proposal > ll[todo] + lltol_abs[todo]
+            ll[todo[accepted]] = ll_proposal[accepted]
+            step[todo[accepted]] = 2. * step[todo[accepted]]
+            rejected = todo[np.logical_not(accepted)]
+            self.model.a_var_j_setter(value=a_var_old[:, rejected] + step[rejected] * delta[:, rejected],
+                                      j=idx[rejected])
+            todo = todo[accepted]
+        n_halved = np.sum(step < 1.)
+        if n_halved > 0 or n_expanded > 0:
+            logger.debug("IWLS step halved for %i and expanded for %i of %i features",
+                         n_halved, n_expanded, idx.size)
+        return ll, np.sqrt(np.sum(np.square(step * delta), axis=0))
 
-    def iwls_step(self) -> np.ndarray:
+    def iwls_step(self, idx: np.ndarray = None) -> np.ndarray:
         """
 
+        :param idx: Indices of features to update, all features that are not converged if None.
         :return: (inferred param x features)
         """
-        w = self.model.fim_weight_j(j=self.model.idx_not_converged)  # (observations x features)
-        ybar = self.model.ybar_j(j=self.model.idx_not_converged)  # (observations x features)
+        return self._iwls_step(idx=idx)[0]
+
+    def _iwls_step(self, idx: np.ndarray = None):
+        """
+        IWLS step and the increase of the log-likelihood that it is predicted to yield.
+
+        The IWLS step delta solves F * delta = J for Fisher information F and score J, the quadratic model
+        of the log-likelihood predicts an increase of 0.5 * J^T * delta.
+
+        :param idx: Indices of features to update, all features that are not converged if None.
+        :return: tuple of ((inferred param x features) step, (features,) predicted increase of the
+            log-likelihood of the features in idx)
+        """
+        if idx is None:
+            idx = self.model.idx_not_converged
+
+        def system(model):
+            w = model.fim_weight_j(j=idx)  # (observations x features)
+            ybar = model.ybar_j(j=idx)  # (observations x features)
+            return model.xtwx(w=w, model_a="loc"), model.xtwz(w=w, z=ybar, model="loc")
+
         # Translate to problem of form ax = b for each feature:
         # (in the following, X=design and Y=counts)
         # a=X^T*W*X: ([features] x inferred param)
         # x=theta: ([features] x inferred param)
         # b=X^T*W*Ybar: ([features] x inferred param)
-        xh = np.matmul(self.model.design_loc, self.model.constraints_loc)
-        xhw = np.einsum('ob,of->fob', xh, w)
-        a = np.einsum('fob,oc->fbc', xhw, xh)
-        b = np.einsum('fob,of->fb', xhw, ybar)
-        # Via np.linalg.solve:
+        a, b = self._sum_over_observations(system)
         delta_theta = np.zeros_like(self.model.a_var)
-        delta_theta[:, self.model.idx_not_converged] = np.linalg.solve(a, b).T
-        # Via np.linalg.lsts:
-        #delta_theta[:, self.idx_not_converged] = np.concatenate([
-        #    np.expand_dims(np.linalg.lstsq(a[i, :, :], b[i, :])[0], axis=-1)
-        #    for i in self.idx_not_converged)
-        #], axis=-1)
-        # Via np.linalg.inv:
-        # #delta_theta[:, self.idx_not_converged] = np.concatenate([
-        #    np.expand_dims(np.matmul(np.linalg.inv(a[i, :, :]), b[i, :]), axis=-1)
-        #    for i in self.idx_not_converged)
-        #], axis=-1)
-        return delta_theta
+        # The FIM weights are negative, the negated system is positive definite:
+        delta_theta_j, paths = stacked_solve(a=-a, b=-b, return_paths=True)
+        # Features without a finite solution are not updated:
+        delta_theta_j[paths == "failed", :] = 0.
+        delta_theta[:, idx] = delta_theta_j.T
+        self._record_solver_paths(key="irls", idx=idx, paths=paths)
+        # The score is -b as the FIM weights are negative:
+        gain = - 0.5 * np.sum(delta_theta_j * b, axis=1)
+        return delta_theta, gain
+
+    def _record_solver_paths(self, key, idx, paths):
+        """
+        Record the solver strategy of the selected features.
+
+        :param key: System that was solved.
+        :param idx: Indices of features the system was solved for.
+        :param paths: Strategy of each of the features, see `batchglm.utils.linalg.stacked_solve`.
+        """
+        if key not in self._solver_paths:
+            self._solver_paths[key] = np.full([self.model.model_vars.n_features], "", dtype=paths.dtype)
+        self._solver_paths[key][idx] = paths
+        n_fallback = np.sum(paths != pkg_constants.LINALG_SOLVER)
+        if n_fallback > 0:
+            logger.debug("%s: %i of %i features fell back from %s", key, n_fallback, len(paths),
+                         pkg_constants.LINALG_SOLVER)
 
     def b_step(
+            self,
+            idx: np.ndarray,
+            method: str = "newton"
+    ) -> np.ndarray:
+        """
+        Update the scale model of the selected features.
+
+        :param idx: Indices of features to update.
+        :param method: Optimiser for the scale model:
+
+            - "newton": vectorised safeguarded Newton-Raphson on the score across all features.
+                Scale models with more than one parameter are updated with damped Newton-Raphson steps
+                on the full scale block, see `_b_step_newton_block()`.
+            - "brent": Brent's method run feature by feature, only for one scale parameter.
+            - "linesearch": Wolfe line search run feature by feature, only for one scale parameter.
+        :return: (inferred param x features)
+        """
+        if method.lower() == "newton":
+            if self.model.b_var.shape[0] == 1:
+                return self._b_step_newton(idx=idx)
+            else:
+                return self._b_step_newton_block(idx=idx)
+        elif method.lower() in ["brent", "linesearch"]:
+            if self.model.b_var.shape[0] != 1:
+                raise ValueError("method %s only supports scale models with one parameter" % method)
+            return self._b_step_scalar(idx=idx, linesearch=method.lower() == "linesearch")
+        else:
+            raise ValueError("method %s not recognized" % method)
+
+    def _xtol(self, xtol):
+        """
+        Step tolerance that can be resolved with the precision of observation-wise computations.
+
+        In reduced precision, tolerances are raised to the square root of its machine epsilon.
+        """
+        if self.model.compute_dtype == np.float64:
+            return xtol
+        return max(xtol, float(np.sqrt(np.finfo(self.model.compute_dtype).eps)))
+
+    def _b_step_newton(
+            self,
+            idx: np.ndarray,
+            max_iter: int = 100,
+            max_iter_bracket: int = 10,
+            xtol: float = 1e-8
+    ) -> np.ndarray:
+        """
+        Vectorised safeguarded Newton-Raphson search for the root of the scale model score.
+
+        The score of each feature is first bracketed by expanding steps away from the current value.
+        Newton steps based on the analytic hessian are then taken within the bracket and replaced
+        by bisection if they leave the bracket or if the likelihood is not locally concave.
+        Features without sign change of the score within the search range are set to the end point
+        of the search in ascent direction.
+
+        :param idx: Indices of features to update.
+        :param max_iter: Maximum number of Newton-Raphson iterations.
+        :param max_iter_bracket: Maximum number of bracket expansions.
+        :param xtol: Tolerance on the step size.
+        :return: (inferred param x features)
+        """
+        b_var_new = self.model.b_var.copy()
+        idx = np.asarray(idx)
+        if idx.size == 0:
+            return b_var_new
+        bounds_min, bounds_max = self.model.param_bounds(b_var_new.dtype)
+        xtol = self._xtol(xtol)
+
+        def score(x, j):
+            self.model.b_var_j_setter(value=x, j=j)
+            return self._sum_over_observations(lambda model: model.jac_b_j(j=j))[:, 0]
+
+        def score_and_hessian(x, j):
+            self.model.b_var_j_setter(value=x, j=j)
+            g, h = self._sum_over_observations(lambda model: (model.jac_b_j(j=j), model.hessian_bb_j(j=j)))
+            return g[:, 0], h[:, 0, 0]
+
+        x = b_var_new[0, idx]
+        g = score(x, idx)
+        ascending = g > 0
+        lo = x.copy()
+        hi = x.copy()
+        step = np.ones_like(x)
+        bracketed = g == 0
+        at_bound = np.zeros_like(bracketed)
+        # Expand bracket [lo, hi] with score(lo) > 0 > score(hi):
+        for _ in range(max_iter_bracket):
+            todo = np.where(np.logical_not(np.logical_or(bracketed, at_bound)))[0]
+            if todo.size == 0:
+                break
+            asc = ascending[todo]
+            probe = np.clip(
+                np.where(asc, hi[todo] + step[todo], lo[todo] - step[todo]),
+                bounds_min["b_var"],
+                bounds_max["b_var"]
+            )
+            g_probe = score(probe, idx[todo])
+            sign_change = np.where(asc, g_probe <= 0, g_probe >= 0)
+            lo[todo] = np.where(np.logical_and(asc, sign_change), lo[todo], probe)
+            hi[todo] = np.where(np.logical_and(np.logical_not(asc), sign_change), hi[todo], probe)
+            bracketed[todo] = sign_change
+            at_bound[todo] = np.logical_and(
+                np.logical_not(sign_change),
+                np.logical_or(probe <= bounds_min["b_var"], probe >= bounds_max["b_var"])
+            )
+            step[todo] = 2. * step[todo]
+        # Unbracketed features are left at the end point of the search:
+        x = np.where(bracketed, x, lo)
+
+        # Newton-Raphson iterations safeguarded by bisection:
+        active = np.where(np.logical_and(bracketed, hi - lo > xtol))[0]
+        x[active] = np.where(
+            np.logical_and(x[active] >= lo[active], x[active] <= hi[active]),
+            x[active],
+            0.5 * (lo[active] + hi[active])
+        )
+        for _ in range(max_iter):
+            if active.size == 0:
+                break
+            g, h = score_and_hessian(x[active], idx[active])
+            self._record_hessian_bb(idx=idx[active], hessian=h[:, np.newaxis, np.newaxis])
+            positive = g > 0
+            lo[active] = np.where(positive, x[active], lo[active])
+            hi[active] = np.where(positive, hi[active], x[active])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                x_newton = x[active] - g / h
+            use_newton = np.logical_and(
+                h < 0,
+                np.logical_and(x_newton > lo[active], x_newton < hi[active])
+            )
+            x_new = np.where(use_newton, x_newton, 0.5 * (lo[active] + hi[active]))
+            converged = np.logical_or(
+                np.abs(x_new - x[active]) < xtol,
+                np.logical_or(g == 0, hi[active] - lo[active] < xtol)
+            )
+            x[active] = x_new
+            active = active[np.logical_not(converged)]
+
+        b_var_new[0, idx] = x
+        return b_var_new
+
+    def _b_step_newton_block(
+            self,
+            idx: np.ndarray,
+            max_iter: int = 100,
+            max_halvings: int = 10,
+            max_step: float = 1.,
+            xtol: float = 1e-8
+    ) -> np.ndarray:
+        """
+        Vectorised damped Newton-Raphson ascent on the scale model with more than one parameter.
+
+        Each iteration solves the Newton systems -H_bb * delta = J_b of all active features at once with the
+        stacked solver layer, features whose hessian is not negative definite step along the score instead.
+        Steps are limited to `max_step` per parameter and halved feature by feature until the
+        log-likelihood does not decrease. Features without such a step keep their current value.
+
+        :param idx: Indices of features to update.
+        :param max_iter: Maximum number of Newton-Raphson iterations.
+        :param max_halvings: Maximum number of step halvings per iteration.
+        :param max_step: Maximum change of a parameter in one iteration.
+        :param xtol: Tolerance on the step size.
+        :return: (inferred param x features)
+        """
+        b_var_new = self.model.b_var.copy()
+        idx = np.asarray(idx)
+        if idx.size == 0:
+            return b_var_new
+        bounds_min, bounds_max = self.model.param_bounds(b_var_new.dtype)
+        xtol = self._xtol(xtol)
+
+        x = b_var_new[:, idx]
+        self.model.b_var_j_setter(value=x, j=idx)
+        ll = self._sum_over_observations(lambda model: model.ll_byfeature_j(j=idx))
+        active = np.arange(idx.size)
+        for _ in range(max_iter):
+            if active.size == 0:
+                break
+            # g: (features x inferred param), h: (features x inferred param x inferred param)
+            g, h = self._sum_over_observations(
+                lambda model: (model.jac_b_j(j=idx[active]), model.hessian_bb_j(j=idx[active]))
+            )
+            self._record_hessian_bb(idx=idx[active], hessian=h)
+            delta, paths = stacked_solve(a=-h, b=g, method="cholesky", return_paths=True)
+            not_concave = paths != "cholesky"
+            delta[not_concave, :] = g[not_concave, :]
+            delta /= np.maximum(np.max(np.abs(delta), axis=1, keepdims=True) / max_step, 1.)
+
+            # Step halving by feature, todo indexes features of the active set without accepted step:
+            step = np.ones([active.size])
+            todo = np.arange(active.size)
+            for _ in range(max_halvings + 1):
+                x_proposal = np.clip(
+                    x[:, active[todo]] + step[todo] * delta[todo, :].T,
+                    bounds_min["b_var"],
+                    bounds_max["b_var"]
+                )
+                self.model.b_var_j_setter(value=x_proposal, j=idx[active[todo]])
+                ll_proposal = self._sum_over_observations(
+                    lambda model: model.ll_byfeature_j(j=idx[active[todo]])
+                )
+                accepted = ll_proposal >= ll[active[todo]]
+                x[:, active[todo[accepted]]] = x_proposal[:, accepted]
+                ll[active[todo[accepted]]] = ll_proposal[accepted]
+                todo = todo[np.logical_not(accepted)]
+                if todo.size == 0:
+                    break
+                step[todo] = 0.5 * step[todo]
+            if todo.size > 0:
+                # Reset features without accepted step:
+                self.model.b_var_j_setter(value=x[:, active[todo]], j=idx[active[todo]])
+                step[todo] = 0.
+
+            converged = np.max(np.abs(step[:, np.newaxis] * delta), axis=1) < xtol
+            active = active[np.logical_not(converged)]
+
+        b_var_new[:, idx] = x
+        return b_var_new
+
+    def _b_step_scalar(
             self,
             idx: np.ndarray,
             linesearch: bool = False
@@ -139,11 +1086,11 @@ class EstimatorGlm(_EstimatorGLM, metaclass=abc.ABCMeta):
 
         def cost_b_var(x):
             self.model.b_var_j_setter(value=x, j=j)
-            return - np.sum(self.model.ll_j(j=j))
+            return - np.sum(self._sum_over_observations(lambda model: model.ll_byfeature_j(j=j)))
 
         def grad_b_var(x):
             self.model.b_var_j_setter(value=x, j=j)
-            return - self.model.jac_b_j(j=j)
+            return - self._sum_over_observations(lambda model: model.jac_b_j(j=j))
 
         b_var_new = self.model.b_var.copy()
         for j in idx:
@@ -176,21 +1123,175 @@ class EstimatorGlm(_EstimatorGLM, metaclass=abc.ABCMeta):
 
         return b_var_new
 
-    def finalize(self):
+    def finalize(
+            self,
+            n_jobs: int = 1,
+            block: str = "all",
+            coef_idx=None,
+            diagonal: bool = False,
+            hessian: bool = True,
+            chunk_size: int = None
+    ):
         """
         Evaluate all tensors that need to be exported from session and save these as class attributes
         and close session.
 
         Changes .model entry from tf1-based EstimatorGraph to numpy based Model instance and
         transfers relevant attributes.
+
+        The inverse of the Fisher information can be restricted to the parameters that are needed downstream,
+        the blocks of the inverse account for the cross-terms between location and scale model.
+
+        :param n_jobs: Number of worker processes that evaluate shards of the features in parallel.
+        :param block: Parameter block of the Hessian and of the inverse of the Fisher information:
+            "all", "loc" or "scale".
+        :param coef_idx: Indices of the inferred parameters within `block` whose rows and columns of the inverse
+            of the Fisher information are kept, all if None.
+        :param diagonal: Whether to only keep the diagonal of the selected inverse of the Fisher information,
+            i.e. the variances of the parameter estimates (features x parameters).
+        :param hessian: Whether to keep the Hessian of `block`, `.hessian` is None otherwise. This only saves the
+            memory of the stored Hessians, not their evaluation: the inverse of the Fisher information of any block
+            accounts for the cross-terms between location and scale model and therefore requires all blocks.
+        :param chunk_size: Number of features that are evaluated at once. Defaults to the number of features
+            whose observation-wise weights fit into `pkg_constants.NUMPY_ASSEMBLY_MEMORY_BUDGET`.
+
+        Features that were triaged, see `triage()`, only have their log-likelihood evaluated, their Hessian,
+        inverse of the Fisher information and jacobian are NaN.
         """
+        if block.lower() not in ["all", "loc", "scale"]:
+            raise ValueError("block %s not recognized" % block)
+        if self._feature_triage is None:
+            self.triage()
+        finalize_args = {
+            "block": block,
+            "coef_idx": coef_idx,
+            "diagonal": diagonal,
+            "hessian": hessian,
+            "chunk_size": chunk_size
+        }
+        if n_jobs > 1:
+            results = fit_sharded(estimator=self, n_jobs=n_jobs, finalize_args=finalize_args)
+            if hessian:
+                self._hessian = np.concatenate([r["hessian"] for r in results], axis=0)
+            else:
+                self._hessian = None
+            self._fisher_inv = np.concatenate([r["fisher_inv"] for r in results], axis=0)
+            self._jacobian = np.concatenate([r["jacobian"] for r in results], axis=0)
+            self._log_likelihood = np.concatenate([r["log_likelihood"] for r in results], axis=0)
+            # The log-likelihood of constant features is not defined:
+            self._loss = np.sum(self._log_likelihood[self._feature_triage != "constant"])
+            self._gather_solver_paths(results=results)
+            return
+
         # Read from numpy-IRLS estimator specific model:
+        n_features = self.model.model_vars.n_features
+        if chunk_size is None:
+            # Allow for a few (observations x features) weights and intermediates per chunk, on-disk data
+            # are evaluated by block of observations:
+            n_rows = self.input_data.x.block_size if self.input_data.is_chunked else self.input_data.num_observations
+            chunk_size = pkg_constants.NUMPY_ASSEMBLY_MEMORY_BUDGET // \
+                (8 * np.dtype(np.float64).itemsize * max(n_rows, 1))
+        chunk_size = max(int(chunk_size), 1)
+        idx_fit = np.where(self._feature_triage == "")[0]
+        chunks = []
+        for j in self._feature_chunks(idx=idx_fit, chunk_size=chunk_size):
+            if j.size == 0:
+                continue
+            chunks.append(self._finalize_chunk(
+                j=None if j.size == n_features else j,
+                block=block,
+                coef_idx=coef_idx,
+                diagonal=diagonal,
+                hessian=hessian
+            ))
+            self._record_solver_paths(key="fisher_inv", idx=j, paths=chunks[-1]["solver_paths"])
 
-        self._hessian = self.model.hessian
-        self._fisher_inv = np.linalg.inv(- self._hessian)
-        self._jacobian = np.sum(np.abs(self.model.jac / self.model.x.shape[0]), axis=1)
-        self._log_likelihood = self.model.ll_byfeature
-        self._loss = np.sum(self._log_likelihood)
+        keys = ["fisher_inv", "jacobian", "log_likelihood"] + (["hessian"] if hessian else [])
+        if idx_fit.size == n_features:
+            results = dict([(k, np.concatenate([c[k] for c in chunks], axis=0)) for k in keys])
+        else:
+            shapes = self._finalize_shapes(block=block, coef_idx=coef_idx, diagonal=diagonal)
+            results = dict([(k, np.full([n_features] + shapes[k], np.nan)) for k in keys])
+            for k in keys:
+                if idx_fit.size > 0:
+                    results[k][idx_fit] = np.concatenate([c[k] for c in chunks], axis=0)
+            idx_ll = np.where(np.logical_and(self._feature_triage != "", self._feature_triage != "constant"))[0]
+            if idx_ll.size > 0:
+                results["log_likelihood"][idx_ll] = self._ll_byfeature_j(idx=idx_ll, chunk_size=chunk_size)
+        self._hessian = results["hessian"] if hessian else None
+        self._fisher_inv = results["fisher_inv"]
+        self._jacobian = results["jacobian"]
+        self._log_likelihood = results["log_likelihood"]
+        # The log-likelihood of constant features is not defined:
+        self._loss = np.sum(self._log_likelihood[self._feature_triage != "constant"])
+
+    def _finalize_shapes(self, block: str, coef_idx, diagonal: bool) -> dict:
+        """
+        Shapes of the quantities of `finalize()` of one feature.
+        """
+        n_loc = self.model.a_var.shape[0]
+        n_scale = self.model.b_var.shape[0]
+        n_block = {"all": n_loc + n_scale, "loc": n_loc, "scale": n_scale}[block.lower()]
+        n_coef = n_block if coef_idx is None else np.asarray(coef_idx).size
+        return {
+            "hessian": [n_block, n_block],
+            "fisher_inv": [n_coef] if diagonal else [n_coef, n_coef],
+            "jacobian": [],
+            "log_likelihood": []
+        }
+
+    def _finalize_chunk(
+            self,
+            j,
+            block: str,
+            coef_idx,
+            diagonal: bool,
+            hessian: bool
+    ) -> dict:
+        """
+        Evaluate the quantities of `finalize()` on a chunk of features.
+
+        :param j: Feature indices of the chunk, all features if None.
+        :return: Hessian (if requested), inverse of the Fisher information, jacobian, log-likelihood and
+            solver strategies of the features of the chunk.
+        """
+        # All blocks of the Hessian enter the Schur complements of `stacked_block_inv()`, also without `hessian`:
+        def evaluate(model):
+            if j is None:
+                return model.hessian_aa, model.hessian_ab, model.hessian_bb, model.jac, model.ll_byfeature
+            else:
+                return model.hessian_aa_j(j=j), model.hessian_ab_j(j=j), model.hessian_bb_j(j=j), \
+                    model.jac_j(j=j), model.ll_byfeature_j(j=j)
+
+        h_aa, h_ab, h_bb, jac, ll = self._sum_over_observations(evaluate)
+        block = block.lower()
+        fisher_inv, paths = stacked_block_inv(
+            a_aa=-h_aa,
+            a_ab=-h_ab,
+            a_bb=-h_bb,
+            block={"all": "all", "loc": "a", "scale": "b"}[block],
+            idx=coef_idx,
+            diagonal=diagonal,
+            return_paths=True
+        )
+        result = {
+            "fisher_inv": fisher_inv,
+            "jacobian": np.sum(np.abs(jac / self.input_data.num_observations), axis=1),
+            "log_likelihood": ll,
+            "solver_paths": paths
+        }
+        if hessian:
+            if block == "loc":
+                result["hessian"] = h_aa
+            elif block == "scale":
+                result["hessian"] = h_bb
+            else:
+                h_ba = np.transpose(h_ab, axes=[0, 2, 1])
+                result["hessian"] = np.concatenate([
+                    np.concatenate([h_aa, h_ab], axis=2),
+                    np.concatenate([h_ba, h_bb], axis=2)
+                ], axis=1)
+        return result
 
     @abc.abstractmethod
     def get_model_container(
@@ -1,5 +1,7 @@
 from batchglm.models.base_glm import InputDataGLM, _ModelGLM, _EstimatorGLM
 
 import batchglm.train.tf1.ops as op_utils
-from batchglm.utils.linalg import groupwise_solve_lm
+from batchglm.utils.linalg import groupwise_solve_lm, stacked_xtwx, stacked_xtwz, stacked_solve, stacked_block_inv
+from batchglm.utils.planner import plan_training
+from batchglm.utils.checkpoint import save_checkpoint, load_checkpoint, shard_checkpoint_path, CheckpointTimer
 from batchglm import pkg_constants
\ No newline at end of file
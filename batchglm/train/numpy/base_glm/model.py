@@ -1,7 +1,10 @@
 import abc
+import copy
 import numpy as np
 import logging
 
+from .external import pkg_constants, stacked_xtwx, stacked_xtwz
+
 logger = logging.getLogger("batchglm")
 
 
@@ -9,9 +12,20 @@ class ModelIwls:
 
     def __init__(
             self,
-            model_vars
+            model_vars,
+            dtype="float64"
     ):
+        """
+
+        :param model_vars: Parameters of the model, these are kept in float64.
+        :param dtype: Precision of observation-wise quantities, i.e. of the data, the linker-space
+            predictions and all weights, "float64" or "float32". Reductions of these over observations
+            are accumulated in float64 in either case.
+        """
         self.model_vars = model_vars
+        self.compute_dtype = np.dtype(dtype)
+        if self.compute_dtype not in [np.dtype(np.float32), np.dtype(np.float64)]:
+            raise ValueError("dtype %s not supported, use float32 or float64" % dtype)
         #self.params = np.concatenate(
         #    [
         #        model_vars.init_a_clipped,
@@ -19,6 +33,175 @@ class ModelIwls:
         #    ],
         #    axis=0
         #)
+        self._clear_caches()
+
+    def _clear_caches(self):
+        self._cache = {}
+        self._cache_j = {}
+        self._x_j = None
+
+    def observation_blocks(self):
+        """
+        Iterate over models of the blocks of observations of on-disk input data.
+
+        The models of all blocks share the parameters of this model. Quantities that are summed over observations,
+        such as log-likelihoods, X^T*W*X and X^T*W*z, are sums of these quantities over the blocks.
+        Yields this model if the data are in memory.
+
+        :return: generator of models
+        """
+        if not self.input_data.is_chunked:
+            yield self
+            return
+        for input_data in self.input_data.observation_blocks():
+            model = copy.copy(self)
+            model.input_data = input_data
+            model._clear_caches()
+            yield model
+
+    def _params_version(self, key):
+        """
+        Write counter of the parameter block that a cached quantity depends on.
+
+        :param key: Name of the cached quantity.
+        """
+        if key in ["eta_loc", "location"]:
+            return self.model_vars.a_var_version
+        else:
+            return self.model_vars.b_var_version
+
+    def _cached(self, key, fn):
+        """
+        Evaluate a parameter-dependent quantity once per parameter state.
+
+        The cached value is recomputed once the parameter block it depends on was written to.
+
+        :param key: Name of the cached quantity.
+        :param fn: Callable that computes the quantity.
+        """
+        version = self._params_version(key)
+        if key not in self._cache or self._cache[key][0] != version:
+            self._cache[key] = (version, fn())
+        return self._cache[key][1]
+
+    def _cached_j(self, key, j, fn):
+        """
+        Evaluate a feature-subset of a parameter-dependent quantity once per parameter state.
+
+        Slices the full quantity if that is cached, only the most recent subset is kept otherwise.
+
+        :param key: Name of the cached quantity.
+        :param j: Feature indices.
+        :param fn: Callable that computes the quantity on the feature subset.
+        """
+        version = self._params_version(key)
+        if key in self._cache and self._cache[key][0] == version:
+            return self._cache[key][1][:, j]
+        j_arr = np.asarray(j)
+        j_key = (j_arr.dtype.str, j_arr.tobytes())
+        if key not in self._cache_j or self._cache_j[key][:2] != (version, j_key):
+            self._cache_j[key] = (version, j_key, fn())
+        return self._cache_j[key][2]
+
+    def _to_compute_dtype(self, a, name=None):
+        """
+        Cast an observation-wise quantity to the precision of observation-wise computations.
+
+        Parameter-dependent quantities are clipped to the bounds of the reduced precision so that
+        their inverse linker functions cannot overflow. Nothing is done in float64 mode.
+
+        :param a: Array or sparse matrix.
+        :param name: Name of the parameter bounds to clip to, not clipped if None.
+        """
+        if self.compute_dtype == np.float64 or a.dtype == self.compute_dtype:
+            return a
+        a = a.astype(self.compute_dtype)
+        if name is not None:
+            a = self.np_clip_param(a, name)
+        return a
+
+    @property
+    def x(self):
+        if self.input_data.is_chunked:
+            # Training evaluates the models of blocks of observations, see `observation_blocks()`. On-disk data
+            # are only read at once if quantities of all observations are requested from this model:
+            return self._to_compute_dtype(self.input_data.x.to_memory())
+        return self._to_compute_dtype(self.input_data.x)
+
+    def x_j(self, j):
+        """
+        Data of a subset of features.
+
+        The most recent subset is kept so that the data of the active features is only sliced
+        once while this set does not change.
+
+        :param j: Feature indices.
+        :return: observations x features
+        """
+        j_arr = np.asarray(j)
+        j_key = (j_arr.dtype.str, j_arr.tobytes())
+        if self._x_j is None or self._x_j[0] != j_key:
+            self._x_j = (j_key, self._to_compute_dtype(self.input_data.fetch_x_features(j)))
+        return self._x_j[1]
+
+    @property
+    def eta_loc(self) -> np.ndarray:
+        return self._cached(
+            "eta_loc",
+            lambda: self._to_compute_dtype(super(ModelIwls, self).eta_loc, "eta_loc")
+        )
+
+    @property
+    def eta_scale(self) -> np.ndarray:
+        return self._cached(
+            "eta_scale",
+            lambda: self._to_compute_dtype(super(ModelIwls, self).eta_scale, "eta_scale")
+        )
+
+    def _scale_shared(self, j=None):
+        # Cast before the shared row is broadcast to all observations:
+        eta_shared = super(ModelIwls, self)._scale_shared(j=j)
+        if eta_shared is None:
+            return None
+        return self._to_compute_dtype(eta_shared, "eta_scale")
+
+    @property
+    def location(self):
+        return self._cached("location", lambda: super(ModelIwls, self).location)
+
+    @property
+    def scale(self):
+        return self._cached("scale", lambda: super(ModelIwls, self).scale)
+
+    def eta_loc_j(self, j) -> np.ndarray:
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._cached_j(
+            "eta_loc", j,
+            lambda: self._to_compute_dtype(super(ModelIwls, self).eta_loc_j(j=j), "eta_loc")
+        )
+
+    def eta_scale_j(self, j) -> np.ndarray:
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._cached_j(
+            "eta_scale", j,
+            lambda: self._to_compute_dtype(super(ModelIwls, self).eta_scale_j(j=j), "eta_scale")
+        )
+
+    def location_j(self, j):
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._cached_j("location", j, lambda: super(ModelIwls, self).location_j(j=j))
+
+    def scale_j(self, j):
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._cached_j("scale", j, lambda: super(ModelIwls, self).scale_j(j=j))
 
     @property
     def converged(self):
@@ -40,6 +223,9 @@ class ModelIwls:
     def a_var(self, value):
         self.model_vars.a_var = value
 
+    def a_var_j_setter(self, value, j):
+        self.model_vars.a_var_j_setter(value=value, j=j)
+
     @property
     def b_var(self):
         return self.model_vars.b_var
@@ -65,7 +251,10 @@ class ModelIwls:
 
     @property
     def ll_byfeature(self) -> np.ndarray:
-        return np.sum(self.ll, axis=0)
+        return np.sum(self.ll, axis=0, dtype=np.float64)
+
+    def ll_byfeature_j(self, j) -> np.ndarray:
+        return np.sum(self.ll_j(j=j), axis=0, dtype=np.float64)
 
     @abc.abstractmethod
     def fim_weight(self) -> np.ndarray:
@@ -91,6 +280,66 @@ class ModelIwls:
     def ybar_j(self, j) -> np.ndarray:
         pass
 
+    def _assembly_design(self, model):
+        """
+        Constrained design of the location or scale model used to assemble X^T*W*X and X^T*W*z.
+
+        In grouped mode, i.e. if the input data provides design groups, these are the unique rows of the
+        constrained design and observation-wise weights have to be summed by group.
+
+        :param model: "loc" or "scale".
+        :return: tuple of ((observations or groups) x inferred param, group index of each observation or None)
+        """
+        design_groups = self.input_data.design_groups
+        if design_groups is None:
+            if model == "loc":
+                return self.input_data.design_loc_constrained, None
+            else:
+                return self.input_data.design_scale_constrained, None
+        else:
+            unique_loc, unique_scale, groups = design_groups
+            if model == "loc":
+                return unique_loc, groups
+            else:
+                return unique_scale, groups
+
+    def xtwx(self, w, model_a="loc", model_b=None) -> np.ndarray:
+        """
+        Weighted cross-products of constrained designs X_a^T*W*X_b by feature.
+
+        :param w: (observations x features) weights.
+        :param model_a: Design of first factor: "loc" or "scale".
+        :param model_b: Design of second factor: "loc" or "scale", defaults to `model_a`.
+        :return: (features x inferred param x inferred param)
+        """
+        xa, groups = self._assembly_design(model=model_a)
+        xb = self._assembly_design(model=model_b)[0] if model_b is not None and model_b != model_a else None
+        return stacked_xtwx(
+            xa=xa,
+            w=w,
+            xb=xb,
+            memory_budget=pkg_constants.NUMPY_ASSEMBLY_MEMORY_BUDGET,
+            groups=groups
+        )
+
+    def xtwz(self, w, z=None, model="loc") -> np.ndarray:
+        """
+        Weighted responses of constrained designs X^T*W*z by feature.
+
+        :param w: (observations x features) weights.
+        :param z: (observations x features) working responses, all ones if None.
+        :param model: Design: "loc" or "scale".
+        :return: (features x inferred param)
+        """
+        x, groups = self._assembly_design(model=model)
+        return stacked_xtwz(
+            x=x,
+            w=w,
+            z=z,
+            memory_budget=pkg_constants.NUMPY_ASSEMBLY_MEMORY_BUDGET,
+            groups=groups
+        )
+
     @property
     def fim(self) -> np.ndarray:
         """
@@ -102,12 +351,7 @@ class ModelIwls:
         # design: (observations x observed param)
         # w: (observations x features)
         # fim: (features x inferred param x inferred param)
-        xh = np.matmul(self.design_loc, self.constraints_loc)
-        return np.einsum(
-            'fob,oc->fbc',
-            np.einsum('ob,of->fob', xh, w),
-            xh
-        )
+        return self.xtwx(w=w, model_a="loc")
 
     @abc.abstractmethod
     def hessian_weight_aa(self) -> np.ndarray:
@@ -120,17 +364,31 @@ class ModelIwls:
         :return: (features x inferred param x inferred param)
         """
         w = self.hessian_weight_aa
-        xh = np.matmul(self.design_loc, self.constraints_loc)
-        return np.einsum(
-            'fob,oc->fbc',
-            np.einsum('ob,of->fob', xh, w),
-            xh
-        )
+        return self.xtwx(w=w, model_a="loc")
+
+    @abc.abstractmethod
+    def hessian_weight_aa_j(self, j) -> np.ndarray:
+        pass
+
+    def hessian_aa_j(self, j) -> np.ndarray:
+        """
+
+        :return: (features x inferred param x inferred param)
+        """
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        w = self.hessian_weight_aa_j(j=j)
+        return self.xtwx(w=w, model_a="loc")
 
     @abc.abstractmethod
     def hessian_weight_ab(self) -> np.ndarray:
         pass
 
+    @abc.abstractmethod
+    def hessian_weight_ab_j(self, j) -> np.ndarray:
+        pass
+
     @property
     def hessian_ab(self) -> np.ndarray:
         """
@@ -138,16 +396,27 @@ class ModelIwls:
         :return: (features x inferred param x inferred param)
         """
         w = self.hessian_weight_ab
-        return np.einsum(
-            'fob,oc->fbc',
-            np.einsum('ob,of->fob', np.matmul(self.design_loc, self.constraints_loc), w),
-            np.matmul(self.design_scale, self.constraints_scale)
-        )
+        return self.xtwx(w=w, model_a="loc", model_b="scale")
+
+    def hessian_ab_j(self, j) -> np.ndarray:
+        """
+
+        :return: (features x inferred param x inferred param)
+        """
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        w = self.hessian_weight_ab_j(j=j)
+        return self.xtwx(w=w, model_a="loc", model_b="scale")
 
     @abc.abstractmethod
     def hessian_weight_bb(self) -> np.ndarray:
         pass
 
+    @abc.abstractmethod
+    def hessian_weight_bb_j(self, j) -> np.ndarray:
+        pass
+
     @property
     def hessian_bb(self) -> np.ndarray:
         """
@@ -155,12 +424,18 @@ class ModelIwls:
         :return: (features x inferred param x inferred param)
         """
         w = self.hessian_weight_bb
-        xh = np.matmul(self.design_scale, self.constraints_scale)
-        return np.einsum(
-            'fob,oc->fbc',
-            np.einsum('ob,of->fob', xh, w),
-            xh
-        )
+        return self.xtwx(w=w, model_a="scale")
+
+    def hessian_bb_j(self, j) -> np.ndarray:
+        """
+
+        :return: (features x inferred param x inferred param)
+        """
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        w = self.hessian_weight_bb_j(j=j)
+        return self.xtwx(w=w, model_a="scale")
 
     @property
     def hessian(self) -> np.ndarray:
@@ -181,6 +456,9 @@ class ModelIwls:
     def jac(self) -> np.ndarray:
         return np.concatenate([self.jac_a, self.jac_b], axis=-1)
 
+    def jac_j(self, j) -> np.ndarray:
+        return np.concatenate([self.jac_a_j(j=j), self.jac_b_j(j=j)], axis=-1)
+
     @property
     def jac_a(self) -> np.ndarray:
         """
@@ -189,12 +467,7 @@ class ModelIwls:
         """
         w = self.fim_weight  # (observations x features)
         ybar = self.ybar  # (observations x features)
-        xh = np.matmul(self.design_loc, self.constraints_loc)  # (observations x inferred param)
-        return np.einsum(
-            'fob,of->fb',
-            np.einsum('ob,of->fob', xh, w),
-            ybar
-        )
+        return self.xtwz(w=w, z=ybar, model="loc")
 
     def jac_a_j(self, j) -> np.ndarray:
         """
@@ -206,12 +479,7 @@ class ModelIwls:
             j = [j]
         w = self.fim_weight_j(j=j)  # (observations x features)
         ybar = self.ybar_j(j=j)  # (observations x features)
-        xh = np.matmul(self.design_loc, self.constraints_loc)  # (observations x inferred param)
-        return np.einsum(
-            'fob,of->fb',
-            np.einsum('ob,of->fob', xh, w),
-            ybar
-        )
+        return self.xtwz(w=w, z=ybar, model="loc")
 
     @property
     def jac_b(self) -> np.ndarray:
@@ -220,12 +488,7 @@ class ModelIwls:
         :return: (features x inferred param)
         """
         w = self.jac_weight_b  # (observations x features)
-        xh = np.matmul(self.design_scale, self.constraints_scale)  # (observations x inferred param)
-        return np.einsum(
-            'fob,of->fb',
-            np.einsum('ob,of->fob', xh, w),
-            xh
-        )
+        return self.xtwz(w=w, model="scale")
 
     def jac_b_j(self, j) -> np.ndarray:
         """
@@ -236,9 +499,4 @@ class ModelIwls:
         if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
             j = [j]
         w = self.jac_weight_b_j(j=j)  # (observations x features)
-        xh = np.matmul(self.design_scale, self.constraints_scale)  # (observations x inferred param)
-        return np.einsum(
-            'fob,of->fb',
-            np.einsum('ob,of->fob', xh, w),
-            xh
-        )
+        return self.xtwz(w=w, model="scale")
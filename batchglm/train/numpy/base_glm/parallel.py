@@ -0,0 +1,257 @@
+import logging
+import numpy as np
+import scipy.sparse
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from .external import InputDataGLM, shard_checkpoint_path
+
+logger = logging.getLogger("batchglm")
+
+
+def share_array(a: np.ndarray):
+    """
+    Copy an array into a new shared memory block.
+
+    :param a: Array to share.
+    :return: tuple of (shared memory block, spec to attach to the array in another process)
+    """
+    a = np.ascontiguousarray(a)
+    shm = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+    np.ndarray(a.shape, dtype=a.dtype, buffer=shm.buf)[...] = a
+    return shm, (shm.name, a.shape, a.dtype.str)
+
+
+def attach_array(spec):
+    """
+    Zero-copy view of an array shared with `share_array`.
+
+    The shared memory block is owned and unlinked by the process that created it, the view only
+    stays valid while the returned block is referenced.
+
+    :param spec: Spec returned by `share_array`.
+    :return: tuple of (shared memory block, array)
+    """
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def share_data(x):
+    """
+    Share dense, csr or csc data with worker processes.
+
+    :param x: (observations x features) np.ndarray, scipy.sparse.csr_matrix or scipy.sparse.csc_matrix.
+    :return: tuple of (list of shared memory blocks, spec to attach to the data in another process)
+    """
+    if isinstance(x, (scipy.sparse.csr_matrix, scipy.sparse.csc_matrix)):
+        shared = [share_array(a) for a in [x.data, x.indices, x.indptr]]
+        return [s[0] for s in shared], (x.format, [s[1] for s in shared], x.shape)
+    else:
+        shm, spec = share_array(np.asarray(x))
+        return [shm], ("dense", [spec], x.shape)
+
+
+def attach_data(spec):
+    """
+    Data shared with `share_data`.
+
+    :param spec: Spec returned by `share_data`.
+    :return: tuple of (list of shared memory blocks, data)
+    """
+    kind, array_specs, shape = spec
+    attached = [attach_array(s) for s in array_specs]
+    arrays = [a[1] for a in attached]
+    if kind == "csr":
+        x = scipy.sparse.csr_matrix((arrays[0], arrays[1], arrays[2]), shape=shape, copy=False)
+    elif kind == "csc":
+        x = scipy.sparse.csc_matrix((arrays[0], arrays[1], arrays[2]), shape=shape, copy=False)
+    else:
+        x = arrays[0]
+    return [a[0] for a in attached], x
+
+
+def feature_slice(x, start: int, stop: int):
+    """
+    Contiguous range of features of dense or csc data without copying the data.
+
+    Basic slicing of dense data is a view already. Column slices of csc data built by scipy copy the
+    stored entries, and so does the csc constructor for views on a small part of larger arrays. The slice
+    is therefore assembled from views on the stored entries of the range.
+
+    :param x: (observations x features) np.ndarray or scipy.sparse.csc_matrix.
+    :return: (observations x features of range) np.ndarray or scipy.sparse.csc_matrix
+    """
+    if not isinstance(x, scipy.sparse.csc_matrix):
+        return x[:, start:stop]
+    begin, end = x.indptr[start], x.indptr[stop]
+    x_slice = scipy.sparse.csc_matrix((x.shape[0], stop - start), dtype=x.dtype)
+    x_slice.data = x.data[begin:end]
+    x_slice.indices = x.indices[begin:end]
+    x_slice.indptr = x.indptr[start:stop + 1] - begin
+    return x_slice
+
+
+def feature_shards(n_features: int, n_shards: int):
+    """
+    Split features into contiguous shards of similar size.
+
+    :return: list of (start, stop) feature index ranges
+    """
+    bounds = np.linspace(0, n_features, min(max(n_shards, 1), max(n_features, 1)) + 1).astype(int)
+    return [(start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+
+def _fit_shard(task: dict) -> dict:
+    """
+    Fit or finalize an estimator on a shard of features in a worker process.
+
+    :param task: Shard description built by `fit_sharded`.
+    :return: Parameters and training results of the features of the shard.
+    """
+    shms, x = attach_data(task["x"])
+    try:
+        designs = {}
+        for key, spec in task["arrays"].items():
+            shm, designs[key] = attach_array(spec)
+            shms.append(shm)
+        start, stop = task["shard"]
+        # Dense data are a view on the shared memory. Sparse data are shared feature-major so that the shard is a
+        # view on its own stored entries, observation-wise quantities are however evaluated on csr data so that each
+        # worker holds a csr copy of the stored entries of its shard, see `batchglm.utils.planner.plan_training`:
+        x_shard_feature_major = feature_slice(x, start=start, stop=stop)
+        if isinstance(x_shard_feature_major, scipy.sparse.csc_matrix):
+            x_shard = x_shard_feature_major.tocsr()
+        else:
+            x_shard = x_shard_feature_major
+        input_data = InputDataGLM(
+            data=x_shard,
+            design_loc=designs["design_loc"],
+            design_loc_names=task["design_loc_names"],
+            design_scale=designs["design_scale"],
+            design_scale_names=task["design_scale_names"],
+            constraints_loc=task["constraints_loc"],
+            constraints_scale=task["constraints_scale"],
+            size_factors=designs.get("size_factors", None),
+            observation_names=task["observation_names"],
+            feature_names=task["feature_names"]
+        )
+        if isinstance(x_shard_feature_major, scipy.sparse.csc_matrix):
+            # The shared shard serves as feature-major companion instead of a second copy:
+            input_data._x_csc = (input_data.x, x_shard_feature_major)
+        estimator = task["estimator_class"](
+            input_data=input_data,
+            init_a=task["init_a"],
+            init_b=task["init_b"],
+            quick_scale=task["quick_scale"],
+            dtype=task["dtype"]
+        )
+        estimator.model.converged = task["converged"]
+        if task["feature_triage"] is not None:
+            estimator._feature_triage = task["feature_triage"]
+        result = {}
+        if task["train_args"] is not None:
+            train_args = dict(task["train_args"])
+            # Each shard is checkpointed to its own file:
+            for key in ["checkpoint_path", "resume_from"]:
+                if train_args.get(key, None) is not None:
+                    train_args[key] = shard_checkpoint_path(path=train_args[key], shard=task["shard_index"])
+            estimator.train(**train_args)
+            result["lls"] = estimator.lls
+            result["steps_by_feature"] = estimator.steps_by_feature
+        if task["finalize_args"] is not None:
+            estimator.finalize(**task["finalize_args"])
+            result["hessian"] = estimator._hessian
+            result["fisher_inv"] = estimator._fisher_inv
+            result["jacobian"] = estimator._jacobian
+            result["log_likelihood"] = estimator._log_likelihood
+        result["a_var"] = estimator.model.a_var
+        result["b_var"] = estimator.model.b_var
+        result["converged"] = estimator.model.converged
+        result["solver_paths"] = estimator.solver_paths
+        # Drop all views on shared memory before it is closed:
+        del estimator, input_data, x_shard, x_shard_feature_major, designs, x
+    finally:
+        for shm in shms:
+            shm.close()
+    return result
+
+
+def _shard_args(args: dict, start: int, stop: int, n_features: int):
+    """
+    Restrict per-feature (features,) arrays among the arguments to a shard of the features.
+    """
+    if args is None:
+        return None
+    return dict([
+        (k, v[start:stop] if isinstance(v, np.ndarray) and v.shape == (n_features,) else v)
+        for k, v in args.items()
+    ])
+
+
+def fit_sharded(
+        estimator,
+        n_jobs: int,
+        train_args: dict = None,
+        finalize_args: dict = None
+):
+    """
+    Train and/or finalize the features of an estimator in shards on a pool of worker processes.
+
+    The data, design matrices and size factors are placed in shared memory once, each worker
+    fits an estimator of the same class on a view of its shard initialised with the current
+    parameters and convergence state.
+
+    :param estimator: numpy EstimatorGlm.
+    :param n_jobs: Number of worker processes.
+    :param train_args: Arguments of `train()` or None if no training is performed.
+    :param finalize_args: Arguments of `finalize()` or None if the quantities of `finalize()` are not
+        evaluated in the workers.
+    :return: list of shard results in order of the features
+    """
+    input_data = estimator.input_data
+    shards = feature_shards(n_features=input_data.num_features, n_shards=n_jobs)
+    a_var = estimator.model.a_var
+    b_var = estimator.model.b_var
+    converged = np.asarray(estimator.model.converged)
+
+    shms, x_spec = share_data(input_data.x_feature_major)
+    array_specs = {}
+    try:
+        arrays = {"design_loc": input_data.design_loc, "design_scale": input_data.design_scale}
+        if input_data.size_factors is not None:
+            arrays["size_factors"] = input_data.size_factors
+        for key, a in arrays.items():
+            shm, array_specs[key] = share_array(np.asarray(a))
+            shms.append(shm)
+
+        tasks = [{
+            "x": x_spec,
+            "arrays": array_specs,
+            "shard": (start, stop),
+            "design_loc_names": input_data.design_loc_names,
+            "design_scale_names": input_data.design_scale_names,
+            "observation_names": input_data.observations,
+            "feature_names": input_data.features[start:stop] if input_data.features is not None else None,
+            # Identity constraints are implied, parsing them again would require names of the design parameters:
+            "constraints_loc": None if input_data.constraints_loc_identity else input_data.constraints_loc,
+            "constraints_scale": None if input_data.constraints_scale_identity else input_data.constraints_scale,
+            "estimator_class": type(estimator),
+            "init_a": a_var[:, start:stop],
+            "init_b": b_var[:, start:stop],
+            "converged": converged[start:stop],
+            "feature_triage": None if estimator.feature_triage is None else estimator.feature_triage[start:stop],
+            "quick_scale": not getattr(estimator, "_train_scale", True),
+            "dtype": estimator.dtype,
+            "train_args": _shard_args(train_args, start=start, stop=stop, n_features=input_data.num_features),
+            "finalize_args": finalize_args,
+            "shard_index": i
+        } for i, (start, stop) in enumerate(shards)]
+        logger.debug("fitting %i features in %i shards", input_data.num_features, len(tasks))
+        with ProcessPoolExecutor(max_workers=len(tasks)) as pool:
+            results = list(pool.map(_fit_shard, tasks))
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+    return results
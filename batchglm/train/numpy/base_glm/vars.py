@@ -54,6 +54,10 @@ class ModelVarsGlm:
             axis=0
         )
         self.npar_a = init_a_clipped.shape[0]
+        # Counters of writes to the location and scale block of params,
+        # used to invalidate caches of parameter-dependent quantities.
+        self.a_var_version = 0
+        self.b_var_version = 0
 
         # Properties to follow gene-wise convergence.
         self.converged = np.repeat(a=False, repeats=self.params.shape[1])  # Initialise to non-converged.
@@ -75,6 +79,11 @@ class ModelVarsGlm:
     @a_var.setter
     def a_var(self, value):
         self.params[0:self.npar_a] = value
+        self.a_var_version += 1
+
+    def a_var_j_setter(self, value, j):
+        self.params[0:self.npar_a, j] = value
+        self.a_var_version += 1
 
     @property
     def b_var(self):
@@ -84,9 +93,11 @@ class ModelVarsGlm:
     @b_var.setter
     def b_var(self, value):
         self.params[self.npar_a:] = value
+        self.b_var_version += 1
 
     def b_var_j_setter(self, value, j):
         self.params[self.npar_a:, j] = value
+        self.b_var_version += 1
 
     @abc.abstractmethod
     def param_bounds(self, dtype):
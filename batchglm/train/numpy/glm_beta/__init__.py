@@ -0,0 +1,4 @@
+from .processModel import ProcessModel
+from .vars import ModelVars
+from .estimator import Estimator
+from .model import ModelIwlsBeta
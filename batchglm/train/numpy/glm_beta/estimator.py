@@ -0,0 +1,240 @@
+import logging
+from typing import Union
+import numpy as np
+
+from .external import InputDataGLM, Model, EstimatorGlm
+from .external import closedform_beta_glm_logitmean, closedform_beta_glm_logsamplesize
+
+from .processModel import ProcessModel
+from .vars import ModelVars
+from .model import ModelIwlsBeta
+
+
+class Estimator(EstimatorGlm, ProcessModel):
+    """
+    Estimator for Generalized Linear Models (GLMs) with beta distributed noise.
+    Uses a logit-linker function for loc and a log-linker function for scale.
+    """
+    model: ModelIwlsBeta
+
+    def __init__(
+            self,
+            input_data: InputDataGLM,
+            init_a: Union[np.ndarray, str] = "AUTO",
+            init_b: Union[np.ndarray, str] = "AUTO",
+            quick_scale: bool = False,
+            dtype="float64",
+            init_model=None,
+            keep_converged: bool = False,
+            **kwargs
+    ):
+        """
+        Performs initialisation and creates a new estimator.
+
+        :param input_data: InputDataGLM
+            The input data
+        :param init_a: (Optional)
+            Low-level initial values for a. Can be:
+
+            - str:
+                * "auto": automatically choose best initialization
+                * "standard": initialize intercept with observed mean
+                * "closed_form": try to initialize with closed form
+                * "all_zero": initialize with zeros
+                * "init_model": initialize with another model (see `init_model` parameter)
+            - np.ndarray: direct initialization of 'a'
+        :param init_b: (Optional)
+            Low-level initial values for b. Can be:
+
+            - str:
+                * "auto": automatically choose best initialization
+                * "standard": initialize intercept with moment estimator of the sample size
+                * "closed_form": try to initialize with closed form
+                * "all_zero": initialize with zeros
+                * "init_model": initialize with another model (see `init_model` parameter)
+            - np.ndarray: direct initialization of 'b'
+        :param quick_scale: bool
+            Whether `scale` will be fitted faster and maybe less accurate.
+            Useful in scenarios where fitting the exact `scale` is not absolutely necessary.
+        :param dtype: Numerical precision of observation-wise computations, "float64" or "float32".
+            With "float32", weights and residuals are evaluated in single precision while parameters,
+            normal equations and log-likelihoods by feature are accumulated in float64.
+        :param init_model: (optional)
+            Previously fit estimator or model whose coefficients initialise this estimator if `init_a` or
+            `init_b` are "auto" or "init_model". Features are matched by feature names and coefficients by
+            parameter names, so that the design and the set of features may differ, see `_init_par_from_model()`.
+        :param keep_converged: Whether features of `init_model` with unchanged design keep their convergence
+            state. Converged features are only rechecked by scale model updates, this should only be used if
+            their data did not change, e.g. if features were added.
+        """
+
+        if input_data.size_factors is not None:
+            raise ValueError("size factors are not supported for beta noise models")
+
+        self._train_loc = True
+        self._train_scale = True
+
+        (init_a, init_b) = self.init_par(
+            input_data=input_data,
+            init_a=init_a,
+            init_b=init_b,
+            init_model=init_model
+        )
+        # Parameters and their updates are kept in float64, dtype only sets the precision of
+        # observation-wise computations:
+        init_a = init_a.astype(np.float64)
+        init_b = init_b.astype(np.float64)
+        if quick_scale:
+            self._train_scale = False
+
+        self.model_vars = ModelVars(
+            init_a=init_a,
+            init_b=init_b,
+            constraints_loc=input_data.constraints_loc,
+            constraints_scale=input_data.constraints_scale,
+            dtype="float64"
+        )
+        model = ModelIwlsBeta(
+            input_data=input_data,
+            model_vars=self.model_vars,
+            dtype=dtype
+        )
+        super(Estimator, self).__init__(
+            input_data=input_data,
+            model=model,
+            noise_model="beta",
+            dtype=dtype
+        )
+        if init_model is not None and keep_converged:
+            self.model.converged = self._converged_from_model(input_data=input_data, init_model=init_model)
+
+    def get_model_container(
+            self,
+            input_data
+    ):
+        return Model(input_data=input_data)
+
+    def init_par(
+            self,
+            input_data,
+            init_a,
+            init_b,
+            init_model
+    ):
+        r"""
+        standard:
+        Only initialise intercept and keep other coefficients as zero.
+
+        closed-form:
+        Initialize with Maximum Likelihood / Maximum of Momentum estimators
+
+        Idea:
+        $$
+            \theta &= f(x) \\
+            \Rightarrow f^{-1}(\theta) &= x \\
+                &= (D \cdot D^{+}) \cdot x \\
+                &= D \cdot (D^{+} \cdot x) \\
+                &= D \cdot x' = f^{-1}(\theta)
+        $$
+        """
+
+        if init_model is None:
+            groupwise_means = None
+            init_a_str = None
+            if isinstance(init_a, str):
+                init_a_str = init_a.lower()
+                # Chose option if auto was chosen
+                if init_a.lower() == "auto":
+                    init_a = "standard"
+
+                if init_a.lower() == "closed_form":
+                    groupwise_means, init_a, rmsd_a = closedform_beta_glm_logitmean(
+                        x=input_data.x,
+                        design_loc=input_data.design_loc,
+                        constraints_loc=input_data.constraints_loc,
+                        size_factors=None,
+                        link_fn=lambda mean: np.log(
+                            1/(1/self.np_clip_param(mean, "mean")-1)
+                        )
+                    )
+
+                    # train mean, if the closed-form solution is inaccurate
+                    self._train_loc = not (np.all(rmsd_a == 0) or rmsd_a.size == 0)
+
+                    logging.getLogger("batchglm").debug("Using closed-form MME initialization for mean")
+                elif init_a.lower() == "standard":
+                    overall_means = np.asarray(input_data.x.mean(axis=0)).flatten()
+                    overall_means = self.np_clip_param(overall_means, "mean")
+
+                    init_a = np.zeros([input_data.num_loc_params, input_data.num_features])
+                    init_a[0, :] = np.log(overall_means/(1-overall_means))
+                    self._train_loc = True
+
+                    logging.getLogger("batchglm").debug("Using standard initialization for mean")
+                elif init_a.lower() == "all_zero":
+                    init_a = np.zeros([input_data.num_loc_params, input_data.num_features])
+                    self._train_loc = True
+
+                    logging.getLogger("batchglm").debug("Using all_zero initialization for mean")
+                else:
+                    raise ValueError("init_a string %s not recognized" % init_a)
+                logging.getLogger("batchglm").debug("Should train mean: %s", self._train_loc)
+
+            if isinstance(init_b, str):
+                if init_b.lower() == "auto":
+                    init_b = "standard"
+
+                if init_b.lower() == "standard":
+                    groupwise_scales, init_b_intercept, rmsd_b = closedform_beta_glm_logsamplesize(
+                        x=input_data.x,
+                        design_scale=input_data.design_scale[:, [0]],
+                        constraints=input_data.constraints_scale[[0], :][:, [0]],
+                        size_factors=None,
+                        groupwise_means=None,
+                        link_fn=lambda samplesize: np.log(self.np_clip_param(samplesize, "samplesize"))
+                    )
+                    init_b = np.zeros([input_data.num_scale_params, input_data.num_features])
+                    init_b[0, :] = init_b_intercept
+
+                    logging.getLogger("batchglm").debug("Using standard-form MME initialization for sample size")
+                elif init_b.lower() == "closed_form":
+                    dmats_unequal = False
+                    if input_data.num_design_loc_params == input_data.num_design_scale_params:
+                        if np.any(input_data.design_loc != input_data.design_scale):
+                            dmats_unequal = True
+
+                    inits_unequal = False
+                    if init_a_str is not None:
+                        if init_a_str != init_b:
+                            inits_unequal = True
+
+                    if inits_unequal or dmats_unequal:
+                        raise ValueError("cannot use closed_form init for scale model " +
+                                         "if scale model differs from loc model")
+
+                    groupwise_scales, init_b, rmsd_b = closedform_beta_glm_logsamplesize(
+                        x=input_data.x,
+                        design_scale=input_data.design_scale,
+                        constraints=input_data.constraints_scale,
+                        size_factors=None,
+                        groupwise_means=groupwise_means,
+                        link_fn=lambda samplesize: np.log(self.np_clip_param(samplesize, "samplesize"))
+                    )
+
+                    logging.getLogger("batchglm").debug("Using closed-form MME initialization for sample size")
+                elif init_b.lower() == "all_zero":
+                    init_b = np.zeros([input_data.num_scale_params, input_data.num_features])
+
+                    logging.getLogger("batchglm").debug("Using standard initialization for sample size")
+                else:
+                    raise ValueError("init_b string %s not recognized" % init_b)
+                logging.getLogger("batchglm").debug("Should train sample size: %s", self._train_scale)
+        else:
+            init_a, init_b = self._init_par_from_model(
+                input_data=input_data,
+                init_model=init_model,
+                init_a=init_a,
+                init_b=init_b
+            )
+
+        return init_a, init_b
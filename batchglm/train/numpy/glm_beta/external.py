@@ -0,0 +1,9 @@
+import batchglm.data as data_utils
+
+from batchglm.models.glm_beta import _EstimatorGLM, InputDataGLM, Model
+from batchglm.models.glm_beta.utils import closedform_beta_glm_logitmean, closedform_beta_glm_logsamplesize
+
+from batchglm import pkg_constants
+
+# import necessary base_glm layers
+from batchglm.train.numpy.base_glm import EstimatorGlm, ModelIwls, ModelVarsGlm, ProcessModelGlm
@@ -0,0 +1,224 @@
+import logging
+import numpy as np
+import scipy.special
+
+from .external import Model, ModelIwls, InputDataGLM
+from .processModel import ProcessModel
+
+logger = logging.getLogger(__name__)
+
+
+class ModelIwlsBeta(ModelIwls, Model, ProcessModel):
+    """
+    Beta noise with logit link for the mean and log link for the sample size phi.
+
+    Weights are written in terms of p = mean * phi and q = (1 - mean) * phi and the sufficient statistics
+    log(x) and log(1 - x). The IWLS working response of the mean model is based on
+    y* = logit(x), which has expectation mu* = digamma(p) - digamma(q).
+    """
+
+    def __init__(
+            self,
+            input_data: InputDataGLM,
+            model_vars,
+            dtype,
+    ):
+        super(Model, self).__init__(
+            input_data=input_data
+        )
+        ModelIwls.__init__(
+            self=self,
+            model_vars=model_vars,
+            dtype=dtype
+        )
+
+    @staticmethod
+    def _dense(x):
+        """
+        The weights of the beta model are not defined at x=0, sparse data are densified.
+
+        Observations are clipped to the open unit interval of their precision as values close to
+        one can round to one in float32.
+
+        :return: observations x features
+        """
+        if not isinstance(x, np.ndarray):
+            x = x.toarray()
+        finfo = np.finfo(x.dtype)
+        return np.clip(x, finfo.tiny, 1. - finfo.epsneg)
+
+    @staticmethod
+    def _mean(eta_loc):
+        """
+        Mean and one minus mean, both are evaluated in linker space to avoid cancellation close to one.
+        """
+        return scipy.special.expit(eta_loc), scipy.special.expit(-eta_loc)
+
+    @property
+    def fim_weight(self):
+        """
+
+        :return: observations x features
+        """
+        return self._fim_weight(eta_loc=self.eta_loc, scale=self.scale)
+
+    def fim_weight_j(self, j):
+        """
+
+        :return: observations x features
+        """
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._fim_weight(eta_loc=self.eta_loc_j(j=j), scale=self.scale_j(j=j))
+
+    def _fim_weight(self, eta_loc, scale):
+        mean, one_minus_mean = self._mean(eta_loc)
+        trigamma_sum = scipy.special.polygamma(n=1, x=mean * scale) + \
+            scipy.special.polygamma(n=1, x=one_minus_mean * scale)
+        return - np.square(mean * one_minus_mean * scale) * trigamma_sum
+
+    @property
+    def ybar(self) -> np.ndarray:
+        """
+
+        :return: observations x features
+        """
+        return self._ybar(x=self.x, eta_loc=self.eta_loc, scale=self.scale)
+
+    def ybar_j(self, j) -> np.ndarray:
+        """
+
+        :return: observations x features
+        """
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._ybar(x=self.x_j(j=j), eta_loc=self.eta_loc_j(j=j), scale=self.scale_j(j=j))
+
+    def _ybar(self, x, eta_loc, scale):
+        x = self._dense(x)
+        mean, one_minus_mean = self._mean(eta_loc)
+        p = mean * scale
+        q = one_minus_mean * scale
+        trigamma_sum = scipy.special.polygamma(n=1, x=p) + scipy.special.polygamma(n=1, x=q)
+        ystar_residual = np.log(x) - np.log1p(-x) - scipy.special.digamma(p) + scipy.special.digamma(q)
+        return ystar_residual / (mean * one_minus_mean * scale * trigamma_sum)
+
+    @property
+    def jac_weight_b(self):
+        """
+
+        :return: observations x features
+        """
+        return self._jac_weight_b(x=self.x, eta_loc=self.eta_loc, scale=self.scale)
+
+    def jac_weight_b_j(self, j):
+        """
+
+        :return: observations x features
+        """
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._jac_weight_b(x=self.x_j(j=j), eta_loc=self.eta_loc_j(j=j), scale=self.scale_j(j=j))
+
+    def _jac_weight_b(self, x, eta_loc, scale):
+        x = self._dense(x)
+        mean, one_minus_mean = self._mean(eta_loc)
+        return scale * (
+            scipy.special.digamma(scale) -
+            mean * (scipy.special.digamma(mean * scale) - np.log(x)) -
+            one_minus_mean * (scipy.special.digamma(one_minus_mean * scale) - np.log1p(-x))
+        )
+
+    @property
+    def hessian_weight_ab(self):
+        return self._hessian_weight_ab(x=self.x, eta_loc=self.eta_loc, scale=self.scale)
+
+    def hessian_weight_ab_j(self, j):
+        """
+
+        :return: observations x features
+        """
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._hessian_weight_ab(x=self.x_j(j=j), eta_loc=self.eta_loc_j(j=j), scale=self.scale_j(j=j))
+
+    def _hessian_weight_ab(self, x, eta_loc, scale):
+        x = self._dense(x)
+        mean, one_minus_mean = self._mean(eta_loc)
+        p = mean * scale
+        q = one_minus_mean * scale
+        ystar_residual = np.log(x) - np.log1p(-x) - scipy.special.digamma(p) + scipy.special.digamma(q)
+        return mean * one_minus_mean * scale * (
+            ystar_residual -
+            scale * (mean * scipy.special.polygamma(n=1, x=p) - one_minus_mean * scipy.special.polygamma(n=1, x=q))
+        )
+
+    @property
+    def hessian_weight_aa(self):
+        return self._hessian_weight_aa(x=self.x, eta_loc=self.eta_loc, scale=self.scale)
+
+    def hessian_weight_aa_j(self, j):
+        """
+
+        :return: observations x features
+        """
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._hessian_weight_aa(x=self.x_j(j=j), eta_loc=self.eta_loc_j(j=j), scale=self.scale_j(j=j))
+
+    def _hessian_weight_aa(self, x, eta_loc, scale):
+        x = self._dense(x)
+        mean, one_minus_mean = self._mean(eta_loc)
+        p = mean * scale
+        q = one_minus_mean * scale
+        ystar_residual = np.log(x) - np.log1p(-x) - scipy.special.digamma(p) + scipy.special.digamma(q)
+        trigamma_sum = scipy.special.polygamma(n=1, x=p) + scipy.special.polygamma(n=1, x=q)
+        return mean * one_minus_mean * scale * (
+            (one_minus_mean - mean) * ystar_residual -
+            mean * one_minus_mean * scale * trigamma_sum
+        )
+
+    @property
+    def hessian_weight_bb(self):
+        return self._hessian_weight_bb(x=self.x, eta_loc=self.eta_loc, scale=self.scale)
+
+    def hessian_weight_bb_j(self, j):
+        """
+
+        :return: observations x features
+        """
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._hessian_weight_bb(x=self.x_j(j=j), eta_loc=self.eta_loc_j(j=j), scale=self.scale_j(j=j))
+
+    def _hessian_weight_bb(self, x, eta_loc, scale):
+        mean, one_minus_mean = self._mean(eta_loc)
+        const = scipy.special.polygamma(n=1, x=scale) - \
+            np.square(mean) * scipy.special.polygamma(n=1, x=mean * scale) - \
+            np.square(one_minus_mean) * scipy.special.polygamma(n=1, x=one_minus_mean * scale)
+        return self._jac_weight_b(x=x, eta_loc=eta_loc, scale=scale) + np.square(scale) * const
+
+    def _ll(self, x, eta_loc, scale):
+        x = self._dense(x)
+        mean, one_minus_mean = self._mean(eta_loc)
+        p = mean * scale
+        q = one_minus_mean * scale
+        ll = scipy.special.gammaln(scale) - scipy.special.gammaln(p) - scipy.special.gammaln(q) + \
+            (p - 1.) * np.log(x) + (q - 1.) * np.log1p(-x)
+        return self.np_clip_param(ll, "ll")
+
+    @property
+    def ll(self):
+        return self._ll(x=self.x, eta_loc=self.eta_loc, scale=self.scale)
+
+    def ll_j(self, j):
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._ll(x=self.x_j(j=j), eta_loc=self.eta_loc_j(j=j), scale=self.scale_j(j=j))
@@ -0,0 +1,45 @@
+import numpy as np
+
+from .external import ProcessModelGlm
+from .external import pkg_constants
+
+
+class ProcessModel(ProcessModelGlm):
+
+    def param_bounds(
+            self,
+            dtype
+    ):
+        dtype = np.dtype(dtype)
+        dmin = np.finfo(dtype).min
+        dmax = np.finfo(dtype).max
+        dtype = dtype.type
+
+        zero = np.nextafter(0, np.inf, dtype=dtype)
+        one = np.nextafter(1, -np.inf, dtype=dtype)
+
+        sf = dtype(pkg_constants.ACCURACY_MARGIN_RELATIVE_TO_LIMIT)
+        bounds_min = {
+            "a_var": np.log(zero / (1 - zero)) / sf,
+            "b_var": np.log(zero) / sf,
+            "eta_loc": np.log(zero / (1 - zero)) / sf,
+            "eta_scale": np.log(zero) / sf,
+            "loc": np.nextafter(0, np.inf, dtype=dtype),
+            "scale": np.nextafter(0, np.inf, dtype=dtype),
+            "mean": np.nextafter(0, np.inf, dtype=dtype),
+            "samplesize": np.nextafter(0, np.inf, dtype=dtype),
+            "ll": np.nextafter(-dmax, np.inf, dtype=dtype) / sf,
+        }
+        bounds_max = {
+            "a_var": np.log(one / (1 - one)) / sf,
+            "b_var": np.nextafter(np.log(dmax), -np.inf, dtype=dtype) / sf,
+            "eta_loc": np.log(one / (1 - one)) / sf,
+            "eta_scale": np.nextafter(np.log(dmax), -np.inf, dtype=dtype) / sf,
+            "loc": one,
+            "scale": np.nextafter(dmax, -np.inf, dtype=dtype) / sf,
+            "mean": one,
+            "samplesize": np.nextafter(dmax, -np.inf, dtype=dtype) / sf,
+            # The density of the beta distribution is not bounded by one:
+            "ll": np.nextafter(dmax, -np.inf, dtype=dtype) / sf,
+        }
+        return bounds_min, bounds_max
@@ -23,6 +23,8 @@ class Estimator(EstimatorGlm):
             init_b: Union[np.ndarray, str] = "AUTO",
             quick_scale: bool = False,
             dtype="float64",
+            init_model=None,
+            keep_converged: bool = False,
             **kwargs
     ):
         """
@@ -53,7 +55,16 @@ class Estimator(EstimatorGlm):
         :param quick_scale: bool
             Whether `scale` will be fitted faster and maybe less accurate.
             Useful in scenarios where fitting the exact `scale` is not absolutely necessary.
-        :param dtype: Numerical precision.
+        :param dtype: Numerical precision of observation-wise computations, "float64" or "float32".
+            With "float32", weights and residuals are evaluated in single precision while parameters,
+            normal equations and log-likelihoods by feature are accumulated in float64.
+        :param init_model: (optional)
+            Previously fit estimator or model whose coefficients initialise this estimator if `init_a` or
+            `init_b` are "auto" or "init_model". Features are matched by feature names and coefficients by
+            parameter names, so that the design and the set of features may differ, see `_init_par_from_model()`.
+        :param keep_converged: Whether features of `init_model` with unchanged design keep their convergence
+            state. Converged features are only rechecked by scale model updates, this should only be used if
+            their data did not change, e.g. if features were added.
         """
 
         self._train_loc = True
@@ -63,10 +74,12 @@ class Estimator(EstimatorGlm):
             input_data=input_data,
             init_a=init_a,
             init_b=init_b,
-            init_model=None
+            init_model=init_model
         )
-        init_a = init_a.astype(dtype)
-        init_b = init_b.astype(dtype)
+        # Parameters and their updates are kept in float64, dtype only sets the precision of
+        # observation-wise computations:
+        init_a = init_a.astype(np.float64)
+        init_b = init_b.astype(np.float64)
         if quick_scale:
             self._train_scale = False
 
@@ -75,7 +88,7 @@ class Estimator(EstimatorGlm):
             init_b=init_b,
             constraints_loc=input_data.constraints_loc,
             constraints_scale=input_data.constraints_scale,
-            dtype=dtype
+            dtype="float64"
         )
         model = ModelIwlsNb(
             input_data=input_data,
@@ -87,8 +100,11 @@ class Estimator(EstimatorGlm):
         super(Estimator, self).__init__(
             input_data=input_data,
             model=model,
+            noise_model="nb",
             dtype=dtype
         )
+        if init_model is not None and keep_converged:
+            self.model.converged = self._converged_from_model(input_data=input_data, init_model=init_model)
 
     def get_model_container(
             self,
@@ -225,32 +241,11 @@ class Estimator(EstimatorGlm):
                 else:
                     raise ValueError("init_b string %s not recognized" % init_b)
         else:
-            # Locations model:
-            if isinstance(init_a, str) and (init_a.lower() == "auto" or init_a.lower() == "init_model"):
-                my_loc_names = set(input_data.loc_names)
-                my_loc_names = my_loc_names.intersection(set(init_model.input_data.loc_names))
-
-                init_loc = np.zeros([input_data.num_loc_params, input_data.num_features])
-                for parm in my_loc_names:
-                    init_idx = np.where(init_model.input_data.loc_names == parm)[0]
-                    my_idx = np.where(input_data.loc_names == parm)[0]
-                    init_loc[my_idx] = init_model.a_var[init_idx]
-
-                init_a = init_loc
-                logging.getLogger("batchglm").debug("Using initialization based on input model for mean")
-
-            # Scale model:
-            if isinstance(init_b, str) and (init_b.lower() == "auto" or init_b.lower() == "init_model"):
-                my_scale_names = set(input_data.scale_names)
-                my_scale_names = my_scale_names.intersection(init_model.input_data.scale_names)
-
-                init_scale = np.zeros([input_data.num_scale_params, input_data.num_features])
-                for parm in my_scale_names:
-                    init_idx = np.where(init_model.input_data.scale_names == parm)[0]
-                    my_idx = np.where(input_data.scale_names == parm)[0]
-                    init_scale[my_idx] = init_model.b_var[init_idx]
-
-                init_b = init_scale
-                logging.getLogger("batchglm").debug("Using initialization based on input model for dispersion")
+            init_a, init_b = self._init_par_from_model(
+                input_data=input_data,
+                init_model=init_model,
+                init_a=init_a,
+                init_b=init_b
+            )
 
         return init_a, init_b
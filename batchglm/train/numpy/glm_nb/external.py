@@ -4,7 +4,7 @@ from batchglm.models.glm_nb import _EstimatorGLM, InputDataGLM, Model
 from batchglm.models.base_glm.utils import closedform_glm_mean, closedform_glm_scale
 from batchglm.models.glm_nb.utils import closedform_nb_glm_logmu, closedform_nb_glm_logphi
 
-from batchglm.utils.linalg import groupwise_solve_lm
+from batchglm.utils.linalg import groupwise_solve_lm, stacked_xtwx
 from batchglm import pkg_constants
 
 # import necessary base_glm layers
@@ -2,7 +2,7 @@ import logging
 import numpy as np
 import scipy.special
 
-from .external import Model, ModelIwls, InputDataGLM
+from .external import Model, ModelIwls, InputDataGLM, stacked_xtwx
 from .processModel import ProcessModel
 
 logger = logging.getLogger(__name__)
@@ -29,8 +29,10 @@ class ModelIwlsNb(ModelIwls, Model, ProcessModel):
         )
         ModelIwls.__init__(
             self=self,
-            model_vars=model_vars
+            model_vars=model_vars,
+            dtype=dtype
         )
+        self._histogram_j_cache = None
 
     @property
     def fim_weight(self):
@@ -40,20 +42,30 @@ class ModelIwlsNb(ModelIwls, Model, ProcessModel):
         """
         return - self.location * self.scale / (self.scale + self.location)
 
-    @property
-    def ybar(self) -> np.ndarray:
+    def fim_weight_j(self, j):
         """
 
         :return: observations x features
         """
-        return np.asarray(self.x - self.location) / self.location
+        return - self.location_j(j=j) * self.scale_j(j=j) / (self.scale_j(j=j) + self.location_j(j=j))
+
+    @staticmethod
+    def _nonzero(x):
+        """
+        Stored entries of sparse data.
 
-    def fim_weight_j(self, j):
+        :return: (observation indices, feature indices, values)
+        """
+        x = x.tocoo()
+        return x.row, x.col, x.data
+
+    @property
+    def ybar(self) -> np.ndarray:
         """
 
         :return: observations x features
         """
-        return - self.location_j(j=j) * self.scale_j(j=j) / (self.scale_j(j=j) + self.location_j(j=j))
+        return self._ybar(x=self.x, loc=self.location)
 
     def ybar_j(self, j) -> np.ndarray:
         """
@@ -63,7 +75,17 @@ class ModelIwlsNb(ModelIwls, Model, ProcessModel):
         # Make sure that dimensionality of sliced array is kept:
         if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
             j = [j]
-        return np.asarray(self.x[:, j] - self.location_j(j=j)) / self.location_j(j=j)
+        return self._ybar(x=self.x_j(j=j), loc=self.location_j(j=j))
+
+    def _ybar(self, x, loc):
+        if isinstance(x, np.ndarray):
+            return (x - loc) / loc
+        else:
+            # Value at x=0 is -1, correct stored entries:
+            row, col, data = self._nonzero(x)
+            ybar = - np.ones_like(loc)
+            ybar[row, col] += data / loc[row, col]
+            return ybar
 
     @property
     def jac_weight_b(self):
@@ -71,16 +93,7 @@ class ModelIwlsNb(ModelIwls, Model, ProcessModel):
 
         :return: observations x features
         """
-        scale = self.scale
-        loc = self.location
-        scale_plus_x = np.asarray(scale + self.x)
-        r_plus_mu = scale + loc
-
-        # Define graphs for individual terms of constant term of hessian:
-        const1 = scipy.special.digamma(scale_plus_x) - scipy.special.digamma(scale)
-        const2 = - scale_plus_x / r_plus_mu
-        const3 = np.log(scale) + np.ones_like(scale) - np.log(r_plus_mu)
-        return scale * (const1 + const2 + const3)
+        return self._jac_weight_b(x=self.x, loc=self.location, scale=self.scale)
 
     def jac_weight_b_j(self, j):
         """
@@ -90,86 +103,360 @@ class ModelIwlsNb(ModelIwls, Model, ProcessModel):
         # Make sure that dimensionality of sliced array is kept:
         if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
             j = [j]
-        scale = self.scale_j(j=j)
-        loc = self.location_j(j=j)
-        scale_plus_x = np.asarray(scale + self.x[:, j])
-        r_plus_mu = scale + loc
+        return self._jac_weight_b(x=self.x_j(j=j), loc=self.location_j(j=j), scale=self.scale_j(j=j))
 
-        # Define graphs for individual terms of constant term of hessian:
-        const1 = scipy.special.digamma(scale_plus_x) - scipy.special.digamma(scale)
-        const2 = - scale_plus_x / r_plus_mu
-        const3 = np.log(scale) + np.ones_like(scale) - np.log(r_plus_mu)
-        return scale * (const1 + const2 + const3)
+    def _jac_weight_b(self, x, loc, scale):
+        r_plus_mu = scale + loc
+        if isinstance(x, np.ndarray):
+            scale_plus_x = scale + x
+            # Define graphs for individual terms of constant term of hessian:
+            const1 = scipy.special.digamma(scale_plus_x) - scipy.special.digamma(scale)
+            const2 = - scale_plus_x / r_plus_mu
+            const3 = np.log(scale) + np.ones_like(scale) - np.log(r_plus_mu)
+            return scale * (const1 + const2 + const3)
+        else:
+            # Value at x=0, digamma terms cancel:
+            row, col, data = self._nonzero(x)
+            scale_nz = scale[row, col]
+            r_plus_mu_nz = r_plus_mu[row, col]
+            w = np.log(scale) + 1. - scale / r_plus_mu
+            w -= np.log(r_plus_mu)
+            w *= scale
+            # Correct stored entries:
+            w[row, col] += scale_nz * (
+                scipy.special.digamma(scale_nz + data) - scipy.special.digamma(scale_nz) - data / r_plus_mu_nz
+            )
+            return w
 
     @property
     def hessian_weight_ab(self):
-        scale = self.scale
-        loc = self.location
-        return np.multiply(
-            loc * scale,
-            np.asarray(self.x - loc) / np.square(loc + scale)
-        )
+        return self._hessian_weight_ab(x=self.x, loc=self.location, scale=self.scale)
+
+    def hessian_weight_ab_j(self, j):
+        """
+
+        :return: observations x features
+        """
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._hessian_weight_ab(x=self.x_j(j=j), loc=self.location_j(j=j), scale=self.scale_j(j=j))
+
+    def _hessian_weight_ab(self, x, loc, scale):
+        const = loc * scale / np.square(loc + scale)
+        if isinstance(x, np.ndarray):
+            return const * (x - loc)
+        else:
+            # Value at x=0, correct stored entries:
+            row, col, data = self._nonzero(x)
+            w = - const * loc
+            w[row, col] += const[row, col] * data
+            return w
 
     @property
     def hessian_weight_aa(self):
-        scale = self.scale
-        loc = self.location
-        if isinstance(self.x, np.ndarray):
-            x_by_scale_plus_one = self.x / scale + np.ones_like(scale)
-        else:
-            x_by_scale_plus_one = np.asarray(self.x.divide(scale) + np.ones_like(scale))
+        return self._hessian_weight_aa(x=self.x, loc=self.location, scale=self.scale)
+
+    def hessian_weight_aa_j(self, j):
+        """
 
-        return - loc * x_by_scale_plus_one / np.square((loc / scale) + np.ones_like(loc))
+        :return: observations x features
+        """
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._hessian_weight_aa(x=self.x_j(j=j), loc=self.location_j(j=j), scale=self.scale_j(j=j))
+
+    def _hessian_weight_aa(self, x, loc, scale):
+        const = - loc / np.square((loc / scale) + np.ones_like(loc))
+        if isinstance(x, np.ndarray):
+            return const * (x / scale + np.ones_like(scale))
+        else:
+            # Value at x=0, correct stored entries:
+            row, col, data = self._nonzero(x)
+            w = const.copy()
+            w[row, col] += const[row, col] * data / scale[row, col]
+            return w
 
     @property
     def hessian_weight_bb(self):
-        scale = self.scale
-        loc = self.location
-        scale_plus_x = np.asarray(self.x + scale)
+        return self._hessian_weight_bb(x=self.x, loc=self.location, scale=self.scale)
+
+    def hessian_weight_bb_j(self, j):
+        """
+
+        :return: observations x features
+        """
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._hessian_weight_bb(x=self.x_j(j=j), loc=self.location_j(j=j), scale=self.scale_j(j=j))
+
+    def _hessian_weight_bb(self, x, loc, scale):
         scale_plus_loc = scale + loc
-        # Define graphs for individual terms of constant term of hessian:
-        const1 = scipy.special.digamma(scale_plus_x) + scale * scipy.special.polygamma(n=1, x=scale_plus_x)
-        const2 = - scipy.special.digamma(scale) + scale * scipy.special.polygamma(n=1, x=scale)
-        const3 = - loc * scale_plus_x + np.ones_like(scale) * 2. * scale * scale_plus_loc / np.square(scale_plus_loc)
-        const4 = np.log(scale) + np.ones_like(scale) * 2. - np.log(scale_plus_loc)
-        return scale * (const1 + const2 + const3 + const4)
+        if isinstance(x, np.ndarray):
+            scale_plus_x = x + scale
+            # Define graphs for individual terms of constant term of hessian:
+            const1 = scipy.special.digamma(scale_plus_x) + scale * scipy.special.polygamma(n=1, x=scale_plus_x)
+            const2 = - scipy.special.digamma(scale) - scale * scipy.special.polygamma(n=1, x=scale)
+            const3 = - (loc * scale_plus_x + np.ones_like(scale) * 2. * scale * scale_plus_loc) / \
+                np.square(scale_plus_loc)
+            const4 = np.log(scale) + np.ones_like(scale) * 2. - np.log(scale_plus_loc)
+            return scale * (const1 + const2 + const3 + const4)
+        else:
+            # Value at x=0, digamma and polygamma terms cancel:
+            row, col, data = self._nonzero(x)
+            scale_nz = scale[row, col]
+            loc_nz = loc[row, col]
+            scale_plus_loc_nz = scale_plus_loc[row, col]
+            w = - (loc * scale + 2. * scale * scale_plus_loc) / np.square(scale_plus_loc)
+            w += np.log(scale) + 2.
+            w -= np.log(scale_plus_loc)
+            w *= scale
+            # Correct stored entries:
+            scale_plus_x_nz = scale_nz + data
+            w[row, col] += scale_nz * (
+                scipy.special.digamma(scale_plus_x_nz) + scale_nz * scipy.special.polygamma(n=1, x=scale_plus_x_nz) -
+                scipy.special.digamma(scale_nz) - scale_nz * scipy.special.polygamma(n=1, x=scale_nz) -
+                loc_nz * data / np.square(scale_plus_loc_nz)
+            )
+            return w
 
-    @property
-    def ll(self):
-        scale = self.scale
-        loc = self.location
+    def _histogram_j(self, j):
+        """
+        Count histogram entries of a subset of features.
+
+        The most recent subset is kept as the scale model is updated on a fixed set of features.
+
+        :param j: Feature indices.
+        :return: tuple of (position of feature in j, observation group, value, multiplicity) of each entry
+        """
+        j = np.asarray(j)
+        j_key = (j.dtype.str, j.tobytes())
+        if self._histogram_j_cache is None or self._histogram_j_cache[0] != j_key:
+            indptr, group, value, multiplicity = self.input_data.count_histogram
+            starts = indptr[j]
+            lengths = indptr[j + 1] - starts
+            offsets = np.cumsum(lengths) - lengths
+            entries = np.arange(np.sum(lengths)) - np.repeat(offsets - starts, lengths)
+            self._histogram_j_cache = (
+                j_key,
+                (np.repeat(np.arange(j.shape[0]), lengths), group[entries], value[entries], multiplicity[entries])
+            )
+        return self._histogram_j_cache[1]
+
+    def _histogram_weights_j(self, j, kernel):
+        """
+        Evaluate an observation-wise kernel on the count histogram of a subset of features.
+
+        All observations with the same value within an observation group share the kernel value,
+        which is therefore only evaluated once per histogram entry.
+
+        :param j: Feature indices.
+        :param kernel: Callable with arguments x, loc, scale, eta_loc, eta_scale.
+        :return: (observation groups x features) kernel summed over the observations of each group
+        """
+        unique_loc, unique_scale, size_factors, _ = self.input_data.observation_groups
+        pos, group, value, multiplicity = self._histogram_j(j=j)
+        eta_loc = np.matmul(unique_loc, self.a_var[:, j])
+        if size_factors is not None:
+            eta_loc += np.expand_dims(size_factors, axis=1)
+        eta_scale = np.matmul(unique_scale, self.b_var[:, j])
+        # Cast and clip as the observation-wise linear predictors, so that quantities evaluated on the histogram
+        # match those evaluated on the data also in reduced precision:
+        eta_loc = self._to_compute_dtype(eta_loc, "eta_loc")[group, pos]
+        eta_scale = self._to_compute_dtype(eta_scale, "eta_scale")[group, pos]
+        w = kernel(
+            x=value,
+            loc=self.inverse_link_loc(eta_loc),
+            scale=self.inverse_link_scale(eta_scale),
+            eta_loc=eta_loc,
+            eta_scale=eta_scale
+        )
+        n_groups = unique_loc.shape[0]
+        return np.reshape(
+            np.bincount(group * len(j) + pos, weights=w * multiplicity, minlength=n_groups * len(j)),
+            [n_groups, len(j)]
+        )
+
+    def jac_b_j(self, j) -> np.ndarray:
+        """
+        Evaluated on the count histogram if the input data provides one.
+
+        :return: (features x inferred param)
+        """
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        if self.input_data.count_histogram is None:
+            return super(ModelIwlsNb, self).jac_b_j(j=j)
+        w = self._histogram_weights_j(
+            j=j,
+            kernel=lambda x, loc, scale, eta_loc, eta_scale: self._jac_weight_b(x=x, loc=loc, scale=scale)
+        )
+        xh = self.input_data.observation_groups[1]
+        return np.matmul(w.T, xh)
+
+    def hessian_bb_j(self, j) -> np.ndarray:
+        """
+        Evaluated on the count histogram if the input data provides one.
+
+        :return: (features x inferred param x inferred param)
+        """
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        if self.input_data.count_histogram is None:
+            return super(ModelIwlsNb, self).hessian_bb_j(j=j)
+        w = self._histogram_weights_j(
+            j=j,
+            kernel=lambda x, loc, scale, eta_loc, eta_scale: self._hessian_weight_bb(x=x, loc=loc, scale=scale)
+        )
+        xh = self.input_data.observation_groups[1]
+        return stacked_xtwx(xa=xh, w=w)
+
+    def _ll_parameter_terms(self, x, loc, scale, eta_loc, eta_scale):
+        """
+        Log-likelihood without the data-only term -lgamma(x + 1).
+
+        The terms lgamma(r + x) and x * log(r + mu) are of order x * log(x) and cancel, they are
+        therefore evaluated in float64 also if observation-wise quantities are held in reduced precision.
+
+        :return: observations x features
+        """
+        if self.compute_dtype != np.float64:
+            loc, scale, eta_loc, eta_scale = [
+                np.asarray(a, dtype=np.float64) for a in [loc, scale, eta_loc, eta_scale]
+            ]
         log_r_plus_mu = np.log(scale + loc)
-        if isinstance(self.x, np.ndarray):
-            ll = scipy.special.gammaln(scale + self.x) - \
-                 scipy.special.gammaln(self.x + np.ones_like(scale)) - \
+        if isinstance(x, np.ndarray):
+            ll = scipy.special.gammaln(scale + x) - \
                  scipy.special.gammaln(scale) + \
-                 self.x * (self.eta_loc - log_r_plus_mu) + \
-                 np.multiply(scale, self.eta_scale - log_r_plus_mu)
+                 x * (eta_loc - log_r_plus_mu) + \
+                 np.multiply(scale, eta_scale - log_r_plus_mu)
+        else:
+            # Value at x=0 is r*log(r/(r+mu)), lgamma terms cancel:
+            row, col, data = self._nonzero(x)
+            scale_nz = scale[row, col]
+            ll_nz = scipy.special.gammaln(scale_nz + data) - \
+                scipy.special.gammaln(scale_nz) + \
+                data * (eta_loc[row, col] - log_r_plus_mu[row, col])
+            ll = eta_scale - log_r_plus_mu
+            ll *= scale
+            # Correct stored entries:
+            ll[row, col] += ll_nz
+        return ll
+
+    def _lgamma_x_plus_one(self, x):
+        """
+        Data-only term lgamma(x + 1) of the log-likelihood.
+
+        Evaluated in float64 as the parameter terms, it is of the order of x * log(x) and would otherwise
+        differ from the cached sums of the input data and from the count histogram in reduced precision.
+
+        :return: observations x features
+        """
+        if isinstance(x, np.ndarray):
+            return scipy.special.gammaln(np.asarray(x, dtype=np.float64) + 1)
         else:
-            ll = scipy.special.gammaln(np.asarray(scale + self.x)) - \
-                scipy.special.gammaln(self.x + np.ones_like(scale)) - \
-                scipy.special.gammaln(scale) + \
-                np.asarray(self.x.multiply(self.eta_loc - log_r_plus_mu) +
-                           np.multiply(scale, self.eta_scale - log_r_plus_mu))
-        return self.np_clip_param(np.asarray(ll), "ll")
+            row, col, data = self._nonzero(x)
+            lgamma_x_plus_one = np.zeros(x.shape, dtype=np.float64)
+            lgamma_x_plus_one[row, col] = scipy.special.gammaln(np.asarray(data, dtype=np.float64) + 1)
+            return lgamma_x_plus_one
+
+    @property
+    def ll(self):
+        return self._ll_clipped(
+            x=self.x,
+            loc=self.location,
+            scale=self.scale,
+            eta_loc=self.eta_loc,
+            eta_scale=self.eta_scale
+        )
 
     def ll_j(self, j):
         # Make sure that dimensionality of sliced array is kept:
         if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
             j = [j]
-        scale = self.scale_j(j=j)
-        loc = self.location_j(j=j)
-        log_r_plus_mu = np.log(scale + loc)
-        if isinstance(self.x, np.ndarray):
-            ll = scipy.special.gammaln(scale + self.x[:, j]) - \
-                 scipy.special.gammaln(self.x + np.ones_like(scale)) - \
-                 scipy.special.gammaln(scale) + \
-                 self.x[:, j] * (self.eta_loc_j(j=j) - log_r_plus_mu) + \
-                 np.multiply(scale, self.eta_scale_j(j=j) - log_r_plus_mu)
+        return self._ll_clipped(
+            x=self.x_j(j=j),
+            loc=self.location_j(j=j),
+            scale=self.scale_j(j=j),
+            eta_loc=self.eta_loc_j(j=j),
+            eta_scale=self.eta_scale_j(j=j)
+        )
+
+    def _ll_byfeature_clipped(self, x, loc, scale, eta_loc, eta_scale, lgamma_x_plus_one_byfeature):
+        """
+        Log-likelihood summed over observations, clipped observation-wise as in ll.
+
+        lgamma(x + 1) is between 0 and lgamma(max(x) + 1) for each feature, the cached data-only term
+        is therefore exact for all features for which no observation reaches the bounds of the clipping.
+        The data-only term is only evaluated observation-wise for the remaining features.
+
+        :param lgamma_x_plus_one_byfeature: lgamma(x + 1) summed over observations.
+        :return: features
+        """
+        ll = self._ll_parameter_terms(x=x, loc=loc, scale=scale, eta_loc=eta_loc, eta_scale=eta_scale)
+        bounds_min, bounds_max = self.param_bounds(ll.dtype)
+        if isinstance(x, np.ndarray):
+            x_max = np.max(x, axis=0)
         else:
-            ll = scipy.special.gammaln(np.asarray(scale + self.x[:, j])) - \
-                 scipy.special.gammaln(self.x + np.ones_like(scale)) - \
-                 scipy.special.gammaln(scale) + \
-                 np.asarray(self.x[:, j].multiply(self.eta_loc_j(j=j) - log_r_plus_mu) +
-                            np.multiply(scale, self.eta_scale_j(j=j) - log_r_plus_mu))
-        return self.np_clip_param(np.asarray(ll), "ll")
+            x_max = np.asarray(x.max(axis=0).todense()).flatten()
+        ll_byfeature = np.sum(ll, axis=0, dtype=np.float64) - lgamma_x_plus_one_byfeature
+        idx_clip = np.where(np.logical_or(
+            np.max(ll, axis=0) > bounds_max["ll"],
+            np.min(ll, axis=0) - scipy.special.gammaln(x_max + 1) < bounds_min["ll"]
+        ))[0]
+        if len(idx_clip) > 0:
+            ll_clip = ll[:, idx_clip] - self._lgamma_x_plus_one(x=x[:, idx_clip])
+            ll_byfeature[idx_clip] = np.sum(self.np_clip_param(ll_clip, "ll"), axis=0, dtype=np.float64)
+        return ll_byfeature
+
+    def _ll_clipped(self, x, loc, scale, eta_loc, eta_scale):
+        return self.np_clip_param(self._ll_parameter_terms(
+            x=x,
+            loc=loc,
+            scale=scale,
+            eta_loc=eta_loc,
+            eta_scale=eta_scale
+        ) - self._lgamma_x_plus_one(x=x), "ll")
+
+    @property
+    def ll_byfeature(self) -> np.ndarray:
+        """
+        Uses the cached data-only term of the input data instead of evaluating lgamma(x + 1)
+        for all features that are not clipped.
+
+        :return: features
+        """
+        return self._ll_byfeature_clipped(
+            x=self.x,
+            loc=self.location,
+            scale=self.scale,
+            eta_loc=self.eta_loc,
+            eta_scale=self.eta_scale,
+            lgamma_x_plus_one_byfeature=self.input_data.lgamma_x_plus_one_byfeature
+        )
+
+    def ll_byfeature_j(self, j) -> np.ndarray:
+        """
+        Uses the cached data-only term of the input data instead of evaluating lgamma(x + 1)
+        for all features that are not clipped and is evaluated on the count histogram if the input data provides one.
+
+        :return: features
+        """
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        if self.input_data.count_histogram is not None:
+            # lgamma(x + 1) is only evaluated once per histogram entry:
+            return np.sum(self._histogram_weights_j(j=j, kernel=self._ll_clipped), axis=0)
+        return self._ll_byfeature_clipped(
+            x=self.x_j(j=j),
+            loc=self.location_j(j=j),
+            scale=self.scale_j(j=j),
+            eta_loc=self.eta_loc_j(j=j),
+            eta_scale=self.eta_scale_j(j=j),
+            lgamma_x_plus_one_byfeature=self.input_data.lgamma_x_plus_one_byfeature[j]
+        )
@@ -0,0 +1,268 @@
+import logging
+from typing import Union
+import numpy as np
+import scipy.sparse
+
+from .external import InputDataGLM, Model, EstimatorGlm, ChunkedData
+from .external import closedform_norm_glm_logsd
+
+from .processModel import ProcessModel
+from .vars import ModelVars
+from .model import ModelIwlsNorm
+
+
+class Estimator(EstimatorGlm, ProcessModel):
+    """
+    Estimator for Generalized Linear Models (GLMs) with normal noise.
+    Uses the identity as linker function for loc and a log-linker function for scale.
+    """
+    model: ModelIwlsNorm
+    # The scale model is the standard deviation:
+    _constant_scale_bound = "min"
+
+    def __init__(
+            self,
+            input_data: InputDataGLM,
+            init_a: Union[np.ndarray, str] = "AUTO",
+            init_b: Union[np.ndarray, str] = "AUTO",
+            quick_scale: bool = False,
+            dtype="float64",
+            init_model=None,
+            keep_converged: bool = False,
+            **kwargs
+    ):
+        """
+        Performs initialisation and creates a new estimator.
+
+        :param input_data: InputDataGLM
+            The input data
+        :param init_a: (Optional)
+            Low-level initial values for a. Can be:
+
+            - str:
+                * "auto": automatically choose best initialization
+                * "standard": initialize with ordinary least squares estimate
+                * "closed_form": initialize with ordinary least squares estimate
+                * "all_zero": initialize with zeros
+            - np.ndarray: direct initialization of 'a'
+        :param init_b: (Optional)
+            Low-level initial values for b. Can be:
+
+            - str:
+                * "auto": automatically choose best initialization
+                * "standard": initialize intercept with observed standard deviation
+                * "closed_form": try to initialize with closed form
+                * "all_zero": initialize with zeros
+            - np.ndarray: direct initialization of 'b'
+        :param quick_scale: bool
+            Whether `scale` will be fitted faster and maybe less accurate.
+            Useful in scenarios where fitting the exact `scale` is not absolutely necessary.
+        :param dtype: Numerical precision of observation-wise computations, "float64" or "float32".
+            With "float32", weights and residuals are evaluated in single precision while parameters,
+            normal equations and log-likelihoods by feature are accumulated in float64.
+        :param init_model: (optional)
+            Previously fit estimator or model whose coefficients initialise this estimator if `init_a` or
+            `init_b` are "auto" or "init_model". Features are matched by feature names and coefficients by
+            parameter names, so that the design and the set of features may differ, see `_init_par_from_model()`.
+        :param keep_converged: Whether features of `init_model` with unchanged design keep their convergence
+            state. Converged features are only rechecked by scale model updates, this should only be used if
+            their data did not change, e.g. if features were added.
+        """
+
+        self._train_loc = True
+        self._train_scale = True
+
+        (init_a, init_b) = self.init_par(
+            input_data=input_data,
+            init_a=init_a,
+            init_b=init_b,
+            init_model=init_model
+        )
+        # Parameters and their updates are kept in float64, dtype only sets the precision of
+        # observation-wise computations:
+        init_a = init_a.astype(np.float64)
+        init_b = init_b.astype(np.float64)
+        if quick_scale:
+            self._train_scale = False
+
+        self.model_vars = ModelVars(
+            init_a=init_a,
+            init_b=init_b,
+            constraints_loc=input_data.constraints_loc,
+            constraints_scale=input_data.constraints_scale,
+            dtype="float64"
+        )
+        model = ModelIwlsNorm(
+            input_data=input_data,
+            model_vars=self.model_vars,
+            dtype=dtype
+        )
+        super(Estimator, self).__init__(
+            input_data=input_data,
+            model=model,
+            noise_model="norm",
+            dtype=dtype
+        )
+        if init_model is not None and keep_converged:
+            self.model.converged = self._converged_from_model(input_data=input_data, init_model=init_model)
+
+    def get_model_container(
+            self,
+            input_data
+    ):
+        return Model(input_data=input_data)
+
+    def init_par(
+            self,
+            input_data,
+            init_a,
+            init_b,
+            init_model
+    ):
+        r"""
+        standard / closed-form:
+        Initialise location model with ordinary least squares estimate.
+
+        The scale model is initialised with the standard deviation of the residuals of this estimate
+        if the scale model only has an intercept and with moment estimators otherwise.
+        """
+
+        size_factors_init = input_data.size_factors
+        if size_factors_init is not None:
+            size_factors_init = np.expand_dims(size_factors_init, axis=1)
+            size_factors_init = np.broadcast_to(
+                array=size_factors_init,
+                shape=[input_data.num_observations, input_data.num_features]
+            )
+
+        sf_given = False
+        if input_data.size_factors is not None:
+            if np.any(np.abs(input_data.size_factors - 1.) > 1e-8):
+                sf_given = True
+
+        is_ols_model = input_data.design_scale.shape[1] == 1 and \
+            np.all(np.abs(input_data.design_scale - 1.) < 1e-8) and \
+            not sf_given
+
+        if init_model is None:
+            init_a_str = None
+            if isinstance(init_a, str):
+                init_a_str = init_a.lower()
+                # Chose option if auto was chosen
+                if init_a.lower() == "auto":
+                    init_a = "closed_form"
+
+                if init_a.lower() == "closed_form" or init_a.lower() == "standard":
+                    design_constr = input_data.design_loc_constrained
+                    if sf_given:
+                        design_constr = design_constr * np.expand_dims(input_data.size_factors, axis=1)
+                    # Iterate over genes if X is sparse to avoid large sparse tensor.
+                    # If X is dense, the least square problem can be vectorised easily.
+                    # If X is on disk, X^T * design is accumulated over blocks of observations.
+                    if isinstance(input_data.x, ChunkedData):
+                        init_a, rmsd_a, _, _ = np.linalg.lstsq(
+                            np.matmul(design_constr.T, design_constr),
+                            input_data.x.tdot(design_constr),
+                            rcond=None
+                        )
+                    elif isinstance(input_data.x, scipy.sparse.csr_matrix):
+                        init_a, rmsd_a, _, _ = np.linalg.lstsq(
+                            np.matmul(design_constr.T, design_constr),
+                            input_data.x.T.dot(design_constr).T,  # need double .T because of dot product on sparse.
+                            rcond=None
+                        )
+                    else:
+                        init_a, rmsd_a, _, _ = np.linalg.lstsq(
+                            np.matmul(design_constr.T, design_constr),
+                            np.matmul(design_constr.T, input_data.x),
+                            rcond=None
+                        )
+                    if is_ols_model:
+                        self._train_loc = False
+
+                    logging.getLogger("batchglm").debug("Using OLS initialization for location model")
+                elif init_a.lower() == "all_zero":
+                    init_a = np.zeros([input_data.num_loc_params, input_data.num_features])
+                    self._train_loc = True
+
+                    logging.getLogger("batchglm").debug("Using all_zero initialization for mean")
+                else:
+                    raise ValueError("init_a string %s not recognized" % init_a)
+                logging.getLogger("batchglm").debug("Should train location model: %s", self._train_loc)
+
+            if isinstance(init_b, str):
+                if init_b.lower() == "auto":
+                    init_b = "standard"
+
+                if is_ols_model and init_b.lower() in ["standard", "closed_form"]:
+                    # Variance of the residuals of the location model:
+                    if isinstance(input_data.x, (scipy.sparse.csr_matrix, ChunkedData)):
+                        expect_xsq = np.asarray(np.mean(input_data.x.power(2), axis=0)).flatten()
+                        expect_x = np.asarray(np.mean(input_data.x, axis=0)).flatten()
+                    else:
+                        expect_xsq = np.mean(np.square(input_data.x), axis=0)
+                        expect_x = np.mean(input_data.x, axis=0)
+                    mean_model = np.matmul(input_data.design_loc_constrained, init_a)
+                    variance = expect_xsq - 2. * expect_x * np.mean(mean_model, axis=0) + \
+                        np.mean(np.square(mean_model), axis=0)
+                    init_b = np.expand_dims(
+                        np.log(self.np_clip_param(np.sqrt(np.maximum(variance, 0.)), "sd")),
+                        axis=0
+                    )
+                    self._train_scale = False
+
+                    logging.getLogger("batchglm").debug("Using residuals from OLS estimate for variance estimate")
+                elif init_b.lower() == "closed_form":
+                    dmats_unequal = False
+                    if input_data.design_loc.shape[1] == input_data.design_scale.shape[1]:
+                        if np.any(input_data.design_loc != input_data.design_scale):
+                            dmats_unequal = True
+
+                    inits_unequal = False
+                    if init_a_str is not None:
+                        if init_a_str != init_b:
+                            inits_unequal = True
+
+                    if inits_unequal or dmats_unequal:
+                        raise ValueError("cannot use closed_form init for scale model " +
+                                         "if scale model differs from loc model")
+
+                    groupwise_scales, init_b, rmsd_b = closedform_norm_glm_logsd(
+                        x=input_data.x,
+                        design_scale=input_data.design_scale,
+                        constraints=input_data.constraints_scale,
+                        size_factors=size_factors_init,
+                        groupwise_means=None,
+                        link_fn=lambda sd: np.log(self.np_clip_param(sd, "sd"))
+                    )
+
+                    logging.getLogger("batchglm").debug("Using closed-form MME initialization for standard deviation")
+                elif init_b.lower() == "standard":
+                    groupwise_scales, init_b_intercept, rmsd_b = closedform_norm_glm_logsd(
+                        x=input_data.x,
+                        design_scale=input_data.design_scale[:, [0]],
+                        constraints=input_data.constraints_scale[[0], :][:, [0]],
+                        size_factors=size_factors_init,
+                        groupwise_means=None,
+                        link_fn=lambda sd: np.log(self.np_clip_param(sd, "sd"))
+                    )
+                    init_b = np.zeros([input_data.num_scale_params, input_data.num_features])
+                    init_b[0, :] = init_b_intercept
+
+                    logging.getLogger("batchglm").debug("Using closed-form MME initialization for standard deviation")
+                elif init_b.lower() == "all_zero":
+                    init_b = np.zeros([input_data.num_scale_params, input_data.num_features])
+
+                    logging.getLogger("batchglm").debug("Using standard initialization for standard deviation")
+                else:
+                    raise ValueError("init_b string %s not recognized" % init_b)
+                logging.getLogger("batchglm").debug("Should train scale model: %s", self._train_scale)
+        else:
+            init_a, init_b = self._init_par_from_model(
+                input_data=input_data,
+                init_model=init_model,
+                init_a=init_a,
+                init_b=init_b
+            )
+
+        return init_a, init_b
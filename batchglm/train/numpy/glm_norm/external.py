@@ -0,0 +1,10 @@
+import batchglm.data as data_utils
+
+from batchglm.models.glm_norm import _EstimatorGLM, InputDataGLM, Model
+from batchglm.models.glm_norm.utils import closedform_norm_glm_logsd
+from batchglm.models.base import ChunkedData
+
+from batchglm import pkg_constants
+
+# import necessary base_glm layers
+from batchglm.train.numpy.base_glm import EstimatorGlm, ModelIwls, ModelVarsGlm, ProcessModelGlm
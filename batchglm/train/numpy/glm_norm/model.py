@@ -0,0 +1,181 @@
+import logging
+import numpy as np
+
+from .external import Model, ModelIwls, InputDataGLM
+from .processModel import ProcessModel
+
+logger = logging.getLogger(__name__)
+
+
+class ModelIwlsNorm(ModelIwls, Model, ProcessModel):
+    """
+    Normal noise with identity link for the location model and log link for the standard deviation.
+
+    The size factors multiply the location so that the location model is a weighted least squares
+    problem, one IWLS step therefore solves it exactly for a fixed scale model.
+    """
+
+    def __init__(
+            self,
+            input_data: InputDataGLM,
+            model_vars,
+            dtype,
+    ):
+        super(Model, self).__init__(
+            input_data=input_data
+        )
+        ModelIwls.__init__(
+            self=self,
+            model_vars=model_vars,
+            dtype=dtype
+        )
+
+    @staticmethod
+    def _dense(x):
+        """
+        The weights of the normal model do not vanish at x=0, sparse data are densified.
+
+        :return: observations x features
+        """
+        if isinstance(x, np.ndarray):
+            return x
+        else:
+            return x.toarray()
+
+    @property
+    def _sf(self):
+        """
+        Size factors broadcastable against observations x features.
+        """
+        if self.size_factors is None:
+            return 1.
+        else:
+            return self._to_compute_dtype(np.expand_dims(self.size_factors, axis=1))
+
+    @property
+    def fim_weight(self):
+        """
+
+        :return: observations x features
+        """
+        return self._fim_weight(scale=self.scale)
+
+    def fim_weight_j(self, j):
+        """
+
+        :return: observations x features
+        """
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._fim_weight(scale=self.scale_j(j=j))
+
+    def _fim_weight(self, scale):
+        return - np.square(self._sf / scale)
+
+    @property
+    def ybar(self) -> np.ndarray:
+        """
+
+        :return: observations x features
+        """
+        return self._ybar(x=self.x, loc=self.location)
+
+    def ybar_j(self, j) -> np.ndarray:
+        """
+
+        :return: observations x features
+        """
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._ybar(x=self.x_j(j=j), loc=self.location_j(j=j))
+
+    def _ybar(self, x, loc):
+        return (self._dense(x) - loc) / self._sf
+
+    @property
+    def jac_weight_b(self):
+        """
+
+        :return: observations x features
+        """
+        return self._jac_weight_b(x=self.x, loc=self.location, scale=self.scale)
+
+    def jac_weight_b_j(self, j):
+        """
+
+        :return: observations x features
+        """
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._jac_weight_b(x=self.x_j(j=j), loc=self.location_j(j=j), scale=self.scale_j(j=j))
+
+    def _jac_weight_b(self, x, loc, scale):
+        return np.square((self._dense(x) - loc) / scale) - 1.
+
+    @property
+    def hessian_weight_ab(self):
+        return self._hessian_weight_ab(x=self.x, loc=self.location, scale=self.scale)
+
+    def hessian_weight_ab_j(self, j):
+        """
+
+        :return: observations x features
+        """
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._hessian_weight_ab(x=self.x_j(j=j), loc=self.location_j(j=j), scale=self.scale_j(j=j))
+
+    def _hessian_weight_ab(self, x, loc, scale):
+        return - 2. * self._sf * (self._dense(x) - loc) / np.square(scale)
+
+    @property
+    def hessian_weight_aa(self):
+        return self._fim_weight(scale=self.scale)
+
+    def hessian_weight_aa_j(self, j):
+        """
+        The location model is linear, its hessian equals the negative Fisher information.
+
+        :return: observations x features
+        """
+        return self.fim_weight_j(j=j)
+
+    @property
+    def hessian_weight_bb(self):
+        return self._hessian_weight_bb(x=self.x, loc=self.location, scale=self.scale)
+
+    def hessian_weight_bb_j(self, j):
+        """
+
+        :return: observations x features
+        """
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._hessian_weight_bb(x=self.x_j(j=j), loc=self.location_j(j=j), scale=self.scale_j(j=j))
+
+    def _hessian_weight_bb(self, x, loc, scale):
+        return - 2. * np.square((self._dense(x) - loc) / scale)
+
+    def _ll(self, x, loc, scale, eta_scale):
+        ll = - 0.5 * np.log(2. * np.pi) - eta_scale - 0.5 * np.square((self._dense(x) - loc) / scale)
+        return self.np_clip_param(ll, "ll")
+
+    @property
+    def ll(self):
+        return self._ll(x=self.x, loc=self.location, scale=self.scale, eta_scale=self.eta_scale)
+
+    def ll_j(self, j):
+        # Make sure that dimensionality of sliced array is kept:
+        if isinstance(j, int) or isinstance(j, np.int32) or isinstance(j, np.int64):
+            j = [j]
+        return self._ll(
+            x=self.x_j(j=j),
+            loc=self.location_j(j=j),
+            scale=self.scale_j(j=j),
+            eta_scale=self.eta_scale_j(j=j)
+        )
@@ -0,0 +1,42 @@
+import numpy as np
+
+from .external import ProcessModelGlm
+from .external import pkg_constants
+
+
+class ProcessModel(ProcessModelGlm):
+
+    def param_bounds(
+            self,
+            dtype
+    ):
+        dtype = np.dtype(dtype)
+        dmin = np.finfo(dtype).min
+        dmax = np.finfo(dtype).max
+        dtype = dtype.type
+
+        sf = dtype(pkg_constants.ACCURACY_MARGIN_RELATIVE_TO_LIMIT)
+        bounds_min = {
+            "a_var": np.nextafter(-dmax, np.inf, dtype=dtype) / sf,
+            "b_var": np.log(np.nextafter(0, np.inf, dtype=dtype)) / sf,
+            "eta_loc": np.nextafter(-dmax, np.inf, dtype=dtype) / sf,
+            "eta_scale": np.log(np.nextafter(0, np.inf, dtype=dtype)) / sf,
+            "loc": np.nextafter(-dmax, np.inf, dtype=dtype) / sf,
+            "scale": np.nextafter(0, np.inf, dtype=dtype),
+            "mean": np.nextafter(-dmax, np.inf, dtype=dtype) / sf,
+            "sd": np.nextafter(0, np.inf, dtype=dtype),
+            "ll": np.nextafter(-dmax, np.inf, dtype=dtype) / sf,
+        }
+        bounds_max = {
+            "a_var": np.nextafter(dmax, -np.inf, dtype=dtype) / sf,
+            "b_var": np.nextafter(np.log(dmax), -np.inf, dtype=dtype) / sf,
+            "eta_loc": np.nextafter(dmax, -np.inf, dtype=dtype) / sf,
+            "eta_scale": np.nextafter(np.log(dmax), -np.inf, dtype=dtype) / sf,
+            "loc": np.nextafter(dmax, -np.inf, dtype=dtype) / sf,
+            "scale": np.nextafter(dmax, -np.inf, dtype=dtype) / sf,
+            "mean": np.nextafter(dmax, -np.inf, dtype=dtype) / sf,
+            "sd": np.nextafter(dmax, -np.inf, dtype=dtype) / sf,
+            # The density of the normal distribution is not bounded by one:
+            "ll": np.nextafter(dmax, -np.inf, dtype=dtype) / sf,
+        }
+        return bounds_min, bounds_max
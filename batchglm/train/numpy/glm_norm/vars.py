@@ -0,0 +1,8 @@
+from .model import ProcessModel
+from .external import ModelVarsGlm
+
+
+class ModelVars(ProcessModel, ModelVarsGlm):
+    """
+    Full class.
+    """
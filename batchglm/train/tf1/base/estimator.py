@@ -8,6 +8,7 @@ import time
 from typing import Dict, Any, Union, Iterable
 
 from .external import _EstimatorBase, pkg_constants
+from .external import save_checkpoint, load_checkpoint, CheckpointTimer
 
 logger = logging.getLogger("batchglm")
 
@@ -129,6 +130,9 @@ class _TFEstimator(metaclass=abc.ABCMeta):
             require_hessian=False,
             require_fim=False,
             is_batched=False,
+            checkpoint_path: str = None,
+            checkpoint_interval: float = None,
+            resume_from: str = None,
             **kwargs
     ):
         """
@@ -148,6 +152,11 @@ class _TFEstimator(metaclass=abc.ABCMeta):
             See parameter `convergence_criteria` for exact meaning
         :param loss_window_size: specifies `N` in `convergence_criteria`.
         :param train_op: uses this training operation if specified
+        :param checkpoint_path: File to which parameters, convergence state, trust region radii and the step
+            counter are written periodically and after the last step, see `batchglm.utils.checkpoint`.
+        :param checkpoint_interval: Minimum time between two checkpoints in seconds,
+            `pkg_constants.CHECKPOINT_INTERVAL` if None.
+        :param resume_from: Checkpoint file from which training is continued.
         """
         # Set default values:
         if stopping_criteria is None:
@@ -157,6 +166,16 @@ class _TFEstimator(metaclass=abc.ABCMeta):
         if train_op is None:
             train_op = self.model.train_op
 
+        if resume_from is not None:
+            state = load_checkpoint(
+                path=resume_from,
+                backend="tf1",
+                noise_model=self.noise_model,
+                n_features=self.model.model_vars.converged.shape[0]
+            )
+            for name, variable in self._checkpoint_variables().items():
+                variable.load(state[name], self.session)
+
         # Initialize:
         if pkg_constants.EVAL_ON_BATCHED and is_batched:
             _, _ = self.session.run(
@@ -186,6 +205,23 @@ class _TFEstimator(metaclass=abc.ABCMeta):
         # Set all to convergence status to False, this is need if multiple training strategies are run:
         converged_current = np.repeat(False, repeats=self.model.model_vars.converged.shape[0])
         train_step = 0
+        if resume_from is not None:
+            converged_current = state["converged"]
+            train_step = int(state["global_step"])
+            self.session.run(self.model.model_vars.convergence_update, feed_dict={
+                self.model.model_vars.convergence_status: converged_current
+            })
+
+        def checkpoint():
+            save_checkpoint(
+                path=checkpoint_path,
+                backend="tf1",
+                noise_model=self.noise_model,
+                converged=converged_current,
+                **self.session.run(self._checkpoint_variables())
+            )
+
+        checkpoint_timer = CheckpointTimer(path=checkpoint_path, interval=checkpoint_interval)
 
         def convergence_decision(convergence_status, step_counter):
             if convergence_criteria == "step":
@@ -356,3 +392,22 @@ class _TFEstimator(metaclass=abc.ABCMeta):
                 np.sum(np.logical_and(np.logical_not(converged_prev), features_updated)).astype("int32"),
                 np.sum(converged_f), np.sum(converged_g), np.sum(converged_x)
             )
+            if checkpoint_timer.due():
+                checkpoint()
+        if checkpoint_path is not None:
+            checkpoint()
+
+    def _checkpoint_variables(self) -> dict:
+        """
+        Variables that hold the state of training across steps: parameters, step counter and the trust region
+        radii of the optimizers that were built.
+        """
+        variables = {
+            "params": self.model.model_vars.params,
+            "global_step": self.model.global_step
+        }
+        for name in ["nr_tr_radius", "irls_tr_radius"]:
+            variable = getattr(self.model, name, None)
+            if variable is not None:
+                variables[name] = variable
+        return variables
@@ -1,2 +1,3 @@
 from batchglm.models.base import _EstimatorBase
 from batchglm import pkg_constants
+from batchglm.utils.checkpoint import save_checkpoint, load_checkpoint, CheckpointTimer
@@ -15,7 +15,7 @@ from .fim import FIMGLM
 from .hessians import HessiansGLM
 from .jacobians import JacobiansGLM
 from .external import TFEstimatorGraph
-from .external import train_utils
+from .external import train_utils, op_utils
 from .external import pkg_constants
 
 logger = logging.getLogger(__name__)
@@ -885,11 +885,12 @@ class NewtonGraphGLM:
             rhs,
             psd
     ):
-        delta_t = tf.squeeze(tf.linalg.lstsq(
-            lhs,
-            tf.expand_dims(rhs, axis=-1),
-            fast=psd and pkg_constants.CHOLESKY_LSTSQS
-        ), axis=-1)
+        delta_t, _ = op_utils.stacked_solve(
+            A=lhs,
+            b=tf.expand_dims(rhs, axis=-1),
+            method=pkg_constants.LINALG_SOLVER if psd and pkg_constants.CHOLESKY_LSTSQS else "lstsq"
+        )
+        delta_t = tf.squeeze(delta_t, axis=-1)
         update_tensor = tf.transpose(delta_t)
 
         return update_tensor
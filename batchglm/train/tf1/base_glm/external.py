@@ -1,3 +1,4 @@
 import batchglm.train.tf1.train as train_utils
+import batchglm.train.tf1.ops as op_utils
 from batchglm.train.tf1.base import ProcessModelBase, TFEstimatorGraph
 from batchglm import pkg_constants
@@ -7,7 +7,8 @@ import tensorflow as tf
 from typing import Union
 
 from .estimator_graph import EstimatorGraphAll
-from .external import _TFEstimator, InputDataGLM, _EstimatorGLM
+from .external import _TFEstimator, InputDataGLM, _EstimatorGLM, STACKED_SOLVE_PATHS, stacked_block_inv
+from .external import plan_training
 
 
 class TFEstimatorGLM(_TFEstimator, _EstimatorGLM, metaclass=abc.ABCMeta):
@@ -75,6 +76,9 @@ class TFEstimatorGLM(_TFEstimator, _EstimatorGLM, metaclass=abc.ABCMeta):
         else:
             raise ValueError("noise model %s was not recognized" % noise_model)
         self.noise_model = noise_model
+        self.dtype = dtype
+        if input_data.is_chunked:
+            raise ValueError("on-disk data are only supported by the numpy backend")
 
         # validate design matrix:
         if np.linalg.matrix_rank(input_data.design_loc) != np.linalg.matrix_rank(input_data.design_loc.T):
@@ -200,6 +204,38 @@ class TFEstimatorGLM(_TFEstimator, _EstimatorGLM, metaclass=abc.ABCMeta):
             )
         return scaffold
 
+    def train_sequence(self, training_strategy="AUTO"):
+        """
+        Train with a sequence of training strategies.
+
+        :param training_strategy: Name of a strategy in `TrainingStrategies`, the strategy itself or a list of
+            dictionaries of arguments of `train()`. "AUTO" chooses between mini-batched and full-data training
+            and the optimizer from the data and from available memory, see `batchglm.utils.planner.plan_training`.
+        """
+        if isinstance(training_strategy, str):
+            training_strategy = self.TrainingStrategies[training_strategy.upper()]
+        if isinstance(training_strategy, Enum):
+            training_strategy = training_strategy.value
+
+        if training_strategy is None:
+            plan = plan_training(
+                input_data=self.input_data,
+                noise_model=self.noise_model,
+                backend="tf1",
+                dtype=tf.as_dtype(self.dtype).as_numpy_dtype
+            )
+            training_strategy = plan["training_strategy"]
+            for d in training_strategy:
+                if d["use_batching"] and self.model.trainer_batch is None:
+                    logging.getLogger("batchglm").warning(
+                        "training plan uses mini-batches of size %i but batched optimizers were not provided, "
+                        "create the estimator with provide_batched=True and this batch size",
+                        plan["batch_size"]
+                    )
+                    d["use_batching"] = False
+
+        super().train_sequence(training_strategy=training_strategy)
+
     def train(
             self,
             *args,
@@ -210,6 +246,9 @@ class TFEstimatorGLM(_TFEstimator, _EstimatorGLM, metaclass=abc.ABCMeta):
             train_scale: bool = None,
             use_batching=False,
             optim_algo=None,
+            checkpoint_path: str = None,
+            checkpoint_interval: float = None,
+            resume_from: str = None,
             **kwargs
     ):
         r"""
@@ -233,6 +272,12 @@ class TFEstimatorGLM(_TFEstimator, _EstimatorGLM, metaclass=abc.ABCMeta):
             Otherwise, the gradient of the full dataset will be used.
         :param optim_algo: name of the requested train op.
             See :func:train_utils.MultiTrainer.train_op_by_name for further details.
+        :param checkpoint_path: File to which the state of training is written periodically and after the last
+            step, see `batchglm.utils.checkpoint`.
+        :param checkpoint_interval: Minimum time between two checkpoints in seconds,
+            `pkg_constants.CHECKPOINT_INTERVAL` if None.
+        :param resume_from: Checkpoint file from which training is continued, the other arguments have to be the
+            same as in the interrupted call.
         """
         if train_loc is None:
             # check if mu was initialized with MLE
@@ -314,35 +359,89 @@ class TFEstimatorGLM(_TFEstimator, _EstimatorGLM, metaclass=abc.ABCMeta):
                 require_hessian=require_hessian,
                 require_fim=require_fim,
                 is_batched=use_batching,
+                checkpoint_path=checkpoint_path,
+                checkpoint_interval=checkpoint_interval,
+                resume_from=resume_from,
                 **kwargs
             )
 
-    def finalize(self):
+    def finalize(
+            self,
+            block: str = "all",
+            coef_idx=None,
+            diagonal: bool = False,
+            hessian: bool = True
+    ):
         """
         Evaluate all tensors that need to be exported from session and save these as class attributes
         and close session.
 
         Changes .model entry from tf1-based EstimatorGraph to numpy based Model instance and
         transfers relevant attributes.
+
+        All outputs are fetched in one session run so that the Hessian is only evaluated once. If only parts of
+        the inverse of the Fisher information are requested, these are computed from the blocks of the
+        Hessian instead of inverting the full Hessian in the graph.
+
+        :param block: Parameter block of the Hessian and of the inverse of the Fisher information:
+            "all", "loc" or "scale".
+        :param coef_idx: Indices of the inferred parameters within `block` whose rows and columns of the inverse
+            of the Fisher information are kept, all if None.
+        :param diagonal: Whether to only keep the diagonal of the selected inverse of the Fisher information,
+            i.e. the variances of the parameter estimates (features x parameters).
+        :param hessian: Whether to keep the Hessian of `block`, `.hessian` is None otherwise.
         """
+        block = block.lower()
+        if block not in ["all", "loc", "scale"]:
+            raise ValueError("block %s not recognized" % block)
+        full_inverse = block == "all" and coef_idx is None and not diagonal
+
         self.session.run(self.model.full_data_model.final_set)
-        a_var = self.session.run(self.model.a_var)
-        b_var = self.session.run(self.model.b_var)
-        fisher_inv = self.session.run(self.model.fisher_inv)
-        hessian = self.session.run(self.model.hessian)
-        jacobian = self.session.run(self.model.gradients)
-        log_likelihood = self.session.run(self.model.log_likelihood)
-        loss = self.session.run(self.model.loss)
+        fetches = {
+            "a_var": self.model.a_var,
+            "b_var": self.model.b_var,
+            "hessian": self.model.hessian,
+            "jacobian": self.model.gradients,
+            "log_likelihood": self.model.log_likelihood,
+            "loss": self.model.loss
+        }
+        if full_inverse:
+            fetches["fisher_inv"] = self.model.fisher_inv
+            fetches["fisher_inv_solver_paths"] = self.model.fisher_inv_solver_paths
+        outputs = self.session.run(fetches)
         logging.getLogger("batchglm").debug("Closing session")
         self.close_session()
         self.model = self.get_model_container(self.input_data)
-        self.model._a_var = a_var
-        self.model._b_var = b_var
-        self._fisher_inv = fisher_inv
-        self._hessian = hessian
-        self._jacobian = jacobian
-        self._log_likelihood = log_likelihood
-        self._loss = loss
+        self.model._a_var = outputs["a_var"]
+        self.model._b_var = outputs["b_var"]
+
+        h = outputs["hessian"]
+        n_loc = self.input_data.num_loc_params
+        if full_inverse:
+            self._fisher_inv = outputs["fisher_inv"]
+            paths = np.asarray(STACKED_SOLVE_PATHS)[outputs["fisher_inv_solver_paths"]]
+        else:
+            self._fisher_inv, paths = stacked_block_inv(
+                a_aa=-h[:, :n_loc, :n_loc],
+                a_ab=-h[:, :n_loc, n_loc:],
+                a_bb=-h[:, n_loc:, n_loc:],
+                block={"all": "all", "loc": "a", "scale": "b"}[block],
+                idx=coef_idx,
+                diagonal=diagonal,
+                return_paths=True
+            )
+        self._solver_paths["fisher_inv"] = paths
+        if not hessian:
+            self._hessian = None
+        elif block == "loc":
+            self._hessian = h[:, :n_loc, :n_loc]
+        elif block == "scale":
+            self._hessian = h[:, n_loc:, n_loc:]
+        else:
+            self._hessian = h
+        self._jacobian = outputs["jacobian"]
+        self._log_likelihood = outputs["log_likelihood"]
+        self._loss = outputs["loss"]
 
     @abc.abstractmethod
     def get_model_container(
@@ -4,7 +4,7 @@ import tensorflow as tf
 from typing import Union
 
 from .external import EstimatorGraphGLM, FullDataModelGraphGLM, BatchedDataModelGraphGLM, ModelVarsGLM
-from .external import pkg_constants
+from .external import op_utils, pkg_constants
 
 logger = logging.getLogger(__name__)
 
@@ -528,7 +528,9 @@ class EstimatorGraphAll(EstimatorGraphGLM):
             self.loss = self.full_data_model.loss_final
             self.log_likelihood = self.full_data_model.log_likelihood_final
             self.hessian = self.full_data_model.hessians_final
-            self.fisher_inv = tf.linalg.inv(-self.full_data_model.hessians_final)  # TODO switch for fim?
+            self.fisher_inv, self.fisher_inv_solver_paths = op_utils.stacked_inv(
+                -self.full_data_model.hessians_final  # TODO switch for fim?
+            )
             # Summary statistics on feature-wise model gradients:
             self.gradients = tf.reduce_sum(tf.abs(self.full_data_model.neg_jac_final / num_observations), axis=1)
 
@@ -8,5 +8,6 @@ from batchglm.train.tf1.base_glm import ProcessModelGLM, ModelVarsGLM, FIMGLM, H
 from batchglm.models.base_glm import InputDataGLM, _ModelGLM, _EstimatorGLM
 
 import batchglm.train.tf1.ops as op_utils
-from batchglm.utils.linalg import groupwise_solve_lm
+from batchglm.utils.linalg import groupwise_solve_lm, stacked_block_inv, STACKED_SOLVE_PATHS
+from batchglm.utils.planner import plan_training
 from batchglm import pkg_constants
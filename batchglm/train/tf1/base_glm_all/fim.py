@@ -2,7 +2,7 @@ import tensorflow as tf
 
 import logging
 
-from .external import FIMGLM
+from .external import FIMGLM, op_utils
 
 logger = logging.getLogger(__name__)
 
@@ -47,15 +47,14 @@ class FIMGLMALL(FIMGLM):
             # The resulting tensor is observations x features x coefficients x coefficients which
             # is too large too store in memory in most cases. However, the full 4D tensor is never
             # actually needed but only its marginal across features, the final hessian block shape.
-            # Here, we use the einsum to efficiently perform the two outer products and the marginalisation.
+            # Here, we use the einsum to efficiently perform the two outer products and the marginalisation,
+            # on the weights summed by design group if the batch has few unique design rows.
             if self.constraints_loc is not None:
                 XH = tf.matmul(model.design_loc, self.constraints_loc)
             else:
                 XH = model.design_loc
 
-            fim = tf.einsum('ofc,od->fcd',
-                            tf.einsum('of,oc->ofc', W, XH),
-                            XH)
+            fim = op_utils.stacked_xtwx(W=W, XHa=XH)
             return fim
 
         if self.compute_fim_a:
@@ -91,15 +90,14 @@ class FIMGLMALL(FIMGLM):
             # The resulting tensor is observations x features x coefficients x coefficients which
             # is too large too store in memory in most cases. However, the full 4D tensor is never
             # actually needed but only its marginal across features, the final hessian block shape.
-            # Here, we use the Einstein summation to efficiently perform the two outer products and the marginalisation.
+            # Here, we use the Einstein summation to efficiently perform the two outer products and the marginalisation,
+            # on the weights summed by design group if the batch has few unique design rows.
             if self.constraints_scale is not None:
                 XH = tf.matmul(model.design_scale, self.constraints_scale)
             else:
                 XH = model.design_scale
 
-            fim = tf.einsum('ofc,od->fcd',
-                            tf.einsum('of,oc->ofc', W, XH),
-                            XH)
+            fim = op_utils.stacked_xtwx(W=W, XHa=XH)
             return fim
 
         # The full fisher information matrix is block-diagonal with the cross-model
@@ -3,7 +3,7 @@ import logging
 import tensorflow as tf
 
 from .external import pkg_constants
-from .external import HessiansGLM
+from .external import HessiansGLM, op_utils
 
 logger = logging.getLogger(__name__)
 
@@ -41,15 +41,14 @@ class HessianGLMALL(HessiansGLM):
             # The resulting tensor is observations x features x coefficients x coefficients which
             # is too large too store in memory in most cases. However, the full 4D tensor is never
             # actually needed but only its marginal across features, the final hessian block shape.
-            # Here, we use the einsum to efficiently perform the two outer products and the marginalisation.
+            # Here, we use the einsum to efficiently perform the two outer products and the marginalisation,
+            # on the weights summed by design group if the batch has few unique design rows.
             if self.constraints_loc is not None:
                 XH = tf.matmul(model.design_loc, model.constraints_loc)
             else:
                 XH = model.design_loc
 
-            Hblock = tf.einsum('ofc,od->fcd',
-                               tf.einsum('of,oc->ofc', W, XH),
-                               XH)
+            Hblock = op_utils.stacked_xtwx(W=W, XHa=XH)
             return Hblock
 
         def _bb_byobs_batched(model):
@@ -67,15 +66,14 @@ class HessianGLMALL(HessiansGLM):
             # The resulting tensor is observations x features x coefficients x coefficients which
             # is too large too store in memory in most cases. However, the full 4D tensor is never
             # actually needed but only its marginal across features, the final hessian block shape.
-            # Here, we use the Einstein summation to efficiently perform the two outer products and the marginalisation.
+            # Here, we use the Einstein summation to efficiently perform the two outer products and the marginalisation,
+            # on the weights summed by design group if the batch has few unique design rows.
             if self.constraints_scale is not None:
                 XH = tf.matmul(model.design_scale, model.constraints_scale)
             else:
                 XH = model.design_scale
 
-            Hblock = tf.einsum('ofc,od->fcd',
-                               tf.einsum('of,oc->ofc', W, XH),
-                               XH)
+            Hblock = op_utils.stacked_xtwx(W=W, XHa=XH)
             return Hblock
 
         def _ab_byobs_batched(model):
@@ -97,7 +95,8 @@ class HessianGLMALL(HessiansGLM):
             # The resulting tensor is observations x features x coefficients x coefficients which
             # is too large too store in memory in most cases. However, the full 4D tensor is never
             # actually needed but only its marginal across features, the final hessian block shape.
-            # Here, we use the Einstein summation to efficiently perform the two outer products and the marginalisation.
+            # Here, we use the Einstein summation to efficiently perform the two outer products and the marginalisation,
+            # on the weights summed by design group if the batch has few unique design rows.
             if self.constraints_loc is not None:
                 XHloc = tf.matmul(model.design_loc, model.constraints_loc)
             else:
@@ -108,9 +107,7 @@ class HessianGLMALL(HessiansGLM):
             else:
                 XHscale = model.design_scale
 
-            Hblock = tf.einsum('ofc,od->fcd',
-                               tf.einsum('of,oc->ofc', W, XHloc),
-                               XHscale)
+            Hblock = op_utils.stacked_xtwx(W=W, XHa=XHloc, XHb=XHscale)
             return Hblock
 
         if self.compute_a and self.compute_b:
@@ -95,9 +95,14 @@ class BasicModelGraph(ProcessModel, BasicModelGraphGLM):
         # Log-likelihood:
         log_r_plus_mu = tf.math.log(model_scale + model_loc)
         if isinstance(X, tf.SparseTensor):
-            log_probs_sparse = X.__mul__(eta_loc - log_r_plus_mu)
+            # lgamma(x + 1) vanishes for x = 0 and is only evaluated on the stored entries:
+            neg_lgamma_x_plus_one = tf.SparseTensor(
+                indices=X.indices,
+                values=-tf.math.lgamma(X.values + tf.ones_like(X.values)),
+                dense_shape=X.dense_shape
+            )
+            log_probs_sparse = tf.sparse.add(X.__mul__(eta_loc - log_r_plus_mu), neg_lgamma_x_plus_one)
             log_probs_dense = tf.math.lgamma(tf.sparse.add(X, model_scale)) - \
-                              tf.math.lgamma(tf.sparse.add(X, tf.ones(shape=X.dense_shape, dtype=dtype))) - \
                               tf.math.lgamma(model_scale) + \
                               tf.multiply(model_scale, eta_scale - log_r_plus_mu)
             log_probs = tf.sparse.add(log_probs_sparse, log_probs_dense)
@@ -1,6 +1,9 @@
 import tensorflow as tf
 from typing import Union
 
+from batchglm import pkg_constants
+from batchglm.utils.linalg import STACKED_SOLVE_PATHS
+
 
 def swap_dims(tensor, axis0, axis1, exec_transpose=True, return_perm=False, name="swap_dims"):
     """
@@ -57,3 +60,138 @@ def stacked_lstsq(L, b, rcond=1e-10, name="stacked_lstsq"):
         )
 
         return tf.conj(x)
+
+
+def stacked_xtwx(W, XHa, XHb=None, name="stacked_xtwx"):
+    r"""
+    Assemble the weighted cross-products :math:`X_a^T W_f X_b` of all features f.
+
+    If the batch has at most `pkg_constants.DESIGN_GROUPS_MAX_FRACTION` unique design rows among its
+    observations, the weights are summed over the observations of each unique row first so that the
+    outer products of the design rows are only contracted once per design group.
+
+    :param W: tensor (observations x features) of weights.
+    :param XHa: tensor (observations x params_a) of constrained design.
+    :param XHb: tensor (observations x params_b) of constrained design, defaults to `XHa`.
+    :param name: name scope of this op
+    :return: tensor (features x params_a x params_b)
+    """
+    with tf.name_scope(name):
+        def _xtwx(W, XHa, XHb):
+            return tf.einsum('ofc,od->fcd', tf.einsum('of,oc->ofc', W, XHa), XHb)
+
+        if pkg_constants.DESIGN_GROUPS_MAX_FRACTION <= 0:
+            return _xtwx(W, XHa, XHa if XHb is None else XHb)
+
+        if XHb is None:
+            XH = XHa
+        else:
+            XH = tf.concat([XHa, XHb], axis=1)
+        n_a = tf.shape(XHa)[1]
+        XH_unique, groups = tf.raw_ops.UniqueV2(x=XH, axis=tf.constant([0], dtype=tf.int64))
+        n_groups = tf.shape(XH_unique)[0]
+
+        def _grouped():
+            W_grouped = tf.math.unsorted_segment_sum(W, groups, num_segments=n_groups)
+            if XHb is None:
+                return _xtwx(W_grouped, XH_unique, XH_unique)
+            else:
+                return _xtwx(W_grouped, XH_unique[:, :n_a], XH_unique[:, n_a:])
+
+        def _ungrouped():
+            return _xtwx(W, XHa, XHa if XHb is None else XHb)
+
+        return tf.cond(
+            tf.cast(n_groups, dtype=tf.float64) <=
+            pkg_constants.DESIGN_GROUPS_MAX_FRACTION * tf.cast(tf.shape(XH)[0], dtype=tf.float64),
+            true_fn=_grouped,
+            false_fn=_ungrouped
+        )
+
+
+def stacked_solve(A, b, method=None, rcond=1e-10, name="stacked_solve"):
+    r"""
+    Solve the symmetric systems `A_s x_s = b_s` of a stack of systems.
+
+    Graph version of `batchglm.utils.linalg.stacked_solve`: the systems are solved with the strategy `method`
+    and the systems without finite solution fall back to the next strategy of "cholesky", "eigh" and "lstsq".
+    Fallbacks are only evaluated on the failed systems and only if there are any.
+    Systems without finite solution from any strategy are set to zero.
+
+    :param A: tensor (systems x P x P) of symmetric matrices.
+    :param b: tensor (systems x P x N).
+    :param method: Solution strategy, defaults to `pkg_constants.LINALG_SOLVER`.
+    :param rcond: Relative threshold of eigenvalues below which these are cut off.
+    :param name: name scope of this op
+    :return: tuple of (x of shape (systems x P x N), (systems,) index of the strategy of each system
+        in `STACKED_SOLVE_PATHS`)
+    """
+    if method is None:
+        method = pkg_constants.LINALG_SOLVER
+    method = method.lower()
+    if method not in STACKED_SOLVE_PATHS[:3]:
+        raise ValueError("method %s not recognized" % method)
+
+    def _cholesky(A, b):
+        # Systems that are not positive definite yield nan factors.
+        return tf.linalg.cholesky_solve(tf.linalg.cholesky(A), b)
+
+    def _eigh(A, b):
+        e, v = tf.linalg.eigh(A)
+        e_max = tf.reduce_max(tf.abs(e), axis=-1, keepdims=True)
+        inv_e = tf.where(tf.abs(e) > rcond * e_max, tf.math.reciprocal(e), tf.zeros_like(e))
+        return tf.matmul(v * tf.expand_dims(inv_e, axis=-2), tf.matmul(v, b, transpose_a=True))
+
+    def _lstsq(A, b):
+        return tf.linalg.lstsq(A, b, fast=False)
+
+    strategies = {"cholesky": _cholesky, "eigh": _eigh, "lstsq": _lstsq}
+    with tf.name_scope(name):
+        # Decompositions raise on non-finite input, these systems are replaced by the identity and fail in the end:
+        finite = tf.logical_and(
+            tf.reduce_all(tf.math.is_finite(A), axis=[-2, -1]),
+            tf.reduce_all(tf.math.is_finite(b), axis=[-2, -1])
+        )
+        finite_mask = tf.logical_and(tf.ones_like(A, dtype=tf.bool), finite[:, None, None])
+        A = tf.where(finite_mask, A, tf.zeros_like(A) + tf.eye(tf.shape(A)[-1], dtype=A.dtype))
+        x = strategies[method](A, b)
+        paths = tf.fill(tf.shape(A)[:1], STACKED_SOLVE_PATHS.index(method))
+        for path in STACKED_SOLVE_PATHS[STACKED_SOLVE_PATHS.index(method) + 1:]:
+            failed = tf.logical_not(tf.reduce_all(tf.math.is_finite(x), axis=[-2, -1]))
+            if path == "failed":
+                failed = tf.logical_or(failed, tf.logical_not(finite))
+            idx_failed = tf.cast(tf.where(failed)[:, 0], dtype=tf.int32)
+            idx_ok = tf.cast(tf.where(tf.logical_not(failed))[:, 0], dtype=tf.int32)
+            if path == "failed":
+                x_fallback = tf.zeros_like(tf.gather(x, indices=idx_failed))
+            else:
+                x_fallback = None
+
+            def _fallback(x=x, path=path, idx_failed=idx_failed, idx_ok=idx_ok, x_fallback=x_fallback):
+                if x_fallback is None:
+                    x_fallback = strategies[path](tf.gather(A, indices=idx_failed), tf.gather(b, indices=idx_failed))
+                return tf.dynamic_stitch(
+                    indices=[idx_ok, idx_failed],
+                    data=[tf.gather(x, indices=idx_ok), x_fallback]
+                )
+
+            x = tf.cond(tf.reduce_any(failed), true_fn=_fallback, false_fn=lambda x=x: x)
+            paths = tf.where(failed, tf.fill(tf.shape(paths), STACKED_SOLVE_PATHS.index(path)), paths)
+
+        return x, paths
+
+
+def stacked_inv(A, method=None, rcond=1e-10, name="stacked_inv"):
+    r"""
+    Invert the symmetric matrices of a stack, see `stacked_solve` for the solution strategies.
+
+    :param A: tensor (systems x P x P) of symmetric matrices.
+    :param method: Solution strategy, defaults to `pkg_constants.LINALG_SOLVER`.
+    :param rcond: Relative threshold of eigenvalues below which these are cut off.
+    :param name: name scope of this op
+    :return: tuple of ((systems x P x P) inverses or pseudo-inverses, (systems,) index of the strategy of each
+        system in `STACKED_SOLVE_PATHS`)
+    """
+    with tf.name_scope(name):
+        identity = tf.zeros_like(A) + tf.eye(tf.shape(A)[-1], dtype=A.dtype)
+        return stacked_solve(A=A, b=identity, method=method, rcond=rcond)
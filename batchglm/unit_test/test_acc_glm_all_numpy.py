@@ -24,6 +24,10 @@ class _TestAccuracyGlmAllEstim:
         else:
             if noise_model == "nb":
                 from batchglm.api.models.numpy.glm_nb import Estimator, InputDataGLM
+            elif noise_model == "norm":
+                from batchglm.api.models.numpy.glm_norm import Estimator, InputDataGLM
+            elif noise_model == "beta":
+                from batchglm.api.models.numpy.glm_beta import Estimator, InputDataGLM
             else:
                 raise ValueError("noise_model not recognized")
 
@@ -130,9 +134,9 @@ class _TestAccuracyGlmAll(
     noise_model: str
     optims_tested: dict
 
-    def simulate(self):
-        self.simulate1()
-        self.simulate2()
+    def simulate(self, intercept_scale=True):
+        self.simulate1(intercept_scale=intercept_scale)
+        self.simulate2(intercept_scale=intercept_scale)
 
     def get_simulator(self):
         if self.noise_model is None:
@@ -141,7 +145,7 @@ class _TestAccuracyGlmAll(
             if self.noise_model == "nb":
                 from batchglm.api.models.tf1.glm_nb import Simulator
             elif self.noise_model == "norm":
-                from batchglm.api.models import Simulator
+                from batchglm.api.models.tf1.glm_norm import Simulator
             elif self.noise_model == "beta":
                 from batchglm.api.models.tf1.glm_beta import Simulator
             else:
@@ -149,9 +153,9 @@ class _TestAccuracyGlmAll(
 
         return Simulator(num_observations=10000, num_features=10)
 
-    def simulate1(self):
+    def simulate1(self, intercept_scale=True):
         self.sim1 = self.get_simulator()
-        self.sim1.generate_sample_description(num_batches=2, num_conditions=2, intercept_scale=True)
+        self.sim1.generate_sample_description(num_batches=2, num_conditions=2, intercept_scale=intercept_scale)
 
         def rand_fn_ave(shape):
             if self.noise_model in ["nb", "norm"]:
@@ -189,9 +193,9 @@ class _TestAccuracyGlmAll(
         )
         self.sim1.generate_data()
 
-    def simulate2(self):
+    def simulate2(self, intercept_scale=True):
         self.sim2 = self.get_simulator()
-        self.sim2.generate_sample_description(num_batches=0, num_conditions=2, intercept_scale=True)
+        self.sim2.generate_sample_description(num_batches=0, num_conditions=2, intercept_scale=intercept_scale)
 
         def rand_fn_ave(shape):
             if self.noise_model in ["nb", "norm"]:
@@ -353,6 +357,75 @@ class TestAccuracyGlmNb(
         self._test_full(sparse=False)
         self._test_full(sparse=True)
 
+    def test_full_nb_scale_design(self):
+        logging.getLogger("batchglm").setLevel(logging.INFO)
+        logger.error("TestAccuracyGlmNb.test_full_nb_scale_design()")
+
+        np.random.seed(1)
+        self.noise_model = "nb"
+        self.simulate(intercept_scale=False)
+        self._test_full_a_and_b(sparse=False)
+        self._test_full_b_only(sparse=True)
+
+
+class TestAccuracyGlmNorm(
+    _TestAccuracyGlmAll,
+    unittest.TestCase
+):
+    """
+    Test whether optimizers yield exact results for normal distributed data.
+    """
+
+    def test_full_norm(self):
+        logging.getLogger("batchglm").setLevel(logging.INFO)
+        logger.error("TestAccuracyGlmNorm.test_full_norm()")
+
+        np.random.seed(1)
+        self.noise_model = "norm"
+        self.simulate()
+        self._test_full(sparse=False)
+        self._test_full(sparse=True)
+
+
+class TestAccuracyGlmBeta(
+    _TestAccuracyGlmAll,
+    unittest.TestCase
+):
+    """
+    Test whether optimizers yield exact results for beta distributed data.
+
+    Uses coefficients of moderate sample sizes instead of the shared simulation settings, which are close to
+    the boundary of the parameter space of the beta distribution.
+    """
+
+    def simulate(self, intercept_scale=True):
+        self.sim1 = self.get_simulator()
+        self.sim1.generate_sample_description(num_batches=2, num_conditions=2, intercept_scale=intercept_scale)
+        self.sim1.generate_params(
+            rand_fn_ave=lambda shape: np.random.uniform(0.1, 0.7, shape),
+            rand_fn_loc=lambda shape: np.random.uniform(0.5, 1, shape),
+            rand_fn_scale=lambda shape: np.random.uniform(2, 4, shape)
+        )
+        self.sim1.generate_data()
+
+        self.sim2 = self.get_simulator()
+        self.sim2.generate_sample_description(num_batches=0, num_conditions=2, intercept_scale=intercept_scale)
+        self.sim2.generate_params(
+            rand_fn_ave=lambda shape: np.random.uniform(0.1, 0.9, shape),
+            rand_fn_loc=lambda shape: np.zeros(shape) + 0.05,
+            rand_fn_scale=lambda shape: np.ones(shape) * 3.
+        )
+        self.sim2.generate_data()
+
+    def test_full_beta(self):
+        logging.getLogger("batchglm").setLevel(logging.INFO)
+        logger.error("TestAccuracyGlmBeta.test_full_beta()")
+
+        np.random.seed(1)
+        self.noise_model = "beta"
+        self.simulate()
+        self._test_full(sparse=False)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,55 @@
+import logging
+import numpy as np
+import unittest
+
+import batchglm.api as glm
+
+glm.setup_logging(verbosity="WARNING", stream="STDOUT")
+logger = logging.getLogger(__name__)
+
+
+class TestBScheduleNumpy(unittest.TestCase):
+    """
+    Test whether adaptive scale model updates reach the optimum of the fixed update schedule.
+    """
+
+    def _test_schedule(self, noise_model):
+        if noise_model == "nb":
+            from batchglm.api.models.numpy.glm_nb import Estimator, Simulator
+        elif noise_model == "norm":
+            from batchglm.api.models.numpy.glm_norm import Estimator, Simulator
+        else:
+            raise ValueError("noise_model not recognized")
+
+        np.random.seed(1)
+        sim = Simulator(num_observations=1000, num_features=50)
+        sim.generate_sample_description(num_batches=2, num_conditions=2)
+        sim.generate_params()
+        sim.generate_data()
+
+        estimators = {}
+        for adaptive_b in [False, True]:
+            estimator = Estimator(input_data=sim.input_data)
+            estimator.initialize()
+            estimator.train(max_steps=100, update_b_freq=5, adaptive_b=adaptive_b)
+            assert np.all(estimator.model.converged)
+            estimators[adaptive_b] = estimator
+
+        ll_fixed = estimators[False].model.ll_byfeature
+        ll_adaptive = estimators[True].model.ll_byfeature
+        assert np.max(np.abs(ll_adaptive - ll_fixed) / np.abs(ll_fixed)) < 1e-8
+        assert np.max(np.abs(estimators[True].model.a_var - estimators[False].model.a_var)) < 1e-4
+        assert len(estimators[True].lls) <= len(estimators[False].lls)
+        return True
+
+    def test_nb(self):
+        logger.error("TestBScheduleNumpy.test_nb()")
+        self._test_schedule(noise_model="nb")
+
+    def test_norm(self):
+        logger.error("TestBScheduleNumpy.test_norm()")
+        self._test_schedule(noise_model="norm")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import logging
+import numpy as np
+import os
+import scipy.sparse
+import tempfile
+import unittest
+
+try:
+    import anndata
+except ImportError:
+    anndata = None
+
+import batchglm.api as glm
+from batchglm import pkg_constants
+from batchglm.api.models.numpy.glm_nb import Estimator, InputDataGLM, Simulator
+
+glm.setup_logging(verbosity="WARNING", stream="STDOUT")
+logger = logging.getLogger(__name__)
+
+
+@unittest.skipIf(anndata is None, "anndata is not installed")
+class TestBackedAnndataNumpy(unittest.TestCase):
+    """
+    Test numpy training on subsets of AnnData objects opened with backed="r".
+    """
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        # Split the data into several blocks of observations:
+        self._budget = pkg_constants.STREAMING_BLOCK_MEMORY_BUDGET
+        pkg_constants.STREAMING_BLOCK_MEMORY_BUDGET = pkg_constants.STREAMING_BLOCK_OVERHEAD * 8 * 30 * 100
+
+    def tearDown(self):
+        pkg_constants.STREAMING_BLOCK_MEMORY_BUDGET = self._budget
+        self._tmp_dir.cleanup()
+
+    def _write(self, sparse: bool):
+        np.random.seed(1)
+        sim = Simulator(num_observations=1000, num_features=30)
+        sim.generate_sample_description(num_batches=2, num_conditions=2)
+        sim.generate_params()
+        sim.generate_data()
+        x = np.asarray(sim.input_data.x).astype(float)
+        x[np.random.RandomState(2).rand(*x.shape) < 0.5] = 0
+        adata = anndata.AnnData(X=scipy.sparse.csr_matrix(x) if sparse else x)
+        adata.obsm["design_loc"] = np.asarray(sim.input_data.design_loc)
+        adata.obsm["design_scale"] = np.asarray(sim.input_data.design_scale)
+        path = os.path.join(self._tmp_dir.name, "sparse.h5ad" if sparse else "dense.h5ad")
+        adata.write_h5ad(path)
+        return x, adata.obsm["design_loc"], adata.obsm["design_scale"], anndata.read_h5ad(path, backed="r")
+
+    def _fit(self, data, design_loc, design_scale):
+        input_data = InputDataGLM(data=data, design_loc=design_loc, design_scale=design_scale)
+        estimator = Estimator(input_data=input_data, init_a="closed_form", init_b="closed_form")
+        estimator.initialize()
+        estimator.train(max_steps=100)
+        estimator.finalize()
+        return estimator
+
+    def _test_view(self, sparse: bool):
+        x, design_loc, design_scale, adata = self._write(sparse=sparse)
+        mask = np.random.RandomState(3).rand(x.shape[0]) < 0.6
+        view = adata[mask]
+
+        input_data = InputDataGLM(data=view, design_loc=design_loc[mask], design_scale=design_scale[mask])
+        assert input_data.is_chunked
+        assert input_data.x.sparse == sparse
+        assert input_data.x.shape == (np.sum(mask), x.shape[1])
+        assert np.array_equal(input_data.feature_isallzero, np.all(x[mask] == 0, axis=0))
+        x_j = input_data.x[:, [5, 2]]
+        assert np.array_equal(x_j.toarray() if sparse else x_j, x[mask][:, [5, 2]])
+
+        estimator = self._fit(view, design_loc[mask], design_scale[mask])
+        estimator_ref = self._fit(x[mask], design_loc[mask], design_scale[mask])
+        ll_ref = estimator_ref.log_likelihood
+        assert np.all(estimator.model.converged)
+        assert np.max(np.abs(estimator.log_likelihood - ll_ref) / np.abs(ll_ref)) < 1e-8
+        assert np.max(np.abs(estimator.a_var - estimator_ref.a_var)) < 1e-5
+        assert np.max(np.abs(estimator.fisher_inv - estimator_ref.fisher_inv)) < 1e-5
+        return True
+
+    def test_dense(self):
+        logger.error("TestBackedAnndataNumpy.test_dense()")
+        return self._test_view(sparse=False)
+
+    def test_sparse(self):
+        logger.error("TestBackedAnndataNumpy.test_sparse()")
+        return self._test_view(sparse=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import logging
+import numpy as np
+import os
+import tempfile
+import unittest
+
+import batchglm.api as glm
+from batchglm.api.models.numpy.glm_nb import Estimator, Simulator
+
+glm.setup_logging(verbosity="WARNING", stream="STDOUT")
+logger = logging.getLogger(__name__)
+
+
+class TestCheckpointNumpy(unittest.TestCase):
+    """
+    Test whether numpy training resumed from a checkpoint reproduces uninterrupted training.
+    """
+
+    def _simulate(self):
+        np.random.seed(1)
+        sim = Simulator(num_observations=1000, num_features=30)
+        sim.generate_sample_description(num_batches=2, num_conditions=2)
+        sim.generate_params()
+        sim.generate_data()
+        return sim
+
+    def _test_resume(self, n_jobs):
+        sim = self._simulate()
+        estimator_ref = Estimator(input_data=sim.input_data)
+        estimator_ref.initialize()
+        estimator_ref.train(max_steps=100, n_jobs=n_jobs)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "fit.npz")
+            # Interrupted after a few steps:
+            estimator = Estimator(input_data=sim.input_data)
+            estimator.initialize()
+            estimator.train(max_steps=4, n_jobs=n_jobs, checkpoint_path=path, checkpoint_interval=0)
+            assert not np.all(estimator.model.converged)
+            # Resumed by a new estimator:
+            estimator = Estimator(input_data=sim.input_data)
+            estimator.initialize()
+            estimator.train(max_steps=100, n_jobs=n_jobs, checkpoint_path=path, resume_from=path)
+            assert len(os.listdir(tmp_dir)) == n_jobs
+        assert np.all(estimator.model.converged)
+        assert np.all(estimator.model.a_var == estimator_ref.model.a_var)
+        assert np.all(estimator.model.b_var == estimator_ref.model.b_var)
+        assert np.all(estimator.steps_by_feature == estimator_ref.steps_by_feature)
+        # The log-likelihood trace includes the iterations before the checkpoint:
+        assert len(estimator.lls) == len(estimator_ref.lls)
+        assert np.all(np.asarray(estimator.lls) == np.asarray(estimator_ref.lls))
+        return True
+
+    def test_resume(self):
+        logger.error("TestCheckpointNumpy.test_resume()")
+        self._test_resume(n_jobs=1)
+
+    def test_resume_sharded(self):
+        logger.error("TestCheckpointNumpy.test_resume_sharded()")
+        self._test_resume(n_jobs=2)
+
+    def test_incompatible(self):
+        logger.error("TestCheckpointNumpy.test_incompatible()")
+        sim = self._simulate()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "fit.npz")
+            estimator = Estimator(input_data=sim.input_data)
+            estimator.initialize()
+            estimator.train(max_steps=2, checkpoint_path=path)
+
+            from batchglm.api.models.numpy.glm_norm import Estimator as EstimatorNorm
+            estimator = EstimatorNorm(input_data=sim.input_data)
+            estimator.initialize()
+            with self.assertRaises(ValueError):
+                estimator.train(max_steps=2, resume_from=path)
+        return True
+
+
+if __name__ == '__main__':
+    unittest.main()
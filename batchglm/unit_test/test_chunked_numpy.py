@@ -0,0 +1,127 @@
+import logging
+import numpy as np
+import os
+import tempfile
+import unittest
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+try:
+    import zarr
+except ImportError:
+    zarr = None
+
+import batchglm.api as glm
+from batchglm.api.data import ChunkedData
+from batchglm.api.models.numpy.glm_nb import Estimator, InputDataGLM, Simulator
+
+glm.setup_logging(verbosity="WARNING", stream="STDOUT")
+logger = logging.getLogger(__name__)
+
+
+class TestChunkedNumpy(unittest.TestCase):
+    """
+    Test numpy training on on-disk data that are streamed in blocks of observations.
+    """
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def _simulate(self):
+        np.random.seed(1)
+        sim = Simulator(num_observations=1000, num_features=30)
+        sim.generate_sample_description(num_batches=2, num_conditions=2)
+        sim.generate_params()
+        sim.generate_data()
+        return sim
+
+    def _sources(self, x):
+        """
+        The data as np.memmap, h5py.Dataset and zarr.Array with chunks that do not align with the blocks.
+        """
+        sources = {}
+        path = os.path.join(self._tmp_dir.name, "x.npy")
+        np.save(path, x)
+        sources["memmap"] = np.load(path, mmap_mode="r")
+        if h5py is not None:
+            f = h5py.File(os.path.join(self._tmp_dir.name, "x.h5"), "w")
+            sources["hdf5"] = f.create_dataset("x", data=x, chunks=(64, x.shape[1]))
+        if zarr is not None:
+            z = zarr.open(os.path.join(self._tmp_dir.name, "x.zarr"), mode="w", shape=x.shape,
+                          chunks=(100, x.shape[1]), dtype=x.dtype)
+            z[:] = x
+            sources["zarr"] = z
+        return sources
+
+    def _fit(self, sim, data, size_factors=None):
+        input_data = InputDataGLM(
+            data=data,
+            design_loc=sim.input_data.design_loc,
+            design_scale=sim.input_data.design_scale,
+            size_factors=size_factors
+        )
+        estimator = Estimator(input_data=input_data, init_a="closed_form", init_b="closed_form")
+        estimator.initialize()
+        estimator.train(max_steps=100)
+        estimator.finalize()
+        return estimator
+
+    def test_chunked_data(self):
+        """
+        Check the streaming reductions and selections of ChunkedData against numpy.
+        """
+        logger.error("TestChunkedNumpy.test_chunked_data()")
+        x = np.random.RandomState(1).poisson(3., size=[1000, 20]).astype(float)
+        grouping = np.random.RandomState(2).randint(0, 3, size=[1000])
+        for name, source in self._sources(x).items():
+            data = ChunkedData(source, block_size=150)
+            assert np.allclose(np.sum(data, axis=0), np.sum(x, axis=0)), name
+            assert np.allclose(np.mean(data, axis=0), np.mean(x, axis=0)), name
+            assert np.allclose(data.power(2).mean(axis=0), np.mean(np.square(x), axis=0)), name
+            assert np.allclose(data.groupwise_mean(grouping),
+                               np.vstack([np.mean(x[grouping == g], axis=0) for g in np.unique(grouping)])), name
+            assert np.array_equal(data[:, [3, 1]], x[:, [3, 1]]), name
+            assert np.array_equal(data[[900, 5, 151], :], x[[900, 5, 151], :]), name
+            assert np.array_equal(np.asarray(data), x), name
+            # Default blocks consist of whole chunks:
+            assert ChunkedData(source).block_size % ChunkedData(source).chunk_rows == 0, name
+        return True
+
+    def test_fit(self):
+        """
+        Check that fits on on-disk data reach the optimum of fits on in-memory data.
+        """
+        logger.error("TestChunkedNumpy.test_fit()")
+        sim = self._simulate()
+        x = np.asarray(sim.input_data.x)
+        size_factors = np.exp(np.random.RandomState(1).normal(0., 0.1, size=[x.shape[0]]))
+        estimator_ref = self._fit(sim, x, size_factors=size_factors)
+        ll_ref = estimator_ref.log_likelihood
+        for name, source in self._sources(x).items():
+            estimator = self._fit(sim, ChunkedData(source, block_size=250), size_factors=size_factors)
+            assert estimator.input_data.is_chunked
+            assert np.all(estimator.model.converged), name
+            assert np.max(np.abs(estimator.log_likelihood - ll_ref) / np.abs(ll_ref)) < 1e-8, name
+            assert np.max(np.abs(estimator.a_var - estimator_ref.a_var)) < 1e-5, name
+            assert np.max(np.abs(estimator.fisher_inv - estimator_ref.fisher_inv)) < 1e-6, name
+        return True
+
+    def test_unsupported(self):
+        logger.error("TestChunkedNumpy.test_unsupported()")
+        sim = self._simulate()
+        data = ChunkedData(self._sources(np.asarray(sim.input_data.x))["memmap"], block_size=250)
+        estimator = Estimator(input_data=InputDataGLM(data=data, design_loc=sim.input_data.design_loc,
+                                                      design_scale=sim.input_data.design_scale))
+        with self.assertRaises(ValueError):
+            estimator.train(max_steps=10, n_jobs=2)
+        return True
+
+
+if __name__ == '__main__':
+    unittest.main()
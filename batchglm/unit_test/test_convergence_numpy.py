@@ -0,0 +1,74 @@
+import logging
+import numpy as np
+import unittest
+
+import batchglm.api as glm
+from batchglm.api.models.numpy.glm_nb import Estimator, Simulator
+
+glm.setup_logging(verbosity="WARNING", stream="STDOUT")
+logger = logging.getLogger(__name__)
+
+
+class TestConvergenceNumpy(unittest.TestCase):
+    """
+    Test the convergence criteria and per-feature iteration caps of numpy IRLS.
+    """
+
+    def _simulate(self):
+        np.random.seed(1)
+        sim = Simulator(num_observations=1000, num_features=30)
+        sim.generate_sample_description(num_batches=2, num_conditions=2)
+        sim.generate_params()
+        sim.generate_data()
+        return sim
+
+    def _fit(self, sim, **kwargs):
+        estimator = Estimator(input_data=sim.input_data)
+        estimator.initialize()
+        estimator.train(max_steps=100, **kwargs)
+        return estimator
+
+    def test_criteria(self):
+        """
+        Check that each criterion on its own reaches the optimum of the default criteria.
+        """
+        logger.error("TestConvergenceNumpy.test_criteria()")
+        sim = self._simulate()
+        estimator_ref = self._fit(sim)
+        assert np.all(estimator_ref.model.converged)
+        ll_ref = estimator_ref.model.ll_byfeature
+
+        # lltol=0 is raised to the machine epsilon, which only stops features that no longer change:
+        disabled = {"lltol": 0., "xtol_loc": 0., "xtol_scale": 0., "gtol_loc": 0., "gtol_scale": 0.}
+        for criterion in [["lltol"], ["xtol_loc", "xtol_scale"], ["gtol_loc", "gtol_scale"]]:
+            kwargs = dict(disabled)
+            for k in criterion:
+                kwargs.pop(k)
+            estimator = self._fit(sim, **kwargs)
+            assert np.all(estimator.model.converged), criterion
+            assert np.max(np.abs(estimator.model.ll_byfeature - ll_ref) / np.abs(ll_ref)) < 1e-8, criterion
+
+        # Loose step tolerances stop earlier:
+        estimator = self._fit(sim, xtol_loc=1e-2, xtol_scale=1e-1)
+        assert np.all(estimator.model.converged)
+        assert len(estimator.lls) < len(estimator_ref.lls)
+        assert np.all(estimator.steps_by_feature <= estimator_ref.steps_by_feature)
+        return True
+
+    def test_caps(self):
+        """
+        Check that features are not updated beyond their iteration cap.
+        """
+        logger.error("TestConvergenceNumpy.test_caps()")
+        sim = self._simulate()
+        caps = np.where(np.arange(sim.input_data.num_features) % 2 == 0, 2, 100)
+        for n_jobs in [1, 2]:
+            estimator = self._fit(sim, max_steps_by_feature=caps, n_jobs=n_jobs)
+            assert np.all(estimator.model.converged)
+            assert np.all(estimator.steps_by_feature <= caps)
+            assert np.all(estimator.steps_by_feature[caps == 2] == 2)
+        return True
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import logging
+import numpy as np
+import scipy.sparse
+import unittest
+
+import batchglm.api as glm
+from batchglm.models.base_glm.utils import count_histogram
+
+glm.setup_logging(verbosity="WARNING", stream="STDOUT")
+logger = logging.getLogger(__name__)
+
+
+class TestCountHistogram(unittest.TestCase):
+    """
+    Test whether count histograms reproduce the data they compress.
+    """
+
+    def _simulate(self):
+        np.random.seed(1)
+        x = np.random.poisson(0.5, size=[300, 20]).astype(float)
+        groups = np.random.randint(0, 3, size=300)
+        return x, groups
+
+    def _check(self, histogram, x, groups):
+        indptr, group, value, multiplicity = histogram
+        for i in range(x.shape[1]):
+            entries = slice(indptr[i], indptr[i + 1])
+            for g in range(3):
+                x_g = x[groups == g, i]
+                is_g = group[entries] == g
+                # Number of observations and sum of values of each group are reproduced:
+                assert np.sum(multiplicity[entries][is_g]) == x_g.shape[0]
+                assert np.isclose(np.sum(multiplicity[entries][is_g] * value[entries][is_g]), np.sum(x_g))
+                # Each value only occurs once per group:
+                assert np.unique(value[entries][is_g]).shape[0] == np.sum(is_g)
+        return True
+
+    def test_dense(self):
+        x, groups = self._simulate()
+        for block_entries in [2 ** 23, 1000]:
+            histogram = count_histogram(x=x, groups=groups, n_groups=3, block_entries=block_entries)
+            self._check(histogram=histogram, x=x, groups=groups)
+        return True
+
+    def test_sparse(self):
+        x, groups = self._simulate()
+        histogram = count_histogram(x=scipy.sparse.csr_matrix(x), groups=groups, n_groups=3, block_entries=1000)
+        self._check(histogram=histogram, x=x, groups=groups)
+        # Dense and sparse histograms are identical:
+        for a, b in zip(histogram, count_histogram(x=x, groups=groups, n_groups=3)):
+            assert np.all(a == b)
+        return True
+
+    def test_max_entries(self):
+        x, groups = self._simulate()
+        assert count_histogram(x=x, groups=groups, n_groups=3, max_entries=10) is None
+        return True
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import logging
+import numpy as np
+import unittest
+
+import batchglm.api as glm
+from batchglm.api.models.numpy.glm_nb import Estimator, InputDataGLM, Simulator
+
+glm.setup_logging(verbosity="WARNING", stream="STDOUT")
+logger = logging.getLogger(__name__)
+
+
+class TestFinalizeGlmNb(unittest.TestCase):
+    """
+    Test whether selective and chunked finalization yields the corresponding parts of the full
+    Hessian and of its inverse.
+    """
+
+    def test_selective(self):
+        np.random.seed(1)
+        sim = Simulator(num_observations=500, num_features=13)
+        sim.generate_sample_description(num_batches=2, num_conditions=2, intercept_scale=True)
+        sim.generate_params()
+        sim.generate_data()
+        input_data = InputDataGLM(
+            data=sim.input_data.x,
+            design_loc=sim.input_data.design_loc,
+            design_scale=sim.input_data.design_scale,
+            design_loc_names=sim.input_data.design_loc_names,
+            design_scale_names=sim.input_data.design_scale_names,
+            constraints_loc=sim.input_data.constraints_loc,
+            constraints_scale=sim.input_data.constraints_scale
+        )
+        estimator = Estimator(input_data=input_data, init_a="standard", init_b="standard")
+        estimator.train(max_steps=20)
+        estimator.finalize()
+        hessian = estimator.hessian
+        fisher_inv = estimator.fisher_inv
+        assert np.allclose(fisher_inv, np.linalg.inv(-hessian))
+        # Well-posed IRLS systems and Fisher information matrices take the Cholesky path:
+        assert np.all(estimator.solver_paths["irls"] == "cholesky")
+        assert np.all(estimator.solver_paths["fisher_inv"] == "cholesky")
+        n_loc = input_data.num_loc_params
+        idx_loc = slice(0, n_loc)
+        idx_scale = slice(n_loc, None)
+
+        estimator.finalize(chunk_size=4)
+        assert np.allclose(estimator.hessian, hessian, rtol=1e-12, atol=1e-12)
+        assert np.allclose(estimator.fisher_inv, fisher_inv, rtol=1e-12, atol=1e-12)
+
+        estimator.finalize(block="loc", chunk_size=5)
+        assert np.allclose(estimator.hessian, hessian[:, idx_loc, idx_loc], rtol=1e-12, atol=1e-12)
+        assert np.allclose(estimator.fisher_inv, fisher_inv[:, idx_loc, idx_loc], rtol=1e-10, atol=1e-12)
+
+        estimator.finalize(block="scale", hessian=False)
+        assert estimator.hessian is None
+        assert np.allclose(estimator.fisher_inv, fisher_inv[:, idx_scale, idx_scale], rtol=1e-10, atol=1e-12)
+
+        estimator.finalize(block="loc", coef_idx=[1, 2], diagonal=True)
+        assert estimator.fisher_inv.shape == (13, 2)
+        assert np.allclose(
+            estimator.fisher_inv,
+            np.diagonal(fisher_inv[:, [1, 2], :][:, :, [1, 2]], axis1=1, axis2=2),
+            rtol=1e-10, atol=1e-12
+        )
+        assert np.allclose(estimator.log_likelihood, np.sum(estimator.model.ll, axis=0))
+        return True
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+import logging
+import numpy as np
+import scipy.sparse
+import scipy.special
+import unittest
+
+import batchglm.api as glm
+from batchglm import pkg_constants
+from batchglm.api.models.numpy.glm_nb import InputDataGLM, Model, Simulator
+
+glm.setup_logging(verbosity="WARNING", stream="STDOUT")
+logger = logging.getLogger(__name__)
+
+
+class TestInputDataGlmDesign(unittest.TestCase):
+    """
+    Test whether the constrained designs cached by InputDataGLM yield the models built from raw
+    designs and constraints.
+    """
+
+    def test_constrained_designs(self):
+        np.random.seed(1)
+        sim = Simulator(num_observations=100, num_features=5)
+        sim.generate_sample_description(num_batches=2, num_conditions=2, intercept_scale=True)
+        sim.generate_params()
+        input_data = InputDataGLM(
+            data=np.random.poisson(5, size=[100, 5]),
+            design_loc=sim.design_loc,
+            design_scale=sim.design_scale,
+            constraints_loc=sim.constraints_loc,
+            constraints_scale=sim.constraints_scale
+        )
+        assert input_data.constraints_loc_identity
+        assert np.all(input_data.design_loc_constrained == input_data.design_loc)
+        assert input_data.design_loc_constant_row is None
+        assert np.all(input_data.design_scale_constant_row == np.ones([1, 1]))
+
+        model = Model(input_data=input_data)
+        model._a_var = sim.a_var
+        model._b_var = sim.b_var
+        assert np.allclose(model.eta_loc, np.matmul(input_data.design_loc, np.matmul(
+            input_data.constraints_loc, sim.a_var)))
+        eta_scale = np.matmul(input_data.design_scale, np.matmul(input_data.constraints_scale, sim.b_var))
+        assert np.allclose(model.eta_scale, eta_scale)
+        assert np.allclose(model.scale, np.exp(eta_scale))
+        assert np.allclose(model.scale_j(j=[1, 3]), np.exp(eta_scale[:, [1, 3]]))
+        return True
+
+    def test_replaced_design(self):
+        """
+        Check that quantities derived from designs and constraints follow replaced designs and constraints.
+        """
+        np.random.seed(1)
+        sim = Simulator(num_observations=100, num_features=5)
+        sim.generate_sample_description(num_batches=2, num_conditions=2)
+        sim.generate_params()
+        input_data = InputDataGLM(
+            data=np.random.poisson(5, size=[100, 5]),
+            design_loc=sim.design_loc,
+            design_scale=sim.design_scale
+        )
+        design_loc = np.asarray(sim.design_loc)[np.random.permutation(100)]
+        unique_loc, _, groups = input_data.design_groups
+        assert np.array_equal(unique_loc[groups], np.asarray(sim.design_loc))
+        assert np.array_equal(input_data.design_loc_constrained, np.asarray(sim.design_loc))
+        input_data.design_loc = design_loc
+        unique_loc, _, groups = input_data.design_groups
+        assert np.array_equal(unique_loc[groups], design_loc)
+
+        # The location model follows replaced designs and constraints:
+        model = Model(input_data=input_data)
+        model._a_var = sim.a_var
+        model._b_var = sim.b_var
+        assert np.allclose(model.eta_loc, np.matmul(design_loc, sim.a_var))
+        constraints_loc = np.array([[1., 0.], [0., 1.], [0., 1.]])
+        input_data.constraints_loc = constraints_loc
+        assert not input_data.constraints_loc_identity
+        model = Model(input_data=input_data)
+        model._a_var = sim.a_var[:2]
+        model._b_var = sim.b_var
+        assert np.allclose(model.eta_loc, np.matmul(design_loc, np.matmul(constraints_loc, sim.a_var[:2])))
+
+        # Observation groups also follow size factors set after construction:
+        assert input_data.observation_groups[2] is None
+        size_factors = np.random.choice([-0.5, 0.5], size=[100])
+        input_data.size_factors = size_factors
+        unique_loc, _, unique_size_factors, groups = input_data.observation_groups
+        assert np.array_equal(unique_loc[groups], np.matmul(design_loc, constraints_loc))
+        assert np.array_equal(unique_size_factors[groups], size_factors)
+        return True
+
+    def test_feature_major(self):
+        """
+        Check that per-feature slices of sparse data are taken from a CSC companion of the CSR data.
+        """
+        np.random.seed(1)
+        sim = Simulator(num_observations=100, num_features=5)
+        sim.generate_sample_description(num_batches=2, num_conditions=2)
+        x = np.random.poisson(0.5, size=[100, 5]).astype(float)
+        input_data = InputDataGLM(
+            data=scipy.sparse.csr_matrix(x),
+            design_loc=sim.design_loc,
+            design_scale=sim.design_scale
+        )
+        x_j = input_data.fetch_x_features([3, 1])
+        assert isinstance(x_j, scipy.sparse.csc_matrix)
+        assert np.array_equal(x_j.toarray(), x[:, [3, 1]])
+        assert input_data.x_feature_major is input_data.x_feature_major
+        assert isinstance(input_data.x, scipy.sparse.csr_matrix)
+        # The companion follows replaced data:
+        input_data.x = scipy.sparse.csr_matrix(x + 1.)
+        assert np.array_equal(input_data.fetch_x_features([0]).toarray(), x[:, [0]] + 1.)
+        return True
+
+    def test_replaced_data(self):
+        """
+        Check that quantities derived from the data follow replaced data.
+        """
+        np.random.seed(1)
+        sim = Simulator(num_observations=100, num_features=5)
+        sim.generate_sample_description(num_batches=2, num_conditions=2)
+        x = np.random.poisson(0.5, size=[100, 5]).astype(float)
+        x_new = np.random.poisson(2, size=[100, 5]).astype(float)
+        max_fraction = pkg_constants.COUNT_HISTOGRAM_MAX_FRACTION
+        pkg_constants.COUNT_HISTOGRAM_MAX_FRACTION = 1.
+        try:
+            for sparse in [False, True]:
+                self._test_replaced_data(sim=sim, x=x, x_new=x_new, sparse=sparse)
+        finally:
+            pkg_constants.COUNT_HISTOGRAM_MAX_FRACTION = max_fraction
+        return True
+
+    def _histogram_sum(self, input_data):
+        indptr, _, value, multiplicity = input_data.count_histogram
+        return np.array([
+            np.sum(value[indptr[i]:indptr[i + 1]] * multiplicity[indptr[i]:indptr[i + 1]])
+            for i in range(input_data.num_features)
+        ])
+
+    def _test_replaced_data(self, sim, x, x_new, sparse):
+        input_data = InputDataGLM(
+            data=scipy.sparse.csr_matrix(x) if sparse else x,
+            design_loc=sim.design_loc,
+            design_scale=sim.design_scale
+        )
+        assert np.allclose(input_data.lgamma_x_plus_one_byfeature, np.sum(scipy.special.gammaln(x + 1), axis=0))
+        assert np.allclose(self._histogram_sum(input_data), np.sum(x, axis=0))
+        input_data.x = scipy.sparse.csr_matrix(x_new) if sparse else x_new
+        assert np.allclose(input_data.lgamma_x_plus_one_byfeature, np.sum(scipy.special.gammaln(x_new + 1), axis=0))
+        assert np.allclose(self._histogram_sum(input_data), np.sum(x_new, axis=0))
+
+
+if __name__ == '__main__':
+    unittest.main()
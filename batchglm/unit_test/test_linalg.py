@@ -0,0 +1,111 @@
+import logging
+import numpy as np
+import unittest
+
+import batchglm.api as glm
+
+glm.setup_logging(verbosity="WARNING", stream="STDOUT")
+logger = logging.getLogger(__name__)
+
+
+class TestStackedAssembly(unittest.TestCase):
+    """
+    Test whether blocked and grouped assembly of X^T*W*X and X^T*W*z matches the dense einsum reference.
+    """
+
+    def _simulate(self):
+        np.random.seed(1)
+        xa = np.random.normal(size=[200, 4])
+        xb = np.random.normal(size=[200, 2])
+        w = np.random.uniform(0.1, 1., size=[200, 30])
+        z = np.random.normal(size=[200, 30])
+        return xa, xb, w, z
+
+    def test_xtwx(self):
+        xa, xb, w, _ = self._simulate()
+        ref_aa = np.einsum('fob,oc->fbc', np.einsum('ob,of->fob', xa, w), xa)
+        ref_ab = np.einsum('fob,oc->fbc', np.einsum('ob,of->fob', xa, w), xb)
+        for memory_budget in [None, 1, 1000]:
+            assert np.allclose(
+                glm.utils.linalg.stacked_xtwx(xa=xa, w=w, memory_budget=memory_budget),
+                ref_aa, rtol=1e-12, atol=1e-12
+            )
+            assert np.allclose(
+                glm.utils.linalg.stacked_xtwx(xa=xa, w=w, xb=xb, memory_budget=memory_budget),
+                ref_ab, rtol=1e-12, atol=1e-12
+            )
+        return True
+
+    def test_xtwz(self):
+        xa, _, w, z = self._simulate()
+        ref = np.einsum('fob,of->fb', np.einsum('ob,of->fob', xa, w), z)
+        for memory_budget in [None, 1, 10000]:
+            assert np.allclose(
+                glm.utils.linalg.stacked_xtwz(x=xa, w=w, z=z, memory_budget=memory_budget),
+                ref, rtol=1e-12, atol=1e-12
+            )
+        return True
+
+    def test_grouped(self):
+        np.random.seed(1)
+        groups_true = np.random.randint(0, 5, size=200)
+        xa = np.eye(5)[groups_true]
+        xb = np.eye(5)[groups_true][:, :2]
+        _, _, w, z = self._simulate()
+        (xa_unique, xb_unique), groups = glm.utils.linalg.design_groups([xa, xb])
+        assert xa_unique.shape[0] == 5
+        assert np.allclose(
+            glm.utils.linalg.stacked_xtwx(xa=xa_unique, w=w, xb=xb_unique, groups=groups),
+            glm.utils.linalg.stacked_xtwx(xa=xa, w=w, xb=xb),
+            rtol=1e-12, atol=1e-12
+        )
+        for memory_budget in [None, 1]:
+            assert np.allclose(
+                glm.utils.linalg.stacked_xtwz(x=xa_unique, w=w, z=z, memory_budget=memory_budget, groups=groups),
+                glm.utils.linalg.stacked_xtwz(x=xa, w=w, z=z),
+                rtol=1e-12, atol=1e-12
+            )
+        return True
+
+
+class TestStackedSolve(unittest.TestCase):
+    """
+    Test whether the stacked solver layer solves all well-posed systems and only falls back on the others.
+    """
+
+    def _simulate(self):
+        np.random.seed(1)
+        x = np.random.normal(size=[20, 30, 4])
+        a = np.einsum('sob,osc->sbc', x, np.transpose(x, [1, 0, 2]))
+        b = np.random.normal(size=[20, 4])
+        a[3] = np.diag([1., 0., 0., 0.])  # singular
+        a[5] = -a[5]  # negative definite
+        a[7, 0, 0] = np.nan
+        return a, b
+
+    def test_solve(self):
+        a, b = self._simulate()
+        idx_ok = np.array([i for i in range(a.shape[0]) if i not in [3, 7]])
+        for method in ["cholesky", "eigh", "lstsq"]:
+            x, paths = glm.utils.linalg.stacked_solve(a=a, b=b, method=method, return_paths=True)
+            assert np.allclose(x[idx_ok], np.linalg.solve(a[idx_ok], b[idx_ok]), rtol=1e-10, atol=1e-10)
+            assert np.allclose(x[3], [b[3, 0], 0., 0., 0.])
+            assert np.all(np.isnan(x[7]))
+            assert paths[7] == "failed"
+            if method == "cholesky":
+                assert np.all(paths[[3, 5]] == "eigh")
+                assert np.all(paths[[i for i in idx_ok if i != 5]] == "cholesky")
+            else:
+                assert np.all(paths[idx_ok] == method)
+        return True
+
+    def test_inv(self):
+        a, _ = self._simulate()
+        idx_ok = np.array([i for i in range(a.shape[0]) if i not in [3, 7]])
+        inv = glm.utils.linalg.stacked_inv(a=a[idx_ok])
+        assert np.allclose(inv, np.linalg.inv(a[idx_ok]), rtol=1e-10, atol=1e-10)
+        return True
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import logging
+import numpy as np
+import scipy.sparse
+import unittest
+
+import batchglm.api as glm
+from batchglm import pkg_constants
+from batchglm.api.models.numpy.glm_nb import Estimator, InputDataGLM, Simulator
+
+glm.setup_logging(verbosity="WARNING", stream="STDOUT")
+logger = logging.getLogger(__name__)
+
+
+class TestLineSearchNumpy(unittest.TestCase):
+    """
+    Test whether the line search of numpy IRLS recovers badly initialised features.
+    """
+
+    def test_bad_init(self):
+        logger.error("TestLineSearchNumpy.test_bad_init()")
+        np.random.seed(1)
+        sim = Simulator(num_observations=1000, num_features=40)
+        sim.generate_sample_description(num_batches=2, num_conditions=2)
+        sim.generate_params()
+        sim.generate_data()
+
+        estimator = Estimator(input_data=sim.input_data)
+        estimator.initialize()
+        estimator.train(max_steps=100)
+        ll_ref = estimator.model.ll_byfeature
+
+        # Perturb the location model of every fourth feature by a fold change of e^4 per parameter:
+        init_a = Estimator(input_data=sim.input_data).model.a_var.copy()
+        bad = np.arange(0, sim.input_data.num_features, 4)
+        init_a[:, bad] += np.random.choice([-4., 4.], size=[init_a.shape[0], bad.size])
+
+        lls = {}
+        for max_line_search in [0, 10]:
+            estimator = Estimator(input_data=sim.input_data, init_a=init_a)
+            estimator.initialize()
+            estimator.train(max_steps=100, max_line_search=max_line_search)
+            lls[max_line_search] = estimator.model.ll_byfeature
+            if max_line_search > 0:
+                assert np.all(estimator.model.converged)
+                assert len(estimator.lls) < 100
+
+        # All features reach the optimum of the well initialised fit with line search:
+        assert np.max(np.abs(lls[10] - ll_ref) / np.abs(ll_ref)) < 1e-6
+        assert np.all(lls[10] >= lls[0] - 1e-6 * np.abs(lls[0]))
+        return True
+
+    def test_ll_clipping(self):
+        """
+        Check that the log-likelihood by feature, on which line search and convergence are based,
+        is clipped observation-wise as the observation-wise log-likelihood.
+        """
+        logger.error("TestLineSearchNumpy.test_ll_clipping()")
+        np.random.seed(1)
+        sim = Simulator(num_observations=300, num_features=6)
+        sim.generate_sample_description(num_batches=2, num_conditions=2)
+        sim.generate_params()
+        sim.generate_data()
+        x = np.asarray(sim.input_data.x).astype(float)
+        x[:5, 0] = 5000
+
+        max_fraction = pkg_constants.COUNT_HISTOGRAM_MAX_FRACTION
+        try:
+            for data, histogram in [(x, False), (scipy.sparse.csr_matrix(x), False), (x, True)]:
+                # Evaluate ll_byfeature_j with and without the count histogram:
+                pkg_constants.COUNT_HISTOGRAM_MAX_FRACTION = 1. if histogram else 0.
+                input_data = InputDataGLM(
+                    data=data,
+                    design_loc=sim.input_data.design_loc,
+                    design_scale=sim.input_data.design_scale
+                )
+                assert (input_data.count_histogram is not None) == histogram
+                model = Estimator(input_data=input_data, init_a="closed_form", init_b="closed_form").model
+                a_var = model.a_var.copy()
+                b_var = model.b_var.copy()
+                a_var[:, 0] -= 3
+                b_var[:, 0] += 4
+                model.a_var = a_var
+                model.b_var = b_var
+                ll = model.ll
+                j = np.arange(x.shape[1])
+                assert np.any(ll == model.param_bounds(ll.dtype)[0]["ll"])
+                assert np.allclose(model.ll_byfeature, np.sum(ll, axis=0), rtol=1e-12, atol=0)
+                assert np.allclose(model.ll_byfeature_j(j=j), np.sum(model.ll_j(j=j), axis=0), rtol=1e-12, atol=0)
+        finally:
+            pkg_constants.COUNT_HISTOGRAM_MAX_FRACTION = max_fraction
+        return True
+
+
+if __name__ == '__main__':
+    unittest.main()
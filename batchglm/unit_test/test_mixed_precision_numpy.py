@@ -0,0 +1,115 @@
+import logging
+import numpy as np
+import scipy.sparse
+import unittest
+
+import batchglm.api as glm
+from batchglm import pkg_constants
+
+glm.setup_logging(verbosity="WARNING", stream="STDOUT")
+logger = logging.getLogger(__name__)
+
+
+class TestMixedPrecisionNumpy(unittest.TestCase):
+    """
+    Test whether float32 observation-wise computations reproduce the float64 fit within the accuracy envelope:
+
+        - location model parameters: 1e-3 absolute
+        - scale model parameters: 1e-2 absolute
+        - log-likelihood by feature: 1e-4 relative
+        - standard errors: 1e-2 relative
+    """
+
+    def _fit(self, noise_model, sparse, dtype):
+        if noise_model == "nb":
+            from batchglm.api.models.numpy.glm_nb import Estimator, InputDataGLM, Simulator
+        elif noise_model == "norm":
+            from batchglm.api.models.numpy.glm_norm import Estimator, InputDataGLM, Simulator
+        else:
+            raise ValueError("noise_model not recognized")
+
+        np.random.seed(1)
+        sim = Simulator(num_observations=2000, num_features=30)
+        sim.generate_sample_description(num_batches=2, num_conditions=2, intercept_scale=True)
+        sim.generate_params()
+        sim.generate_data()
+
+        x = sim.input_data.x
+        if sparse:
+            x = scipy.sparse.csr_matrix(x)
+        input_data = InputDataGLM(
+            data=x,
+            design_loc=sim.input_data.design_loc,
+            design_scale=sim.input_data.design_scale,
+            design_loc_names=sim.input_data.design_loc_names,
+            design_scale_names=sim.input_data.design_scale_names,
+            constraints_loc=sim.input_data.constraints_loc,
+            constraints_scale=sim.input_data.constraints_scale
+        )
+        estimator = Estimator(input_data=input_data, dtype=dtype)
+        estimator.initialize()
+        estimator.train(max_steps=100)
+        estimator.finalize()
+        return estimator
+
+    def _test_envelope(self, noise_model, sparse):
+        estim64 = self._fit(noise_model=noise_model, sparse=sparse, dtype="float64")
+        estim32 = self._fit(noise_model=noise_model, sparse=sparse, dtype="float32")
+
+        j = np.arange(3)
+        assert estim32.model.fim_weight_j(j=j).dtype == np.float32
+        assert estim32.model.jac_weight_b_j(j=j).dtype == np.float32
+        assert estim32.model.a_var.dtype == np.float64
+        assert estim32.model.jac.dtype == np.float64
+        assert estim32.model.ll_byfeature.dtype == np.float64
+        assert np.all(estim32.model.converged)
+
+        se64 = np.sqrt(np.diagonal(estim64.fisher_inv, axis1=1, axis2=2))
+        se32 = np.sqrt(np.diagonal(estim32.fisher_inv, axis1=1, axis2=2))
+        ll64 = estim64.model.ll_byfeature
+        ll32 = estim32.model.ll_byfeature
+        assert np.max(np.abs(estim32.model.a_var - estim64.model.a_var)) < 1e-3
+        assert np.max(np.abs(estim32.model.b_var - estim64.model.b_var)) < 1e-2
+        assert np.max(np.abs(ll32 - ll64) / np.abs(ll64)) < 1e-4
+        assert np.max(np.abs(se32 / se64 - 1.)) < 1e-2
+        return True
+
+    def test_nb(self):
+        logger.error("TestMixedPrecisionNumpy.test_nb()")
+        self._test_envelope(noise_model="nb", sparse=False)
+        self._test_envelope(noise_model="nb", sparse=True)
+
+    def test_norm(self):
+        logger.error("TestMixedPrecisionNumpy.test_norm()")
+        self._test_envelope(noise_model="norm", sparse=False)
+
+    def test_nb_histogram(self):
+        """
+        Check that the count histogram yields the float32 log-likelihood and scale model score of the data.
+        """
+        logger.error("TestMixedPrecisionNumpy.test_nb_histogram()")
+        from batchglm.api.models.numpy.glm_nb import Estimator, Simulator
+
+        np.random.seed(1)
+        sim = Simulator(num_observations=2000, num_features=30)
+        sim.generate_sample_description(num_batches=2, num_conditions=2, intercept_scale=True)
+        sim.generate_params()
+        sim.generate_data()
+        max_fraction = pkg_constants.COUNT_HISTOGRAM_MAX_FRACTION
+        pkg_constants.COUNT_HISTOGRAM_MAX_FRACTION = 1.
+        try:
+            estimator = Estimator(input_data=sim.input_data, dtype="float32")
+            estimator.initialize()
+            assert estimator.input_data.count_histogram is not None
+        finally:
+            pkg_constants.COUNT_HISTOGRAM_MAX_FRACTION = max_fraction
+        model = estimator.model
+        j = np.arange(sim.input_data.num_features)
+        assert np.max(np.abs(model.ll_byfeature_j(j=j) / model.ll_byfeature - 1.)) < 1e-12
+        jac_b = np.matmul(model.jac_weight_b_j(j=j).T, model.design_scale_constrained)
+        assert np.allclose(model.jac_b_j(j=j), jac_b, rtol=1e-5, atol=0)
+        return True
+
+
+if __name__ == '__main__':
+    unittest.main()
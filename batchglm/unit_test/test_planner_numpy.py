@@ -0,0 +1,117 @@
+import logging
+import numpy as np
+import scipy.sparse
+import unittest
+
+import batchglm.api as glm
+from batchglm.api.models.numpy.glm_nb import Estimator, InputDataGLM, Simulator
+from batchglm.utils.planner import plan_training
+
+glm.setup_logging(verbosity="WARNING", stream="STDOUT")
+logger = logging.getLogger(__name__)
+
+
+class TestPlannerNumpy(unittest.TestCase):
+    """
+    Test the AUTO training strategy of the numpy backend.
+    """
+
+    def _input_data(self, sparse=False):
+        np.random.seed(1)
+        sim = Simulator(num_observations=1000, num_features=40)
+        sim.generate_sample_description(num_batches=2, num_conditions=2)
+        sim.generate_params()
+        sim.generate_data()
+        x = sim.input_data.x
+        if sparse:
+            x = scipy.sparse.csr_matrix(x)
+        return InputDataGLM(
+            data=x,
+            design_loc=sim.input_data.design_loc,
+            design_scale=sim.input_data.design_scale,
+            design_loc_names=sim.input_data.design_loc_names,
+            design_scale_names=sim.input_data.design_scale_names,
+            constraints_loc=sim.input_data.constraints_loc,
+            constraints_scale=sim.input_data.constraints_scale
+        )
+
+    def test_plan(self):
+        """
+        Check that the backend, chunk size and batch size follow the memory budget.
+        """
+        logger.error("TestPlannerNumpy.test_plan()")
+        input_data = self._input_data(sparse=True)
+
+        plan = plan_training(input_data=input_data, noise_model="nb", memory_budget=2 ** 30)
+        assert plan["backend"] == "numpy"
+        assert plan["training_strategy"][0]["chunk_size"] is None
+        assert plan["memory"]["total"] <= plan["memory"]["budget"]
+        assert plan["data"]["sparse"]
+        assert plan["data"]["unique_design_rows"] == 4
+
+        # Room for the data and a few features:
+        budget = plan["memory"]["data"] + plan["memory"]["parameters"] + 10 * 8 * 8 * 1000
+        plan = plan_training(input_data=input_data, noise_model="nb", memory_budget=budget)
+        assert plan["backend"] == "numpy"
+        assert 1 <= plan["training_strategy"][0]["chunk_size"] < input_data.num_features
+        assert plan["memory"]["total"] <= budget
+
+        # No room for all observations of one feature:
+        budget = plan["memory"]["data"] + plan["memory"]["parameters"] + 1000
+        plan = plan_training(input_data=input_data, noise_model="nb", memory_budget=budget)
+        assert plan["backend"] == "tf1"
+        assert plan["training_strategy"][0]["use_batching"]
+        assert plan["batch_size"] < input_data.num_observations
+        return True
+
+    def test_plan_sharded(self):
+        """
+        Check that sharded training accounts for the shared data and the working sets of all workers.
+        """
+        logger.error("TestPlannerNumpy.test_plan_sharded()")
+        input_data = self._input_data(sparse=True)
+        plan = plan_training(input_data=input_data, noise_model="nb", memory_budget=2 ** 30)
+        assert plan["memory"]["shards"] == 0
+        assert "n_jobs" not in plan["training_strategy"][0].keys()
+
+        # Room for the shared data and a few features per worker:
+        budget = 4 * plan["memory"]["data"] + plan["memory"]["parameters"] + 2 * 10 * 8 * 8 * 1000
+        plan_serial = plan_training(input_data=input_data, noise_model="nb", memory_budget=budget)
+        plan = plan_training(input_data=input_data, noise_model="nb", memory_budget=budget, n_jobs=2)
+        assert plan["backend"] == "numpy"
+        assert plan["training_strategy"][0]["n_jobs"] == 2
+        # Csc companion, shared copy and csr copies of the shards:
+        assert plan["memory"]["shards"] == 3 * plan["memory"]["data"]
+        assert plan["training_strategy"][0]["chunk_size"] < plan_serial["training_strategy"][0]["chunk_size"]
+        assert plan["memory"]["total"] <= budget
+
+        with self.assertRaises(ValueError):
+            plan_training(input_data=input_data, noise_model="nb", backend="tf1", n_jobs=2)
+        return True
+
+    def test_auto(self):
+        """
+        Check that training in chunks of features reproduces training on all features.
+        """
+        logger.error("TestPlannerNumpy.test_auto()")
+        input_data = self._input_data()
+
+        estimator = Estimator(input_data=input_data)
+        estimator.initialize()
+        estimator.train_sequence(training_strategy="AUTO")
+        assert np.all(estimator.model.converged)
+
+        estimator_full = Estimator(input_data=input_data)
+        estimator_full.initialize()
+        estimator_full.train(max_steps=1000, update_b_freq=5)
+        estimator_chunked = Estimator(input_data=input_data)
+        estimator_chunked.initialize()
+        estimator_chunked.train(max_steps=1000, update_b_freq=5, chunk_size=7)
+        assert np.allclose(estimator_full.model.a_var, estimator_chunked.model.a_var, rtol=0, atol=1e-6)
+        assert np.allclose(estimator_full.model.b_var, estimator_chunked.model.b_var, rtol=0, atol=1e-6)
+        assert np.allclose(estimator_full.model.a_var, estimator.model.a_var, rtol=0, atol=1e-3)
+        return True
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import logging
+import numpy as np
+import scipy.sparse
+import unittest
+
+import batchglm.api as glm
+from batchglm.api.models.numpy.glm_nb import Estimator, InputDataGLM, Simulator
+from batchglm.train.numpy.base_glm.parallel import feature_slice
+
+glm.setup_logging(verbosity="WARNING", stream="STDOUT")
+logger = logging.getLogger(__name__)
+
+
+class TestShardedGlmNb(unittest.TestCase):
+    """
+    Test whether training and finalizing shards of features in worker processes yields
+    the results of the single-process estimator.
+    """
+
+    def _estimator(self, sim, sparse):
+        input_data = InputDataGLM(
+            data=scipy.sparse.csr_matrix(sim.input_data.x) if sparse else sim.input_data.x,
+            design_loc=sim.input_data.design_loc,
+            design_scale=sim.input_data.design_scale,
+            design_loc_names=sim.input_data.design_loc_names,
+            design_scale_names=sim.input_data.design_scale_names,
+            constraints_loc=sim.input_data.constraints_loc,
+            constraints_scale=sim.input_data.constraints_scale,
+            observation_names=["cell_%i" % i for i in range(sim.input_data.num_observations)],
+            feature_names=np.array(["gene_%i" % i for i in range(sim.input_data.num_features)])
+        )
+        return Estimator(input_data=input_data, init_a="standard", init_b="standard")
+
+    def test_sharded(self):
+        np.random.seed(1)
+        sim = Simulator(num_observations=500, num_features=13)
+        sim.generate_sample_description(num_batches=2, num_conditions=2, intercept_scale=True)
+        sim.generate_params()
+        sim.generate_data()
+
+        reference = self._estimator(sim=sim, sparse=False)
+        reference.train(max_steps=100)
+        reference.finalize()
+        for sparse in [False, True]:
+            estimator = self._estimator(sim=sim, sparse=sparse)
+            estimator.train(max_steps=100, n_jobs=3)
+            estimator.finalize(n_jobs=3)
+            assert np.allclose(estimator.a_var, reference.a_var, rtol=1e-6, atol=1e-6)
+            assert np.allclose(estimator.b_var, reference.b_var, rtol=1e-5, atol=1e-5)
+            assert np.allclose(estimator.log_likelihood, reference.log_likelihood, rtol=1e-8)
+            assert np.allclose(estimator.hessian, reference.hessian, rtol=1e-5)
+            assert len(estimator.lls) == len(reference.lls)
+        return True
+
+    def test_sharded_unnamed_designs(self):
+        """
+        Check sharding of input data built from designs without parameter names.
+        """
+        np.random.seed(1)
+        sim = Simulator(num_observations=500, num_features=7)
+        sim.generate_sample_description(num_batches=2, num_conditions=2)
+        sim.generate_params()
+        sim.generate_data()
+
+        estimators = []
+        for n_jobs in [1, 2]:
+            input_data = InputDataGLM(
+                data=np.asarray(sim.input_data.x),
+                design_loc=np.asarray(sim.input_data.design_loc),
+                design_scale=np.asarray(sim.input_data.design_scale)
+            )
+            estimator = Estimator(input_data=input_data, init_a="standard", init_b="standard")
+            estimator.train(max_steps=100, n_jobs=n_jobs)
+            estimator.finalize(n_jobs=n_jobs)
+            estimators.append(estimator)
+        assert np.allclose(estimators[1].a_var, estimators[0].a_var, rtol=1e-6, atol=1e-6)
+        assert np.allclose(estimators[1].log_likelihood, estimators[0].log_likelihood, rtol=1e-8)
+
+    def test_feature_slice(self):
+        """
+        Check that shards of shared feature-major data are views on the stored entries.
+        """
+        np.random.seed(1)
+        x = scipy.sparse.random(50, 13, density=0.2, format="csc")
+        for start, stop in [(0, 5), (5, 13), (4, 4)]:
+            x_shard = feature_slice(x, start=start, stop=stop)
+            assert isinstance(x_shard, scipy.sparse.csc_matrix)
+            assert np.array_equal(x_shard.toarray(), x[:, start:stop].toarray())
+            if x_shard.nnz > 0:
+                assert np.shares_memory(x_shard.data, x.data) and np.shares_memory(x_shard.indices, x.indices)
+        x_dense = x.toarray()
+        assert np.shares_memory(feature_slice(x_dense, start=2, stop=6), x_dense)
+
+    def test_sharded_triage(self):
+        """
+        Check that shards of data with all-zero and constant features yield the serial loss and parameters.
+        """
+        np.random.seed(1)
+        sim = Simulator(num_observations=500, num_features=9)
+        sim.generate_sample_description(num_batches=2, num_conditions=2, intercept_scale=True)
+        sim.generate_params()
+        sim.generate_data()
+        x = np.asarray(sim.input_data.x).astype(float)
+        x[:, 0] = 0
+        x[:, 5] = 3
+        sim.input_data.x = x
+
+        reference = self._estimator(sim=sim, sparse=False)
+        reference.train(max_steps=100)
+        reference.finalize()
+        assert list(reference.feature_triage[[0, 5]]) == ["allzero", "constant"]
+        assert np.isfinite(reference.loss)
+        for sparse in [False, True]:
+            estimator = self._estimator(sim=sim, sparse=sparse)
+            estimator.train(max_steps=100, n_jobs=3)
+            estimator.finalize(n_jobs=3)
+            assert np.array_equal(estimator.feature_triage, reference.feature_triage)
+            assert np.allclose(estimator.loss, reference.loss, rtol=1e-8)
+            assert np.allclose(estimator.a_var, reference.a_var, rtol=1e-6, atol=1e-6)
+            assert np.allclose(estimator.b_var, reference.b_var, rtol=1e-5, atol=1e-5)
+
+
+if __name__ == '__main__':
+    unittest.main()
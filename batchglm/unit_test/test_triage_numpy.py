@@ -0,0 +1,97 @@
+import logging
+import numpy as np
+import os
+import scipy.sparse
+import tempfile
+import unittest
+
+import batchglm.api as glm
+from batchglm.api.data import ChunkedData
+from batchglm.api.models.numpy.glm_nb import Estimator, InputDataGLM, Simulator
+
+glm.setup_logging(verbosity="WARNING", stream="STDOUT")
+logger = logging.getLogger(__name__)
+
+
+class TestTriageNumpy(unittest.TestCase):
+    """
+    Test that all-zero, constant and ultra-sparse features are excluded from numpy training.
+    """
+
+    def _data(self):
+        np.random.seed(1)
+        sim = Simulator(num_observations=500, num_features=10)
+        sim.generate_sample_description(num_batches=2, num_conditions=2)
+        sim.generate_params()
+        sim.generate_data()
+        x = np.asarray(sim.input_data.x).astype(float)
+        x[:, 0] = 0
+        x[:, 1] = 3
+        x[:, 2] = 0
+        x[:5, 2] = np.arange(1, 6)
+        return sim, x
+
+    def _estimator(self, sim, x):
+        input_data = InputDataGLM(
+            data=x,
+            design_loc=sim.input_data.design_loc,
+            design_scale=sim.input_data.design_scale
+        )
+        return Estimator(input_data=input_data, init_a="closed_form", init_b="closed_form")
+
+    def test_feature_summary(self):
+        logger.error("TestTriageNumpy.test_feature_summary()")
+        sim, x = self._data()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "x.npy")
+            np.save(path, x)
+            for data in [x, scipy.sparse.csr_matrix(x), ChunkedData(np.load(path, mmap_mode="r"), block_size=64)]:
+                input_data = self._estimator(sim, data).input_data
+                assert np.array_equal(input_data.feature_nnz, np.count_nonzero(x, axis=0))
+                assert np.array_equal(input_data.feature_isconstant, np.all(x == x[[0], :], axis=0))
+        # The summary follows replaced data:
+        input_data = self._estimator(sim, x).input_data
+        assert np.array_equal(input_data.feature_nnz, np.count_nonzero(x, axis=0))
+        input_data.x = x[:, ::-1].copy()
+        assert np.array_equal(input_data.feature_nnz, np.count_nonzero(x, axis=0)[::-1])
+        assert np.array_equal(input_data.feature_isallzero, np.all(x == 0, axis=0)[::-1])
+
+    def test_triage(self):
+        """
+        Check that triaged features are not trained and that the other features are fit as without them.
+        """
+        logger.error("TestTriageNumpy.test_triage()")
+        for n_jobs in [1, 2]:
+            self._test_triage(n_jobs=n_jobs)
+
+    def _test_triage(self, n_jobs: int):
+        sim, x = self._data()
+        estimator = self._estimator(sim, x)
+        estimator.train(max_steps=100, min_nnz=10, n_jobs=n_jobs)
+        estimator.finalize(n_jobs=n_jobs)
+        assert list(estimator.feature_triage[:4]) == ["allzero", "constant", "sparse", ""]
+        assert np.all(estimator.model.converged)
+        assert np.all(estimator.steps_by_feature[:3] == 0)
+        assert np.all(np.isfinite(estimator.a_var)) and np.all(np.isfinite(estimator.b_var))
+        # Location model of the constant feature from the closed form:
+        assert np.allclose(np.matmul(estimator.input_data.design_loc_constrained, estimator.a_var[:, 1]), np.log(3))
+        assert np.all(np.isnan(estimator.fisher_inv[:3])) and np.all(np.isnan(estimator.hessian[:3]))
+        assert np.all(np.isfinite(estimator.fisher_inv[3:]))
+        assert np.isnan(estimator.log_likelihood[1])
+        assert np.all(np.isfinite(estimator.log_likelihood[[0, 2]])) and np.isfinite(estimator.loss)
+
+        estimator_ref = self._estimator(sim, x[:, 3:])
+        estimator_ref.train(max_steps=100)
+        estimator_ref.finalize()
+        assert np.all(estimator_ref.feature_triage == "")
+        assert np.max(np.abs(estimator.a_var[:, 3:] - estimator_ref.a_var)) < 1e-10
+        assert np.max(np.abs(estimator.fisher_inv[3:] - estimator_ref.fisher_inv)) < 1e-10
+        assert np.max(np.abs(estimator.log_likelihood[3:] - estimator_ref.log_likelihood)) < 1e-8
+
+        estimator.finalize(block="loc", diagonal=True, n_jobs=n_jobs)
+        assert estimator.fisher_inv.shape == (x.shape[1], estimator.a_var.shape[0])
+        assert np.all(np.isnan(estimator.fisher_inv[:3])) and np.all(np.isfinite(estimator.fisher_inv[3:]))
+
+
+if __name__ == '__main__':
+    unittest.main()
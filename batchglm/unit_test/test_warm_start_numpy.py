@@ -0,0 +1,107 @@
+import logging
+import numpy as np
+import unittest
+
+import batchglm.api as glm
+from batchglm.api.models.numpy.glm_nb import Estimator, InputDataGLM, Simulator
+
+glm.setup_logging(verbosity="WARNING", stream="STDOUT")
+logger = logging.getLogger(__name__)
+
+
+class TestWarmStartNumpy(unittest.TestCase):
+    """
+    Test warm starts of numpy estimators from a previously fit estimator.
+    """
+
+    def _simulate(self):
+        np.random.seed(1)
+        sim = Simulator(num_observations=1200, num_features=30)
+        sim.generate_sample_description(num_batches=2, num_conditions=2)
+        sim.generate_params()
+        sim.generate_data()
+        return sim
+
+    def _input_data(self, sim, obs=None, features=None, covariates=None):
+        if obs is None:
+            obs = np.arange(sim.input_data.num_observations)
+        if features is None:
+            features = np.arange(sim.input_data.num_features)
+        if covariates is None:
+            covariates = np.arange(sim.input_data.num_loc_params)
+        names = np.asarray(sim.input_data.design_loc_names)[covariates]
+        return InputDataGLM(
+            data=sim.input_data.x[obs, :][:, features],
+            design_loc=sim.input_data.design_loc[obs, :][:, covariates],
+            design_loc_names=names,
+            design_scale=sim.input_data.design_scale[obs, :][:, covariates],
+            design_scale_names=names,
+            feature_names=["feature_%i" % i for i in features]
+        )
+
+    def _fit(self, input_data, **kwargs):
+        estimator = Estimator(input_data=input_data, **kwargs)
+        estimator.initialize()
+        estimator.train(max_steps=100)
+        assert np.all(estimator.model.converged)
+        return estimator
+
+    def test_new_observations(self):
+        """
+        Check that a refit with additional observations reaches the optimum of a cold start in fewer iterations.
+        """
+        logger.error("TestWarmStartNumpy.test_new_observations()")
+        sim = self._simulate()
+        estimator_old = self._fit(self._input_data(sim, obs=np.arange(1000)))
+
+        input_data = self._input_data(sim)
+        estimator_cold = self._fit(input_data)
+        estimator_warm = self._fit(input_data, init_model=estimator_old)
+        ll_cold = estimator_cold.model.ll_byfeature
+        assert np.max(np.abs(estimator_warm.model.ll_byfeature - ll_cold) / np.abs(ll_cold)) < 1e-8
+        assert np.sum(estimator_warm.steps_by_feature) < np.sum(estimator_cold.steps_by_feature)
+        return True
+
+    def test_changed_features_and_design(self):
+        """
+        Check that features are matched by name and coefficients by parameter name.
+        """
+        logger.error("TestWarmStartNumpy.test_changed_features_and_design()")
+        sim = self._simulate()
+        features_old = np.arange(sim.input_data.num_features - 5)[::-1]
+        estimator_old = self._fit(self._input_data(sim, features=features_old, covariates=[0, 1]))
+
+        input_data = self._input_data(sim)
+        estimator = Estimator(input_data=input_data, init_model=estimator_old, init_a="init_model")
+        a_old = estimator_old.model.a_var
+        a_init = estimator.model.a_var
+        # Features present in the old fit:
+        assert np.all(a_init[:2, features_old] == a_old)
+        assert np.all(a_init[2, features_old] == 0)
+        # New features keep the cold start:
+        a_cold = Estimator(input_data=input_data).model.a_var
+        new = np.setdiff1d(np.arange(input_data.num_features), features_old)
+        assert np.all(a_init[:, new] == a_cold[:, new])
+        return True
+
+    def test_keep_converged(self):
+        """
+        Check that converged features of the previous fit are not updated if the data did not change.
+        """
+        logger.error("TestWarmStartNumpy.test_keep_converged()")
+        sim = self._simulate()
+        features_old = np.arange(sim.input_data.num_features - 5)
+        estimator_old = self._fit(self._input_data(sim, features=features_old))
+
+        input_data = self._input_data(sim)
+        estimator = Estimator(input_data=input_data, init_model=estimator_old, keep_converged=True)
+        assert np.all(estimator.model.converged[features_old])
+        assert not np.any(estimator.model.converged[len(features_old):])
+        estimator.train(max_steps=100)
+        assert np.all(estimator.model.converged)
+        assert np.max(np.abs(estimator.model.a_var[:, features_old] - estimator_old.model.a_var)) < 1e-6
+        return True
+
+
+if __name__ == '__main__':
+    unittest.main()
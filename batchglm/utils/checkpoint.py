@@ -0,0 +1,105 @@
+import logging
+import os
+import tempfile
+import time
+import numpy as np
+
+from batchglm import pkg_constants
+
+logger = logging.getLogger("batchglm")
+
+# Version of the layout of checkpoint files, checkpoints of other versions cannot be resumed from:
+CHECKPOINT_VERSION = 2
+
+
+def save_checkpoint(path: str, backend: str, noise_model: str, **state):
+    """
+    Write the state of a training loop to an uncompressed numpy .npz file.
+
+    The file is first written to a temporary file in the same directory that then replaces `path`,
+    so that `path` always holds a complete checkpoint, also if the process is terminated while writing.
+
+    :param path: Checkpoint file.
+    :param backend: "numpy" or "tf1".
+    :param noise_model: Noise model of the estimator.
+    :param state: Arrays and scalars of the training loop state.
+    """
+    path = os.path.abspath(path)
+    fd, path_tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(
+                f,
+                checkpoint_version=CHECKPOINT_VERSION,
+                backend=backend,
+                noise_model=noise_model,
+                **state
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path_tmp, path)
+    except BaseException:
+        if os.path.exists(path_tmp):
+            os.remove(path_tmp)
+        raise
+    logger.debug("wrote checkpoint %s", path)
+
+
+def load_checkpoint(path: str, backend: str, noise_model: str, n_features: int) -> dict:
+    """
+    Read the state of a training loop written by `save_checkpoint()`.
+
+    :param path: Checkpoint file.
+    :param backend: Backend that resumes from the checkpoint.
+    :param noise_model: Noise model of the estimator that resumes from the checkpoint.
+    :param n_features: Number of features of the estimator that resumes from the checkpoint.
+    :return: dict of the training loop state
+    """
+    with np.load(path, allow_pickle=False) as f:
+        state = dict([(k, f[k]) for k in f.files])
+    if int(state.pop("checkpoint_version")) != CHECKPOINT_VERSION:
+        raise ValueError("checkpoint %s was written by an incompatible version" % path)
+    backend_checkpoint = str(state.pop("backend"))
+    noise_model_checkpoint = str(state.pop("noise_model"))
+    if backend_checkpoint != backend or noise_model_checkpoint != noise_model:
+        raise ValueError(
+            "checkpoint %s was written by a %s estimator of the %s backend, cannot resume a %s estimator of the "
+            "%s backend" % (path, noise_model_checkpoint, backend_checkpoint, noise_model, backend)
+        )
+    if state["converged"].shape[0] != n_features:
+        raise ValueError("checkpoint %s has %i features, the estimator has %i" %
+                         (path, state["converged"].shape[0], n_features))
+    logger.info("resuming from checkpoint %s", path)
+    return state
+
+
+def shard_checkpoint_path(path: str, shard: int) -> str:
+    """
+    Checkpoint file of one shard of the features, e.g. fit.shard0.npz for fit.npz.
+    """
+    root, ext = os.path.splitext(path)
+    return "%s.shard%i%s" % (root, shard, ext)
+
+
+class CheckpointTimer:
+    """
+    Decide when the next periodic checkpoint of a training loop is due.
+    """
+
+    def __init__(self, path: str = None, interval: float = None):
+        """
+        :param path: Checkpoint file, no checkpoints are written if None.
+        :param interval: Minimum time between two checkpoints in seconds,
+            `pkg_constants.CHECKPOINT_INTERVAL` if None.
+        """
+        self.path = path
+        self.interval = pkg_constants.CHECKPOINT_INTERVAL if interval is None else interval
+        self._last = time.time()
+
+    def due(self) -> bool:
+        if self.path is None:
+            return False
+        if time.time() - self._last < self.interval:
+            return False
+        self._last = time.time()
+        return True
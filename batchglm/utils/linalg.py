@@ -1,7 +1,10 @@
 import numpy as np
+import scipy.sparse
 
 import logging
 
+from batchglm import pkg_constants
+
 logger = logging.getLogger("batchglm")
 
 
@@ -32,6 +35,356 @@ def stacked_lstsq(L, b, rcond=1e-10):
     return np.conj(x, out=x)
 
 
+STACKED_SOLVE_PATHS = ("cholesky", "eigh", "lstsq", "failed")
+
+
+def _stacked_apply(fn, out, *args):
+    """
+    Apply a batched LAPACK routine to a stack of systems and isolate the systems it fails on.
+
+    numpy raises for the whole stack if the routine fails on one system, the stack is
+    bisected until the failing systems are identified.
+
+    :param fn: Callable on (systems x ...) arrays.
+    :param out: (systems x ...) array that the result is written to, nan for failed systems.
+    :param args: (systems x ...) arguments of `fn`.
+    :return: (systems,) success of each system
+    """
+    if out.shape[0] == 0:
+        return np.ones([0], dtype=bool)
+    try:
+        out[...] = fn(*args)
+        return np.ones([out.shape[0]], dtype=bool)
+    except np.linalg.LinAlgError:
+        if out.shape[0] == 1:
+            out[...] = np.nan
+            return np.zeros([1], dtype=bool)
+    half = out.shape[0] // 2
+    return np.concatenate([
+        _stacked_apply(fn, out[:half], *[x[:half] for x in args]),
+        _stacked_apply(fn, out[half:], *[x[half:] for x in args])
+    ], axis=0)
+
+
+def _cholesky_solve(l, b):
+    """
+    Solve `(l l^T) x = b` by forward and backward substitution vectorised across systems.
+
+    :param l: (systems x P x P) lower Cholesky factors.
+    :param b: (systems x P x N)
+    :return: x of shape (systems x P x N)
+    """
+    n_par = l.shape[-1]
+    y = np.empty(b.shape, dtype=np.result_type(l, b))
+    for i in range(n_par):
+        y[:, i, :] = (b[:, i, :] - np.einsum('sk,skn->sn', l[:, i, :i], y[:, :i, :])) / l[:, i, i, None]
+    x = y
+    for i in reversed(range(n_par)):
+        x[:, i, :] = (y[:, i, :] - np.einsum('sk,skn->sn', l[:, i + 1:, i], x[:, i + 1:, :])) / l[:, i, i, None]
+    return x
+
+
+def _eigh_solve(a, b, rcond):
+    """
+    Solve symmetric systems via their eigen decomposition cutting off small eigenvalues.
+
+    :param a: (systems x P x P) symmetric matrices.
+    :param b: (systems x P x N)
+    :return: x of shape (systems x P x N)
+    """
+    e, v = np.linalg.eigh(a)
+    e_max = np.max(np.abs(e), axis=-1, keepdims=True)
+    inv_e = np.reciprocal(e, out=np.zeros_like(e), where=np.abs(e) > rcond * e_max)
+    return np.einsum('sKE,sE,sME,sMN->sKN', v, inv_e, v, b)
+
+
+def stacked_solve(a, b, method: str = None, rcond=1e-10, return_paths=False):
+    r"""
+    Solve the symmetric systems `a_s x_s = b_s` of a stack of systems, e.g. per-feature normal equations.
+
+    Solution strategies:
+
+        - "cholesky": batched Cholesky decomposition. Systems that are not numerically positive definite
+          fall back to "eigh".
+        - "eigh": eigen decomposition cutting off small eigenvalues, i.e. the minimum norm least squares
+          solution for rank deficient systems. Systems on which it fails fall back to "lstsq".
+        - "lstsq": SVD least squares as in `stacked_lstsq`.
+
+    Fallbacks are only evaluated on the systems on which the previous strategy failed.
+
+    :param a: (systems x P x P) symmetric matrices.
+    :param b: (systems x P) or (systems x P x N) right hand sides.
+    :param method: Solution strategy, defaults to `pkg_constants.LINALG_SOLVER`.
+    :param rcond: Relative threshold of eigen- and singular values below which these are cut off.
+    :param return_paths: Whether to return the strategy each system was solved with.
+    :return: x of the shape of `b` or tuple of (x, (systems,) names of the strategy each system was solved with
+        as in `STACKED_SOLVE_PATHS`, "failed" if no strategy yielded a finite solution)
+    """
+    if method is None:
+        method = pkg_constants.LINALG_SOLVER
+    method = method.lower()
+    if method not in STACKED_SOLVE_PATHS[:3]:
+        raise ValueError("method %s not recognized" % method)
+    a = np.asarray(a)
+    b = np.asarray(b)
+    vector = b.ndim == a.ndim - 1
+    if vector:
+        b = b[..., None]
+    dtype = np.result_type(a, b)
+    x = np.full(b.shape, np.nan, dtype=dtype)
+    paths = np.full([a.shape[0]], STACKED_SOLVE_PATHS.index("failed"), dtype=int)
+    todo = np.arange(a.shape[0])
+    for path in STACKED_SOLVE_PATHS[STACKED_SOLVE_PATHS.index(method):3]:
+        if todo.shape[0] == 0:
+            break
+        # Avoid copies of the stack if no system has failed yet:
+        if todo.shape[0] == a.shape[0]:
+            a_todo, b_todo = a, b
+        else:
+            a_todo, b_todo = a[todo], b[todo]
+        x_todo = np.empty(b_todo.shape, dtype=dtype)
+        if path == "cholesky":
+            l = np.empty(a_todo.shape, dtype=dtype)
+            ok = _stacked_apply(np.linalg.cholesky, l, a_todo)
+            ok = np.logical_and(ok, np.all(np.diagonal(l, axis1=-2, axis2=-1) > 0, axis=-1))
+            if np.all(ok):
+                x_todo = _cholesky_solve(l, b_todo)
+            else:
+                x_todo[...] = np.nan
+                x_todo[ok] = _cholesky_solve(l[ok], b_todo[ok])
+        elif path == "eigh":
+            _stacked_apply(lambda a_i, b_i: _eigh_solve(a_i, b_i, rcond=rcond), x_todo, a_todo, b_todo)
+        else:
+            _stacked_apply(lambda a_i, b_i: stacked_lstsq(a_i, b_i, rcond=rcond), x_todo, a_todo, b_todo)
+        ok = np.all(np.isfinite(x_todo), axis=(-2, -1))
+        if todo.shape[0] == a.shape[0] and np.all(ok):
+            x = x_todo
+        else:
+            x[todo[ok]] = x_todo[ok]
+        paths[todo[ok]] = STACKED_SOLVE_PATHS.index(path)
+        todo = todo[~ok]
+    if len(todo) > 0:
+        logger.debug("stacked_solve: %i of %i systems could not be solved", len(todo), a.shape[0])
+    if vector:
+        x = x[..., 0]
+    if return_paths:
+        return x, np.asarray(STACKED_SOLVE_PATHS)[paths]
+    return x
+
+
+def stacked_inv(a, method: str = None, rcond=1e-10, return_paths=False):
+    r"""
+    Invert the symmetric matrices of a stack, see `stacked_solve` for the solution strategies.
+
+    :param a: (systems x P x P) symmetric matrices.
+    :param method: Solution strategy, defaults to `pkg_constants.LINALG_SOLVER`.
+    :param rcond: Relative threshold of eigen- and singular values below which these are cut off.
+    :param return_paths: Whether to return the strategy each matrix was inverted with.
+    :return: (systems x P x P) inverses or pseudo-inverses or tuple of (inverses, strategy of each system)
+    """
+    a = np.asarray(a)
+    return stacked_solve(
+        a=a,
+        b=np.broadcast_to(np.eye(a.shape[-1], dtype=a.dtype), a.shape),
+        method=method,
+        rcond=rcond,
+        return_paths=return_paths
+    )
+
+
+def stacked_block_inv(
+        a_aa,
+        a_ab=None,
+        a_bb=None,
+        block: str = "all",
+        idx=None,
+        diagonal: bool = False,
+        method: str = None,
+        return_paths=False
+):
+    r"""
+    Selected entries of the inverses of a stack of symmetric block matrices :math:`[[A_aa, A_ab], [A_ab^T, A_bb]]`.
+
+    The inverse of a diagonal block is evaluated as the inverse of its Schur complement, e.g.
+    :math:`(A_aa - A_ab A_bb^{-1} A_ab^T)^{-1}` for block "a", so that the full matrix is never inverted.
+    Only the columns `idx` of the inverse are solved for.
+
+    :param a_aa: (systems x Pa x Pa)
+    :param a_ab: (systems x Pa x Pb), the matrix consists of block a only if None.
+    :param a_bb: (systems x Pb x Pb)
+    :param block: Block of the inverse: "all", "a" or "b".
+    :param idx: Indices of rows and columns within the block to return, all if None.
+    :param diagonal: Whether to only return the diagonal of the selected inverse.
+    :param method: Solution strategy, see `stacked_solve`.
+    :param return_paths: Whether to return the strategy each system was solved with.
+    :return: (systems x len(idx) x len(idx)) or (systems x len(idx)) if `diagonal` or tuple of (inverse, paths)
+    """
+    block = block.lower()
+    if a_ab is None:
+        if block not in ["all", "a"]:
+            raise ValueError("block %s requires a_ab and a_bb" % block)
+        a = a_aa
+    elif block == "all":
+        a = np.concatenate([
+            np.concatenate([a_aa, a_ab], axis=2),
+            np.concatenate([np.transpose(a_ab, axes=[0, 2, 1]), a_bb], axis=2)
+        ], axis=1)
+    elif block == "a":
+        a = a_aa - np.matmul(a_ab, stacked_solve(a=a_bb, b=np.transpose(a_ab, axes=[0, 2, 1]), method=method))
+    elif block == "b":
+        a_ba = np.transpose(a_ab, axes=[0, 2, 1])
+        a = a_bb - np.matmul(a_ba, stacked_solve(a=a_aa, b=a_ab, method=method))
+    else:
+        raise ValueError("block %s not recognized" % block)
+
+    if idx is None:
+        idx = np.arange(a.shape[-1])
+    idx = np.asarray(idx)
+    unit = np.eye(a.shape[-1], dtype=a.dtype)[:, idx]
+    inv, paths = stacked_solve(
+        a=a,
+        b=np.broadcast_to(unit, (a.shape[0],) + unit.shape),
+        method=method,
+        return_paths=True
+    )
+    inv = inv[:, idx, :]
+    if diagonal:
+        inv = np.diagonal(inv, axis1=-2, axis2=-1).copy()
+    if return_paths:
+        return inv, paths
+    return inv
+
+
+def design_groups(designs):
+    """
+    Group observations by unique rows of one or multiple design matrices.
+
+    Observations are grouped by the rows of all designs jointly so that one grouping
+    applies to cross-products between any of the designs.
+
+    :param designs: List of (observations x params) design matrices.
+    :return: tuple of (list of (groups x params) unique rows of each design, group index of each observation)
+    """
+    designs = [np.asarray(x) for x in designs]
+    unique_rows, groups = np.unique(np.concatenate(designs, axis=1), axis=0, return_inverse=True)
+    splits = np.cumsum([x.shape[1] for x in designs])[:-1]
+    return np.split(unique_rows, splits, axis=1), np.reshape(groups, [-1])
+
+
+def groupwise_sum(w, groups, n_groups):
+    """
+    Sum observation-wise weights over the observations of each group.
+
+    :param w: (observations x features) weights.
+    :param groups: Group index of each observation.
+    :param n_groups: Number of groups.
+    :return: (groups x features), accumulated in at least float64
+    """
+    indicator = scipy.sparse.csr_matrix(
+        (np.ones(groups.shape[0], dtype=np.result_type(w.dtype, np.float64)), (groups, np.arange(groups.shape[0]))),
+        shape=(n_groups, groups.shape[0])
+    )
+    return np.asarray(indicator @ w)
+
+
+def _block_size(n, bytes_per_unit, memory_budget):
+    """
+    Number of units of a blocked axis that fit into the given scratch memory budget.
+
+    :param n: Length of the blocked axis.
+    :param bytes_per_unit: Scratch memory required per entry of the blocked axis.
+    :param memory_budget: Scratch memory budget in bytes, no blocking if None.
+    """
+    if memory_budget is None or n == 0:
+        return max(n, 1)
+    return int(min(max(memory_budget // max(bytes_per_unit, 1), 1), n))
+
+
+def stacked_xtwx(xa, w, xb=None, memory_budget=None, groups=None):
+    r"""
+    Assemble the weighted cross-products :math:`X_a^T W_f X_b` of all features f.
+
+    The observation-wise outer products of the design rows are contracted with the weights
+    in one matrix product, so that no (features x observations x params) intermediate is built.
+    The observation axis is processed in blocks so that scratch memory stays within `memory_budget`.
+
+    If `groups` is given, `xa` and `xb` hold the unique design rows of the observation groups
+    (see `design_groups`) and the weights are summed by group before the contraction.
+
+    :param xa: (observations x params_a) design matrix, (groups x params_a) if `groups` is given.
+    :param w: (observations x features) weights.
+    :param xb: (observations x params_b) design matrix, defaults to `xa`.
+    :param memory_budget: Scratch memory budget in bytes, no blocking if None.
+    :param groups: Group index of each observation, observations are not grouped if None.
+    :return: (features x params_a x params_b), accumulated in at least float64 also for float32 weights
+    """
+    if xb is None:
+        xb = xa
+    xa = np.asarray(xa, dtype=np.result_type(xa, np.float64))
+    xb = np.asarray(xb, dtype=np.result_type(xb, np.float64))
+    w = np.asarray(w)
+    if groups is not None:
+        w = groupwise_sum(w=w, groups=groups, n_groups=xa.shape[0])
+    n_obs, n_features = w.shape
+    npar_a = xa.shape[1]
+    npar_b = xb.shape[1]
+    dtype = np.result_type(xa, xb, w)
+    block = _block_size(
+        n=n_obs,
+        bytes_per_unit=npar_a * npar_b * dtype.itemsize,
+        memory_budget=memory_budget
+    )
+
+    xtwx = np.zeros([n_features, npar_a * npar_b], dtype=dtype)
+    for start in range(0, n_obs, block):
+        idx = slice(start, start + block)
+        outer = np.reshape(
+            np.expand_dims(xa[idx], axis=2) * np.expand_dims(xb[idx], axis=1),
+            [-1, npar_a * npar_b]
+        )
+        xtwx += np.matmul(w[idx].T, outer)
+    return np.reshape(xtwx, [n_features, npar_a, npar_b])
+
+
+def stacked_xtwz(x, w, z=None, memory_budget=None, groups=None):
+    r"""
+    Assemble the weighted responses :math:`X^T W_f z_f` of all features f.
+
+    The feature axis is processed in blocks so that the elementwise product of weights and
+    responses stays within `memory_budget`.
+
+    :param x: (observations x params) design matrix, (groups x params) if `groups` is given.
+    :param w: (observations x features) weights.
+    :param z: (observations x features) working responses, all ones if None.
+    :param memory_budget: Scratch memory budget in bytes, no blocking if None.
+    :param groups: Group index of each observation, observations are not grouped if None.
+    :return: (features x params), accumulated in at least float64 also for float32 weights
+    """
+    x = np.asarray(x, dtype=np.result_type(x, np.float64))
+    w = np.asarray(w)
+    if z is None:
+        if groups is not None:
+            w = groupwise_sum(w=w, groups=groups, n_groups=x.shape[0])
+        return np.matmul(w.T, x)
+    z = np.asarray(z)
+    n_obs, n_features = w.shape
+    dtype = np.result_type(x, w, z)
+    block = _block_size(
+        n=n_features,
+        bytes_per_unit=n_obs * dtype.itemsize,
+        memory_budget=memory_budget
+    )
+
+    xtwz = np.zeros([n_features, x.shape[1]], dtype=dtype)
+    for start in range(0, n_features, block):
+        idx = slice(start, start + block)
+        wz = w[:, idx] * z[:, idx]
+        if groups is not None:
+            wz = groupwise_sum(w=wz, groups=groups, n_groups=x.shape[0])
+        xtwz[idx] = np.matmul(wz.T, x)
+    return xtwz
+
+
 def groupwise_solve_lm(
         dmat,
         apply_fun: callable,
@@ -94,11 +447,21 @@ def groupwise_solve_lm(
     logger.debug(" ** Solve lstsq problem")
     if np.any(np.isnan(params)):
         raise Warning("entries of params were nan which will throw error in lstsq")
-    x_prime, rmsd, rank, s = np.linalg.lstsq(
-        np.matmul(unique_design, constraints),
-        params,
-        rcond=None
-    )
+    a = np.matmul(unique_design, constraints)
+    finite = np.all(np.isfinite(params), axis=0)
+    if np.all(finite):
+        x_prime, rmsd, rank, s = np.linalg.lstsq(a, params, rcond=None)
+    else:
+        # Non-finite group-wise parameters, e.g. the log of the mean of a group without non-zero data, would turn
+        # the solution of all columns into NaN. These columns are NaN, see triage of the numpy backend.
+        logger.debug("non-finite group-wise parameters of %i columns", np.sum(np.logical_not(finite)))
+        x_prime = np.full([a.shape[1], params.shape[1]], np.nan)
+        x_prime[:, finite], rmsd_finite, rank, s = np.linalg.lstsq(a, params[:, finite], rcond=None)
+        if rmsd_finite.size > 0:
+            rmsd = np.full([params.shape[1]], np.nan)
+            rmsd[finite] = rmsd_finite
+        else:
+            rmsd = rmsd_finite
 
     return params, x_prime, rmsd, rank, s
 
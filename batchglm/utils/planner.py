@@ -0,0 +1,249 @@
+import logging
+import os
+import pprint
+import numpy as np
+import scipy.sparse
+
+from batchglm import pkg_constants
+from batchglm.models.base.chunked import ChunkedData
+
+logger = logging.getLogger("batchglm")
+
+# (observations x features) arrays of the compute dtype that are held per feature during one IRLS iteration
+# of the numpy backend, i.e. data slice, linker-space predictions, weights, working residuals and temporaries:
+_OBS_ARRAYS_NUMPY = 8
+# Same for a tf1 graph evaluation, which additionally keeps gradients of all observation-wise terms:
+_OBS_ARRAYS_TF1 = 16
+# IRLS iterations between two scale model updates of the numpy backend. Scale updates are inner Newton
+# searches on special functions and cost a multiple of a location model update:
+_UPDATE_B_FREQ = {"norm": 3, "nb": 5, "beta": 8}
+# Scale updates of nb on the count histogram only touch a fraction of the data:
+_UPDATE_B_FREQ_HISTOGRAM = 3
+# Default trust region optimisers of the tf1 backend by noise model:
+_TF1_OPTIM_ALGO = {"nb": "irls_gd_tr", "norm": "irls_tr", "beta": "nr_tr"}
+_TF1_CONVERGENCE = {
+    "nb": {"convergence_criteria": "all_converged"},
+    "norm": {"convergence_criteria": "all_converged"},
+    "beta": {"convergence_criteria": "all_converged_ll", "stopping_criteria": 1e-8},
+}
+# Newton-Raphson needs the full hessian, more parameters per feature than this use IRLS instead:
+_TF1_NR_MAX_PARAMS = 32
+
+
+def available_memory():
+    """
+    Memory that is available to new allocations in bytes.
+
+    Read from /proc/meminfo and from sysconf otherwise.
+
+    :return: Available memory in bytes or None if this cannot be determined.
+    """
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return int(os.sysconf("SC_AVPHYS_PAGES")) * int(os.sysconf("SC_PAGE_SIZE"))
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def data_nbytes(x) -> int:
+    """
+    Bytes held in memory by dense or sparse data, on-disk data only hold one block of observations at a time,
+    which is accounted for in the working set.
+    """
+    if isinstance(x, ChunkedData):
+        return 0
+    if isinstance(x, scipy.sparse.spmatrix):
+        x = x.tocsr() if not isinstance(x, scipy.sparse.csr_matrix) else x
+        return int(x.data.nbytes + x.indices.nbytes + x.indptr.nbytes)
+    return int(np.asarray(x).nbytes)
+
+
+def data_density(x) -> float:
+    """
+    Fraction of non-zero entries of dense or sparse data.
+    """
+    size = max(x.shape[0] * x.shape[1], 1)
+    if isinstance(x, ChunkedData):
+        return x.count_nonzero() / size
+    if isinstance(x, scipy.sparse.spmatrix):
+        return x.count_nonzero() / size
+    return np.count_nonzero(x) / size
+
+
+def _format_bytes(n):
+    return "%.2f GiB" % (n / 2 ** 30)
+
+
+def plan_training(
+        input_data,
+        noise_model: str,
+        backend: str = None,
+        dtype="float64",
+        memory_budget: int = None,
+        max_steps: int = 1000,
+        n_jobs: int = 1
+) -> dict:
+    """
+    Choose a training configuration from the shape, sparsity and design of the data and from available memory.
+
+    The numpy backend is preferred as features are fit independently and can be processed in chunks of
+    features that fit into memory. Full-data IRLS needs all observations of at least one feature at once,
+    the tf1 backend with mini-batches over observations is chosen if that does not fit. On-disk data are
+    always trained with the numpy backend, which streams over blocks of observations.
+
+    The predicted memory footprint consists of the data, the observation-wise working set of one chunk of
+    features or of one mini-batch and the per-feature normal equations. Sharded numpy training with `n_jobs > 1`
+    additionally places a copy of the data in shared memory, from which the workers take views on their
+    shards. Sparse data are shared feature-major, i.e. as a csc companion of the csr data, and each worker
+    also holds a csr copy of its shard. The workers divide the remaining memory among their chunks of features.
+
+    :param input_data: InputDataGLM
+    :param noise_model: Noise model: "nb", "norm" or "beta".
+    :param backend: "numpy" or "tf1", chosen based on the data if None.
+    :param dtype: Precision of observation-wise computations.
+    :param memory_budget: Bytes that training may use. Defaults to `pkg_constants.PLANNER_MEMORY_BUDGET` if set
+        and to `pkg_constants.PLANNER_MEMORY_FRACTION` of the available memory otherwise.
+    :param max_steps: Maximum number of training iterations.
+    :param n_jobs: Number of worker processes of the numpy backend, see `train()`.
+    :return: Plan with entries
+
+        - "backend": "numpy" or "tf1"
+        - "training_strategy": list of arguments of `train()` of this backend, see `train_sequence()`
+        - "batch_size": mini-batch size of the tf1 backend, None if full-data training is used
+        - "memory": predicted footprint in bytes by component and the budget
+        - "data": shape, density and design statistics the plan is based on
+    """
+    if noise_model not in _UPDATE_B_FREQ.keys():
+        raise ValueError("noise model %s was not recognized" % noise_model)
+    if backend is not None and backend not in ["numpy", "tf1"]:
+        raise ValueError("backend %s was not recognized" % backend)
+    if backend == "tf1" and input_data.is_chunked:
+        raise ValueError("on-disk data are only supported by the numpy backend")
+    if n_jobs > 1 and (backend == "tf1" or input_data.is_chunked):
+        raise ValueError("n_jobs > 1 is only supported by the numpy backend on in-memory data")
+
+    if memory_budget is None:
+        memory_budget = pkg_constants.PLANNER_MEMORY_BUDGET
+    if memory_budget is None or memory_budget <= 0:
+        available = available_memory()
+        if available is None:
+            logger.warning("available memory could not be determined, planning without memory constraint")
+            memory_budget = np.iinfo(np.int64).max
+        else:
+            memory_budget = int(pkg_constants.PLANNER_MEMORY_FRACTION * available)
+
+    n_obs = input_data.num_observations
+    n_features = input_data.num_features
+    n_loc = input_data.num_loc_params
+    n_scale = input_data.num_scale_params
+    itemsize = np.dtype(dtype).itemsize
+    x_bytes = data_nbytes(input_data.x)
+    # Observation-wise quantities of on-disk data are held for one block of observations at a time:
+    n_obs_resident = input_data.x.block_size if input_data.is_chunked else n_obs
+    design_groups = input_data.design_groups
+    n_groups = design_groups[0].shape[0] if design_groups is not None else n_obs
+    stats = {
+        "num_observations": n_obs,
+        "num_features": n_features,
+        "num_loc_params": n_loc,
+        "num_scale_params": n_scale,
+        "sparse": isinstance(input_data.x, scipy.sparse.spmatrix) or (input_data.is_chunked and input_data.x.sparse),
+        "density": data_density(input_data.x),
+        "unique_design_rows": n_groups,
+    }
+
+    # Parameters, normal equations and convergence state are kept in float64 for all features:
+    params_bytes = 8 * n_features * (n_loc + n_scale + np.square(n_loc) + np.square(n_scale) + 4)
+    # Data are cast to the compute dtype feature chunk by feature chunk:
+    x_cast_per_feature = 0 if np.dtype(dtype) == input_data.x.dtype else \
+        int(np.ceil(x_bytes / max(n_features, 1) * itemsize / input_data.x.dtype.itemsize))
+    # X^T*W*X is assembled on unique design rows where possible, in blocks within the assembly budget:
+    per_feature_numpy = _OBS_ARRAYS_NUMPY * n_obs_resident * itemsize + x_cast_per_feature
+    assembly_per_feature = 8 * n_groups * max(n_loc, n_scale)
+    assembly = min(n_features * assembly_per_feature, pkg_constants.NUMPY_ASSEMBLY_MEMORY_BUDGET)
+    # Shared copy of the data and, for sparse data, the feature-major companion and the csr copies of the shards:
+    if n_jobs > 1:
+        shard_bytes = 3 * x_bytes if isinstance(input_data.x, scipy.sparse.spmatrix) else x_bytes
+    else:
+        shard_bytes = 0
+    # Each worker holds the working set of its own chunk of features:
+    free = (memory_budget - x_bytes - params_bytes - shard_bytes) // max(n_jobs, 1)
+    fits_numpy = free >= per_feature_numpy + min(assembly_per_feature, pkg_constants.NUMPY_ASSEMBLY_MEMORY_BUDGET)
+
+    if backend is None:
+        backend = "numpy" if fits_numpy or input_data.is_chunked else "tf1"
+    if backend == "numpy":
+        if not fits_numpy:
+            logger.warning("full-data IRLS on a single feature exceeds the memory budget of %s",
+                           _format_bytes(memory_budget))
+        chunk_size = int(np.clip((free - assembly) // per_feature_numpy, 1, max(n_features, 1)))
+        working_set = max(n_jobs, 1) * (
+            chunk_size * per_feature_numpy +
+            min(chunk_size * assembly_per_feature, pkg_constants.NUMPY_ASSEMBLY_MEMORY_BUDGET)
+        )
+        update_b_freq = _UPDATE_B_FREQ[noise_model]
+        if noise_model == "nb" and n_scale == 1 and input_data.count_histogram is not None:
+            update_b_freq = _UPDATE_B_FREQ_HISTOGRAM
+        training_strategy = [{
+            "max_steps": max_steps,
+            "update_b_freq": update_b_freq,
+            "chunk_size": chunk_size if chunk_size < n_features else None,
+        }]
+        if n_jobs > 1:
+            training_strategy[0]["n_jobs"] = n_jobs
+        batch_size = None
+    else:
+        shard_bytes = 0
+        per_observation_tf1 = _OBS_ARRAYS_TF1 * n_features * itemsize
+        # tf1 keeps a copy of the parameters and of the hessian or Fisher information for all features:
+        params_bytes = params_bytes + 8 * n_features * np.square(n_loc + n_scale)
+        free = memory_budget - x_bytes - params_bytes
+        use_batching = free < per_observation_tf1 * n_obs
+        if use_batching:
+            batch_size = int(np.clip(free // per_observation_tf1, 1, n_obs))
+            # Use a power of two as in the default batch size:
+            batch_size = int(2 ** np.floor(np.log2(batch_size)))
+            working_set = batch_size * per_observation_tf1
+        else:
+            batch_size = None
+            working_set = n_obs * per_observation_tf1
+        optim_algo = _TF1_OPTIM_ALGO[noise_model]
+        if optim_algo == "nr_tr" and n_loc + n_scale > _TF1_NR_MAX_PARAMS:
+            optim_algo = "irls_tr"
+        training_strategy = [dict(
+            _TF1_CONVERGENCE[noise_model],
+            use_batching=use_batching,
+            optim_algo=optim_algo
+        )]
+
+    memory = {
+        "data": x_bytes,
+        "shards": int(shard_bytes),
+        "parameters": int(params_bytes),
+        "working_set": int(working_set),
+        "total": int(x_bytes + shard_bytes + params_bytes + working_set),
+        "budget": int(memory_budget),
+    }
+    plan = {
+        "backend": backend,
+        "training_strategy": training_strategy,
+        "batch_size": batch_size,
+        "memory": memory,
+        "data": stats,
+    }
+    logger.info(
+        "training plan with predicted memory footprint of %s (budget %s):\n%s",
+        _format_bytes(memory["total"]),
+        _format_bytes(memory_budget) if memory_budget < np.iinfo(np.int64).max else "unlimited",
+        pprint.pformat(plan)
+    )
+    if memory["total"] > memory_budget:
+        logger.warning("predicted memory footprint %s exceeds memory budget %s",
+                       _format_bytes(memory["total"]), _format_bytes(memory_budget))
+    return plan